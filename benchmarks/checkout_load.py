@@ -0,0 +1,336 @@
+"""
+Drive the whole checkout (seat page -> book_seats -> confirm_booking ->
+make_payment -> payment_success) from many concurrent users against one
+theater, with Stripe served by the local fake and confirmation emails left
+in the outbox.
+
+    python -m benchmarks.checkout_load --users 50 --seats 100 --seats-per-user 2
+    python -m benchmarks.checkout_load --save-baseline
+    python -m benchmarks.checkout_load --compare   # exit 1 on a regression
+
+Reports throughput, p50/p95/p99 latency and median/p95 queries per step
+(the median over ``--runs`` runs, as thread scheduling makes single runs
+noisy), and checks the database after each run for double bookings.
+``--compare`` checks throughput, p50/p95 latency and query counts against
+``benchmarks/baselines/checkout_load.json``.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from benchmarks.common import test_database
+
+import stripe
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.utils import timezone
+
+from movies.fake_stripe import FakeStripe
+from movies.models import Booking, Movie, Payment, Seat, Theater
+from movies.seatmap import get_seat_map, load_seat_map
+
+STEPS = ("seat_page", "book_seats", "confirm_booking", "make_payment", "payment_success")
+LATENCY_SLACK_MS = 50  # below this, differences are scheduling noise
+BASELINE = Path(__file__).parent / "baselines" / "checkout_load.json"
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = Counter()
+        self.lost = 0
+        self.completed = 0
+
+    def add(self, step, seconds, queries):
+        with self._lock:
+            self.latencies[step].append(seconds)
+            self.queries[step].append(queries)
+
+    def count(self, field, step=None):
+        with self._lock:
+            if field == "errors":
+                self.errors[step] += 1
+            else:
+                setattr(self, field, getattr(self, field) + 1)
+
+
+def checkout(client, theater, seat_ids, args, fake, recorder, barrier, rng):
+    base = f"/movies/theater/{theater.id}"
+
+    def step(name, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            elapsed = time.perf_counter() - start
+        recorder.add(name, elapsed, len(queries))
+        if response.status_code >= 500:
+            raise RuntimeError(f"{name} returned {response.status_code}")
+        return response
+
+    name = "seat_page"
+    try:
+        barrier.wait()
+        for _ in range(args.retries + 1):
+            name = "seat_page"
+            step(name, "get", f"{base}/seats/book/")
+            name = "book_seats"
+            picks = rng.sample(seat_ids, args.seats_per_user)
+            if step(name, "post", f"{base}/seats/book/", {"seats": picks}).status_code == 302:
+                break
+            recorder.count("lost")
+        else:
+            return
+
+        name = "confirm_booking"
+        step(name, "post", f"{base}/confirm/")
+        name = "make_payment"
+        response = step(name, "get", f"{base}/payment/")
+        session_id = response["Location"].rsplit("/", 1)[-1]
+        fake.pay(session_id)
+        name = "payment_success"
+        step(name, "get", f"{base}/success/", {"session_id": session_id})
+        recorder.count("completed")
+    except Exception:
+        recorder.count("errors", name)
+    finally:
+        connection.close()
+
+
+def violations(theater):
+    """Count every way the run could have sold a seat twice or lost one."""
+    bookings = Booking.objects.filter(theater=theater)
+    booked_seats = set(bookings.values_list("seat_id", flat=True))
+    flagged_seats = set(
+        Seat.objects.filter(theater=theater, is_booked=True).values_list("id", flat=True)
+    )
+    sold = Counter(
+        seat_id
+        for seat_ids in Payment.objects.filter(theater=theater, status=Payment.PAID)
+        .values_list("seat_ids", flat=True)
+        for seat_id in seat_ids
+    )
+    return {
+        "seat sold twice": sum(1 for count in sold.values() if count > 1),
+        "booking without is_booked": len(booked_seats - flagged_seats),
+        "is_booked without booking": len(flagged_seats - booked_seats),
+        "bookings per seat > 1": bookings.values("seat_id").annotate(n=Count("id"))
+        .filter(n__gt=1).count(),
+        "paid but unfulfilled": Payment.objects.filter(
+            theater=theater, status=Payment.UNFULFILLED
+        ).count(),
+        "seat map out of sync": int(load_seat_map(theater.id).booked_count() != len(booked_seats)),
+    }
+
+
+def sqlite_row_locks():
+    """
+    Make SQLite queue writers the way row locks do on PostgreSQL.
+
+    SQLite ignores ``select_for_update()``, so two checkouts that read and
+    then write deadlock and one fails at once with "database is locked".
+    Starting every transaction with BEGIN IMMEDIATE (``transaction_mode``
+    in Django 5.1+) and a longer busy timeout makes them wait instead.
+    """
+    from django.db.backends.sqlite3.base import DatabaseWrapper
+
+    settings.DATABASES["default"].setdefault("OPTIONS", {})["timeout"] = 30
+    DatabaseWrapper._start_transaction_under_autocommit = (
+        lambda self: self.cursor().execute("BEGIN IMMEDIATE")
+    )
+
+
+def run(args):
+    movie = Movie.objects.create(
+        name="Benchmark", image="movies/bench.jpg", rating="7.5",
+        cast="Cast", genre="Drama", language="English",
+    )
+    theater = Theater.objects.create(name="Hall 1", movie=movie, time=timezone.now())
+    Seat.objects.bulk_create(
+        Seat(theater=theater, seat_number=f"{chr(65 + i // 20)}{i % 20 + 1}")
+        for i in range(args.seats)
+    )
+    seat_ids = list(Seat.objects.filter(theater=theater).values_list("id", flat=True))
+    # A real show's seat map is built long before the rush; building it
+    # here keeps the first 50 page views from racing to write it.
+    get_seat_map(theater)
+    User.objects.bulk_create(
+        User(username=f"load{i}", email=f"load{i}@example.com") for i in range(args.users)
+    )
+    clients = []
+    for user in User.objects.filter(username__startswith="load").order_by("id"):
+        # The test client records exceptions through a global signal, so a
+        # raising client would also fail every request running alongside it.
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        clients.append(client)
+
+    recorder = Recorder()
+    barrier = threading.Barrier(args.users)
+    rng = random.Random(args.seed)
+    with FakeStripe(delay=args.stripe_delay) as fake:
+        settings.STRIPE_SECRET_KEY = stripe.api_key = "sk_test_load"
+        settings.STRIPE_API_BASE = stripe.api_base = fake.api_base
+        threads = [
+            threading.Thread(
+                target=checkout,
+                args=(client, theater, seat_ids, args, fake, recorder, barrier,
+                      random.Random(rng.random())),
+            )
+            for client in clients
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+    return {
+        "config": {
+            key: getattr(args, key)
+            for key in ("users", "seats", "seats_per_user", "retries", "stripe_delay", "seed")
+        },
+        "wall_s": round(wall, 3),
+        "throughput": round(recorder.completed / wall, 2),
+        "completed": recorder.completed,
+        "lost": recorder.lost,
+        "errors": dict(recorder.errors),
+        "steps": {
+            step: {
+                "requests": len(recorder.latencies[step]),
+                "p50_ms": round(percentile(recorder.latencies[step], 0.50) * 1000, 1),
+                "p95_ms": round(percentile(recorder.latencies[step], 0.95) * 1000, 1),
+                "p99_ms": round(percentile(recorder.latencies[step], 0.99) * 1000, 1),
+                "queries": percentile(recorder.queries[step], 0.50),
+                "queries_p95": percentile(recorder.queries[step], 0.95),
+            }
+            for step in STEPS
+        },
+        "violations": violations(theater),
+    }
+
+
+def combine(results):
+    """Median of each number over ``results``; errors and violations add up."""
+    first = results[0]
+    return {
+        "config": first["config"],
+        "runs": len(results),
+        **{key: statistics.median([r[key] for r in results]) for key in ("wall_s", "throughput", "completed", "lost")},
+        "errors": dict(sum((Counter(r["errors"]) for r in results), Counter())),
+        "steps": {
+            step: {
+                key: statistics.median([r["steps"][step][key] for r in results])
+                for key in first["steps"][step]
+            }
+            for step in STEPS
+        },
+        "violations": {
+            name: sum(r["violations"][name] for r in results) for name in first["violations"]
+        },
+    }
+
+
+def print_report(result):
+    config = result["config"]
+    print(
+        f"{config['users']} users, {config['seats']} seats, {config['seats_per_user']} per user, "
+        f"Stripe latency {config['stripe_delay'] * 1000:.0f} ms, median of {result['runs']} runs"
+    )
+    print(
+        f"{result['completed']} checkouts in {result['wall_s']:.2f} s "
+        f"({result['throughput']:.1f}/s), {result['lost']} lost seat races, "
+        f"errors: {result['errors'] or 'none'}"
+    )
+    print(
+        f"{'step':<18}{'requests':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'queries':>10}{'q p95':>10}"
+    )
+    for step, stats in result["steps"].items():
+        print(
+            f"{step:<18}{stats['requests']:>10}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+            f"{stats['p99_ms']:>10.1f}{stats['queries']:>10}{stats['queries_p95']:>10}"
+        )
+    print("violations: " + ", ".join(f"{name} {count}" for name, count in result["violations"].items()))
+
+
+def compare(result, baseline, tolerance):
+    """Return the regressions of ``result`` against ``baseline``."""
+    problems = []
+    if result["config"] != baseline["config"]:
+        problems.append(f"config differs from the baseline: {baseline['config']}")
+    if result["throughput"] < baseline["throughput"] / (1 + tolerance):
+        problems.append(f"throughput {result['throughput']}/s < baseline {baseline['throughput']}/s")
+    for step, stats in result["steps"].items():
+        before = baseline["steps"][step]
+        # p99 hinges on the single unluckiest lock wait, so only p50 and p95 gate.
+        for key in ("p50_ms", "p95_ms"):
+            if stats[key] > before[key] * (1 + tolerance) + LATENCY_SLACK_MS:
+                problems.append(f"{step} {key} {stats[key]} > baseline {before[key]}")
+        # Query counts are deterministic per path, so any increase is a regression.
+        for key in ("queries", "queries_p95"):
+            if stats[key] > before[key]:
+                problems.append(f"{step} {key} {stats[key]} > baseline {before[key]}")
+    if any(result["violations"].values()):
+        problems.append(f"double-booking checks failed: {result['violations']}")
+    if sum(result["errors"].values()) > sum(baseline["errors"].values()):
+        problems.append(f"errors {result['errors']} (baseline {baseline['errors']})")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seats", type=int, default=100)
+    parser.add_argument("--seats-per-user", type=int, default=2)
+    parser.add_argument("--retries", type=int, default=2, help="new picks after losing a seat race")
+    parser.add_argument("--stripe-delay", type=float, default=0.05, help="fake Stripe latency (s)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--runs", type=int, default=5, help="report the median of this many runs")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5 = 1.5x")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    if connection.vendor == "sqlite":
+        sqlite_row_locks()
+    results = []
+    for _ in range(args.runs):
+        with test_database():
+            results.append(run(args))
+    result = combine(results)
+    print_report(result)
+
+    if args.save_baseline:
+        BASELINE.parent.mkdir(exist_ok=True)
+        BASELINE.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"Saved baseline to {BASELINE}")
+    if args.compare:
+        problems = compare(result, json.loads(BASELINE.read_text()), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        if problems:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Shared helpers for the scripts in this package.
+
+Each benchmark runs against a throwaway test database, so it is safe to run
+next to a development database:
+
+    python -m benchmarks.seat_map
+"""
+import os
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bookmyseat.settings")
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+
+@contextmanager
+def test_database():
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def measure(fn, repeat=100):
+    """Return ``(median_ms, p95_ms, peak_kib)`` for calling ``fn``."""
+    fn()  # warm up caches and lazily built state
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return statistics.median(timings), p95, peak / 1024
+
+
+def report(title, rows):
+    print(title)
+    print(f"{'path':<24}{'median ms':>12}{'p95 ms':>12}{'peak KiB':>12}")
+    for name, (median, p95, peak) in rows:
+        print(f"{name:<24}{median:>12.3f}{p95:>12.3f}{peak:>12.1f}")
@@ -0,0 +1,90 @@
+"""
+Movie search over a synthetic catalog: the old ``name__icontains`` filter
+against the in-process search index.
+
+    python -m benchmarks.movie_search --movies 50000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import measure, report, test_database
+
+from movies.models import Movie
+from movies.search import SearchIndex, get_search_index, search_movies
+
+WORDS = (
+    "shadow river empire storm silent golden night hunter iron crimson last "
+    "city dragon lost kingdom broken star ocean secret fire winter dream "
+    "legend wild dark journey glass mountain echo paper thunder garden"
+).split()
+FIRST = "Leonardo Kate Tom Priya Amitabh Deepika Rajini Meryl Denzel Keanu Aishwarya Shah".split()
+LAST = "DiCaprio Winslet Hardy Chopra Bachchan Padukone Kanth Streep Washington Reeves Rai Khan".split()
+GENRES = ["Action", "Comedy", "Drama", "Thriller", "Romance", "Fantasy"]
+LANGUAGES = ["English", "Hindi", "Kannada", "Tamil", "Telugu", "Malyalam"]
+SYLLABLES = "ka ra ma ni to shi lo ve an dor el mi su ri ta ne po zu ya vi".split()
+QUERIES = ["storm", "golden kingdom", "dicaprio", "chopra winter", "dragn", "mountian echo"]
+
+
+def populate(count, seed=7):
+    rng = random.Random(seed)
+    # Descriptions draw from a realistic-sized vocabulary, not just WORDS.
+    vocabulary = WORDS + [
+        "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(8000)
+    ]
+    batch = []
+    for i in range(count):
+        batch.append(Movie(
+            name=" ".join(rng.sample(WORDS, rng.randint(1, 3))).title(),
+            image="movies/bench.jpg",
+            rating="7.0",
+            cast=", ".join(f"{rng.choice(FIRST)} {rng.choice(LAST)}" for _ in range(3)),
+            description=" ".join(rng.choices(vocabulary, k=20)),
+            genre=rng.choice(GENRES),
+            language=rng.choice(LANGUAGES),
+        ))
+        if len(batch) == 5000:
+            Movie.objects.bulk_create(batch)
+            batch = []
+    Movie.objects.bulk_create(batch)
+
+
+def icontains_path(query):
+    return list(Movie.objects.filter(name__icontains=query))
+
+
+def index_path(query):
+    ids = search_movies(query, limit=60)
+    by_id = Movie.objects.in_bulk(ids)
+    return [by_id[movie_id] for movie_id in ids]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--movies", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with test_database():
+        populate(args.movies)
+
+        start = time.perf_counter()
+        SearchIndex().sync()
+        print(f"Full index build for {args.movies} movies: {time.perf_counter() - start:.2f} s")
+        get_search_index()
+
+        queries = iter(QUERIES * (args.repeat + 2))
+        rows = [
+            ("name__icontains", measure(lambda: icontains_path(next(queries)), args.repeat)),
+        ]
+        queries = iter(QUERIES * (args.repeat + 2))
+        rows.append(("search index", measure(lambda: index_path(next(queries)), args.repeat)))
+        report(f"Search over {args.movies} movies ({args.repeat} runs)", rows)
+
+        for query in QUERIES:
+            print(f"  {query!r}: icontains {len(icontains_path(query))} hits, "
+                  f"index top hit {index_path(query)[0].name if index_path(query) else '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compare rendering data for the seat page from ``Seat`` rows against the
+packed ``Theater.seat_map``.
+
+    python -m benchmarks.seat_map --seats 400
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks.common import measure, report, test_database
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from movies.models import Movie, Seat, Theater
+from movies.seatmap import get_seat_map
+from movies.utils import active_hold_q, hold_cutoff
+
+
+def populate(seat_count):
+    movie = Movie.objects.create(
+        name="Benchmark", image="movies/bench.jpg", rating="7.5",
+        cast="Cast", genre="Drama", language="English",
+    )
+    theater = Theater.objects.create(name="Hall 1", movie=movie, time=timezone.now() + timedelta(days=1))
+    user = User.objects.create(username="bench")
+    now = timezone.now()
+    Seat.objects.bulk_create(
+        Seat(
+            theater=theater,
+            seat_number=f"{chr(65 + i // 20)}{i % 20 + 1}",
+            is_booked=i % 3 == 0,
+            is_reserved=i % 7 == 0 and i % 3 != 0,
+            reserved_by=user if i % 7 == 0 and i % 3 != 0 else None,
+            reserved_at=now if i % 7 == 0 and i % 3 != 0 else None,
+        )
+        for i in range(seat_count)
+    )
+    return theater
+
+
+def queryset_path(theater_id):
+    seats = list(Seat.objects.filter(theater_id=theater_id))
+    cutoff = hold_cutoff()
+    available = sum(
+        1 for seat in seats
+        if not seat.is_booked and not (seat.is_reserved and seat.reserved_at >= cutoff)
+    )
+    return seats, available
+
+
+def annotated_queryset_path(theater_id):
+    seats = list(
+        Seat.objects.filter(theater_id=theater_id).values("id", "seat_number", "is_booked")
+    )
+    held = Seat.objects.filter(active_hold_q(), theater_id=theater_id).count()
+    return seats, held
+
+
+def seat_map_path(theater_id):
+    seat_map = get_seat_map(Theater.objects.get(id=theater_id))
+    cutoff = hold_cutoff()
+    return list(seat_map.seats(cutoff)), seat_map.available_count(cutoff)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seats", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with test_database():
+        theater = populate(args.seats)
+        assert queryset_path(theater.id)[1] == seat_map_path(theater.id)[1]
+        report(
+            f"Seat page data for {args.seats} seats ({args.repeat} runs)",
+            [
+                ("Seat queryset", measure(lambda: queryset_path(theater.id), args.repeat)),
+                ("Seat values() + count", measure(lambda: annotated_queryset_path(theater.id), args.repeat)),
+                ("Theater.seat_map", measure(lambda: seat_map_path(theater.id), args.repeat)),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    main()
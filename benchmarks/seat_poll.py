@@ -0,0 +1,55 @@
+"""
+Compare what one availability poll costs: the full seat page against the
+seat JSON endpoint, both on a first request and when nothing changed
+(If-None-Match -> 304).
+
+    python -m benchmarks.seat_poll --seats 400
+"""
+import argparse
+
+from benchmarks.common import measure, report, test_database
+from benchmarks.seat_map import populate
+
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seats", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    with test_database():
+        theater = populate(args.seats)
+        client = Client()
+        client.force_login(User.objects.get(username="bench"))
+        page_url = f"/movies/theater/{theater.id}/seats/book/"
+        json_url = f"/movies/theater/{theater.id}/seats.json"
+        etag = client.get(json_url)["ETag"]
+
+        polls = {
+            "HTML seat page": lambda: client.get(page_url),
+            "seats.json": lambda: client.get(json_url),
+            "seats.json (304)": lambda: client.get(json_url, HTTP_IF_NONE_MATCH=etag),
+        }
+        rows = []
+        for name, poll in polls.items():
+            response = poll()
+            assert response.status_code in (200, 304), response.status_code
+            rows.append((name, measure(poll, args.repeat), len(response.content)))
+
+        report(
+            f"One poll of a {args.seats}-seat theater ({args.repeat} runs)",
+            [(name, timings) for name, timings, _ in rows],
+        )
+        print()
+        print(f"{'path':<24}{'body bytes':>12}")
+        for name, _, size in rows:
+            print(f"{name:<24}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
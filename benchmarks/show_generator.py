@@ -0,0 +1,69 @@
+"""
+Time generating a schedule's seats with movies.schedule against creating
+them one by one (what adding seats through SeatAdmin amounts to).
+
+    python -m benchmarks.show_generator --seats 1000000
+
+The one-by-one path is timed on --sample seats and extrapolated.
+"""
+import argparse
+import time as clock
+from datetime import time, timedelta
+
+from benchmarks.common import test_database
+
+from django.utils import timezone
+
+from movies.models import HallLayout, Movie, Seat, Theater
+from movies.schedule import SEAT_CHUNK_SIZE, generate_shows, seat_numbers
+
+TIMES = [time(hour) for hour in (9, 12, 15, 18, 21)]
+
+
+def one_by_one(movie, layout, count):
+    numbers = seat_numbers(layout)
+    theater = Theater.objects.create(name="Manual", movie=movie, time=timezone.now())
+    start = clock.perf_counter()
+    for i in range(count):
+        Seat.objects.create(theater=theater, seat_number=numbers[i % len(numbers)])
+    return clock.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seats", type=int, default=1_000_000)
+    parser.add_argument("--sample", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=SEAT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with test_database():
+        movie = Movie.objects.create(
+            name="Benchmark", image="movies/bench.jpg", rating="7.5",
+            cast="Cast", genre="Drama", language="English",
+        )
+        # 20 rows of 26 seats with a centre aisle: 500 seats per show.
+        layout = HallLayout.objects.create(name="Bench", rows=20, seats_per_row=26, gaps="13")
+        per_show = len(seat_numbers(layout))
+        shows = -(-args.seats // per_show)
+        halls = [f"Audi {i + 1}" for i in range(-(-shows // (7 * len(TIMES))))]
+        days = -(-shows // (len(halls) * len(TIMES)))
+
+        start = clock.perf_counter()
+        created, seats = generate_shows(
+            movie, layout, halls, timezone.localdate() + timedelta(days=1), days, TIMES,
+            chunk_size=args.chunk_size,
+        )
+        elapsed = clock.perf_counter() - start
+
+        manual = one_by_one(movie, layout, args.sample)
+        estimate = manual / args.sample * seats
+
+        print(f"{'path':<24}{'seats':>12}{'seconds':>12}{'seats/s':>12}")
+        print(f"{'generate_shows':<24}{seats:>12}{elapsed:>12.2f}{seats / elapsed:>12.0f}")
+        print(f"{'one by one (sample)':<24}{args.sample:>12}{manual:>12.2f}{args.sample / manual:>12.0f}")
+        print(f"{'one by one (estimated)':<24}{seats:>12}{estimate:>12.0f}")
+        print(f"{created} shows in {len(halls)} halls over {days} days.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Latency of creating Stripe checkout sessions when a burst of users pays at
+once: the old sync call on a fixed pool of workers versus the pooled async
+client on one event loop. Both talk to the local fake Stripe server.
+
+    python -m benchmarks.stripe_checkout --requests 100 --workers 4 --delay 0.2
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from benchmarks.common import django  # noqa: F401  (configures Django)
+
+import stripe
+from django.conf import settings
+
+from movies.fake_stripe import FakeStripe
+from movies.payments import create_checkout_session
+
+URLS = ("http://localhost/success/", "http://localhost/cancel/")
+
+
+def sync_checkout(i):
+    # The pre-async make_payment call.
+    return stripe.checkout.Session.create(
+        payment_method_types=["card"],
+        line_items=[{
+            "price_data": {
+                "currency": "inr",
+                "product_data": {"name": "Movie Tickets"},
+                "unit_amount": 20000,
+            },
+            "quantity": 1,
+        }],
+        mode="payment",
+        success_url=URLS[0],
+        cancel_url=URLS[1],
+        idempotency_key=f"sync-{i}",
+    )
+
+
+def run_sync(count, workers):
+    start = time.perf_counter()
+    latencies = []
+
+    def timed(i):
+        sync_checkout(i)
+        latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(timed, range(count)))
+    return latencies, time.perf_counter() - start
+
+
+async def run_async(count):
+    start = time.perf_counter()
+    latencies = []
+    user = SimpleNamespace(id=1, email="bench@example.com")
+
+    async def timed(i):
+        await create_checkout_session(user, 1, [i], 200, f"async-{i}", *URLS)
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(timed(i) for i in range(count)))
+    return latencies, time.perf_counter() - start
+
+
+def summary(name, latencies, wall):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{name:<28}{statistics.median(latencies) * 1000:>10.0f}"
+        f"{p95 * 1000:>10.0f}{len(latencies) / wall:>12.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4, help="sync worker threads")
+    parser.add_argument("--delay", type=float, default=0.2, help="fake Stripe latency (s)")
+    args = parser.parse_args()
+
+    with FakeStripe(delay=args.delay) as fake:
+        settings.STRIPE_SECRET_KEY = stripe.api_key = "sk_test_bench"
+        settings.STRIPE_API_BASE = stripe.api_base = fake.api_base
+
+        print(f"{args.requests} concurrent checkouts, Stripe latency {args.delay * 1000:.0f} ms")
+        print(f"{'path':<28}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>12}")
+        summary(f"sync ({args.workers} workers)", *run_sync(args.requests, args.workers))
+        summary("async (1 event loop)", *asyncio.run(run_async(args.requests)))
+
+
+if __name__ == "__main__":
+    main()
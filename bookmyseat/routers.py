@@ -0,0 +1,131 @@
+"""
+Read-replica routing.
+
+Views wrapped in ``@replica_reads`` (the movie list and the admin
+dashboard) read from one of ``DATABASE_REPLICAS``; everything else, and
+every write, uses ``default``. A user who just wrote something (a hold,
+a booking, a login) is pinned to the primary for ``REPLICA_PIN_SECONDS``
+by a cookie, so replication lag never hides their own changes. Within a
+request, the first write switches later reads to the primary too.
+Tag-cached pages (see ``movies.pagecache``) stay on the primary, so a
+lagging replica is never cached under a fresh tag version.
+
+A replica that cannot be connected to is skipped for
+``REPLICA_RETRY_SECONDS`` and its reads go to the primary.
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = "db_primary"
+
+_routing = ContextVar("db_routing", default=None)
+_down_until = {}  # replica alias -> time.monotonic() it may be retried
+
+
+class Routing:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.replica_reads = False
+        self.wrote = False
+
+
+def replica_is_up(alias):
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError as e:
+        logger.warning("Replica %s is unavailable, reading from the primary: %s", alias, e)
+        _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+        return False
+    _down_until.pop(alias, None)
+    return True
+
+
+def pick_replica():
+    """A random reachable replica, or the primary if there is none."""
+    replicas = list(settings.DATABASE_REPLICAS)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if replica_is_up(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if (
+            routing is None
+            or not routing.replica_reads
+            or routing.pinned
+            or routing.wrote
+            or not settings.DATABASE_REPLICAS
+        ):
+            # Explicit, so objects loaded from a replica are not re-read there.
+            return DEFAULT_DB_ALIAS
+        return pick_replica()
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        # Explicit, so objects loaded from a replica are saved to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema by replication.
+        return db not in settings.DATABASE_REPLICAS
+
+
+def replica_reads(view):
+    """Let the view read from a replica unless the user is pinned to the primary."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        routing = _routing.get()
+        if routing is None:
+            return view(request, *args, **kwargs)
+        routing.replica_reads = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            routing.replica_reads = False
+    return wrapper
+
+
+class ReplicaPinMiddleware:
+    """
+    Track writes per request and pin the writer to the primary for a while.
+
+    Sits above SessionMiddleware so session saves count as writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing = Routing(pinned=PIN_COOKIE in request.COOKIES)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if routing.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
@@ -42,12 +42,15 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "movies.profiling.ProfilingMiddleware",
+    "bookmyseat.routers.ReplicaPinMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "movies.prerender.PrerenderedPageMiddleware",
 ]
 
 # ========================
@@ -88,9 +91,84 @@ else:
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            # A file-backed test database lets threaded tests share it
+            # (in-memory SQLite raises "table is locked" on concurrent writes).
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
         }
     }
 
+# Read replicas of the default database, as a comma-separated list of URLs.
+# Catalog pages and the dashboard read from them; users who just wrote
+# something stay on the primary for REPLICA_PIN_SECONDS (bookmyseat/routers.py).
+DATABASE_REPLICAS = []
+for number, url in enumerate(filter(None, os.getenv("DATABASE_REPLICA_URLS", "").split(",")), 1):
+    alias = f"replica{number}"
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=600)
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["bookmyseat.routers.ReplicaRouter"]
+# Should exceed the worst replication lag you are willing to hide.
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "10"))
+# How long an unreachable replica is skipped before it is tried again.
+REPLICA_RETRY_SECONDS = int(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+# ========================
+# CACHE
+# ========================
+# locmem is per process; point CACHE_BACKEND at the file-based (or any
+# shared) backend when running several workers.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "bookmyseat"),
+    }
+}
+
+# Upper bound on how long a seat-page snapshot is served from cache.
+SEAT_MAP_CACHE_TIMEOUT = int(os.getenv("SEAT_MAP_CACHE_TIMEOUT", "30"))
+
+# How long remaining-seat counts in the showtime browser may lag.
+SHOWTIMES_CACHE_TIMEOUT = int(os.getenv("SHOWTIMES_CACHE_TIMEOUT", "30"))
+
+# How often each process's search index checks the Movie table for changes
+# it was not told about through the cache (always the case with locmem).
+SEARCH_INDEX_CHECK_SECONDS = int(os.getenv("SEARCH_INDEX_CHECK_SECONDS", "30"))
+
+# Live seat updates (movies/live.py). The in-memory broadcaster only reaches
+# pages served by the same process.
+SEAT_EVENTS_BROADCASTER = "movies.live.InMemoryBroadcaster"
+SEAT_EVENTS_KEEPALIVE = 15  # seconds
+# Streams end after this long and the browser reconnects, so streams of
+# closed pages cannot pile up (Django 4.2 does not notice disconnects).
+SEAT_EVENTS_MAX_SECONDS = int(os.getenv("SEAT_EVENTS_MAX_SECONDS", "300"))
+
+# Virtual waiting room in front of seat booking (movies/waitingroom.py):
+# at most this many users per showtime pick seats at once, the rest queue.
+# 0 turns it off. The in-memory store counts per process.
+WAITING_ROOM_ACTIVE_USERS = int(os.getenv("WAITING_ROOM_ACTIVE_USERS", "100"))
+WAITING_ROOM_ADMISSION_SECONDS = int(os.getenv("WAITING_ROOM_ADMISSION_SECONDS", "600"))
+WAITING_ROOM_POLL_SECONDS = 10
+WAITING_ROOM_STORE = "movies.waitingroom.InMemoryWaitingRoomStore"
+
+# Catalog pages are invalidated by signals, but a locmem cache only sees the
+# bumps made in its own process, so there the timeout bounds how long other
+# workers serve an old page. With a shared cache it only evicts pages nobody
+# asks for any more.
+SHARED_CACHE = CACHES["default"]["BACKEND"] != "django.core.cache.backends.locmem.LocMemCache"
+PAGE_CACHE_TIMEOUT = int(os.getenv("PAGE_CACHE_TIMEOUT", "3600" if SHARED_CACHE else "30"))
+
+# ========================
+# PROFILING
+# ========================
+# Adds a Server-Timing header to every response and keeps the slowest
+# requests for the admin dashboard (see movies/profiling.py).
+PROFILING = os.getenv("PROFILING", "False").lower() == "true"
+PROFILING_SLOW_MS = int(os.getenv("PROFILING_SLOW_MS", "500"))
+PROFILING_BUFFER_SIZE = 50
+
 # ========================
 # PASSWORDS
 # ========================
@@ -119,10 +197,27 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# ========================
+# PRE-RENDERED PAGES
+# ========================
+# Anonymous visitors get the movie list and movie pages as static files
+# written by `manage.py prerender_pages` and refreshed on Movie changes
+# (movies/prerender.py). The refreshes need a writable PRERENDER_ROOT.
+PRERENDER_PAGES = os.getenv("PRERENDER_PAGES", "False").lower() == "true"
+PRERENDER_ROOT = Path(os.getenv("PRERENDER_ROOT", BASE_DIR / "prerendered"))
+PRERENDER_MAX_AGE = int(os.getenv("PRERENDER_MAX_AGE", "60"))
+
 # ========================
 # EMAIL
 # ========================
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Mail is queued in the outbox and delivered by `manage.py send_queued_mail`
+# through OUTBOX_DELIVERY_BACKEND.
+EMAIL_BACKEND = "users.mail.OutboxBackend"
+OUTBOX_DELIVERY_BACKEND = os.getenv(
+    "OUTBOX_DELIVERY_BACKEND", "django.core.mail.backends.smtp.EmailBackend"
+)
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BACKOFF = 60  # seconds, doubled after each failed attempt
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -135,6 +230,10 @@ DEFAULT_FROM_EMAIL = "BookMySeat <noreply@bookmyseat.com>"
 # ========================
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+# Point at a local fake Stripe server in tests and benchmarks.
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE")
+STRIPE_TIMEOUT = 20  # seconds
 
 # ========================
 # DEFAULT
@@ -1,10 +1,57 @@
-from django.contrib import admin
-from .models import Movie, Theater, Seat, Booking
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
+
+from .exports import export_response
+from .forms import GenerateShowsForm, HallLayoutForm
+from .models import Movie, Theater, Seat, Booking, Payment, HallLayout
+from .schedule import generate_shows, seat_numbers
 
 
 @admin.register(Movie)
 class MovieAdmin(admin.ModelAdmin):
     list_display = ['name', 'rating', 'cast', 'description']
+    actions = ['generate_showtimes']
+
+    @admin.action(description="Generate showtimes with seats")
+    def generate_showtimes(self, request, queryset):
+        form = GenerateShowsForm(request.POST if "apply" in request.POST else None)
+        if form.is_valid():
+            shows = seats = 0
+            for movie in queryset:
+                created = generate_shows(
+                    movie,
+                    form.cleaned_data["layout"],
+                    form.cleaned_data["halls"],
+                    form.cleaned_data["start"],
+                    form.cleaned_data["days"],
+                    form.cleaned_data["times"],
+                )
+                shows += created[0]
+                seats += created[1]
+            self.message_user(
+                request, f"Created {shows} shows with {seats} seats.", messages.SUCCESS
+            )
+            return None
+
+        return TemplateResponse(request, "admin/movies/generate_shows.html", {
+            **self.admin_site.each_context(request),
+            "title": "Generate showtimes",
+            "form": form,
+            "movies": queryset,
+            "opts": self.model._meta,
+            "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+        })
+
+
+@admin.register(HallLayout)
+class HallLayoutAdmin(admin.ModelAdmin):
+    form = HallLayoutForm
+    list_display = ['name', 'rows', 'seats_per_row', 'seat_count']
+
+    @admin.display(description="Seats")
+    def seat_count(self, layout):
+        return len(seat_numbers(layout))
 
 
 @admin.register(Theater)
@@ -12,9 +59,26 @@ class TheaterAdmin(admin.ModelAdmin):
     list_display = ['name', 'movie', 'time']
 
 
+class ExportMixin:
+    """Admin actions that stream the selected rows (see movies.exports)."""
+
+    export_kind = None
+    actions = ['export_csv', 'export_ndjson']
+
+    @admin.action(description="Export selected as CSV")
+    def export_csv(self, request, queryset):
+        return export_response(request, self.export_kind, queryset, "csv")
+
+    @admin.action(description="Export selected as NDJSON")
+    def export_ndjson(self, request, queryset):
+        return export_response(request, self.export_kind, queryset, "ndjson")
+
+
 @admin.register(Seat)
-class SeatAdmin(admin.ModelAdmin):
+class SeatAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ['theater', 'seat_number']
+    list_filter = ['theater__movie', 'theater']
+    export_kind = 'seats'
 
    
     exclude = [
@@ -26,5 +90,13 @@ class SeatAdmin(admin.ModelAdmin):
 
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ['user', 'seat', 'movie', 'theater', 'booked_at']
+    list_filter = ['booked_at', 'movie', 'theater']
+    export_kind = 'bookings'
+
+
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = ['session_id', 'user', 'theater', 'amount', 'status', 'created_at']
+    list_filter = ['status']
@@ -0,0 +1,100 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import CatalogFacet, Movie
+
+PAGE_SIZE = 12
+FACET_FIELDS = ("genre", "language")
+HOME_MOVIE_COUNT = 4
+
+
+def home_movies():
+    return Movie.objects.order_by("id")[:HOME_MOVIE_COUNT]
+
+
+def catalog_page(movies, after=None, page_size=PAGE_SIZE):
+    """
+    One keyset page of ``movies`` in id order.
+
+    Returns ``(page, next_after)``; ``next_after`` is the cursor for the next
+    page or ``None`` on the last one. Cost does not grow with the page number.
+    """
+    movies = movies.order_by("id")
+    if after is not None:
+        movies = movies.filter(id__gt=after)
+    page = list(movies[:page_size + 1])
+    next_after = page[page_size - 1].id if len(page) > page_size else None
+    return page[:page_size], next_after
+
+
+def parse_cursor(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_facet(value):
+    # movie_list filters case-insensitively, so "Action" and "action " are
+    # one facet; templates title-case the value for display.
+    return (value or "").strip().casefold()
+
+
+def facet_keys(values):
+    """``{(field, normalized value)}`` from a ``{field: value}`` mapping."""
+    return {(field, normalize_facet(values[field])) for field in FACET_FIELDS}
+
+
+def facet_values(movie):
+    return facet_keys({field: getattr(movie, field) for field in FACET_FIELDS})
+
+
+def adjust_facets(deltas):
+    """Apply ``{(kind, value): delta}`` to the facet counters."""
+    for (kind, value), delta in deltas.items():
+        if not delta or not value:
+            continue
+        facets = CatalogFacet.objects.filter(kind=kind, value=value)
+        if facets.update(count=F("count") + delta):
+            continue
+        try:
+            with transaction.atomic():
+                CatalogFacet.objects.create(kind=kind, value=value, count=delta)
+        except IntegrityError:
+            # Created concurrently; fall back to the increment.
+            facets.update(count=F("count") + delta)
+
+
+def facet_changes(old_values, new_values):
+    deltas = Counter()
+    for key in old_values:
+        deltas[key] -= 1
+    for key in new_values:
+        deltas[key] += 1
+    return deltas
+
+
+def get_facets():
+    """``{"genre": [facet, ...], "language": [...]}`` for movies that exist."""
+    facets = {field: [] for field in FACET_FIELDS}
+    for facet in CatalogFacet.objects.filter(count__gt=0):
+        facets[facet.kind].append(facet)
+    return facets
+
+
+def rebuild_facets():
+    """Recount every facet from the Movie table (e.g. after bulk imports)."""
+    counts = Counter()
+    for field in FACET_FIELDS:
+        for row in Movie.objects.values(field).annotate(count=Count("id")):
+            value = normalize_facet(row[field])
+            if value:
+                counts[(field, value)] += row["count"]
+    with transaction.atomic():
+        CatalogFacet.objects.all().delete()
+        CatalogFacet.objects.bulk_create(
+            CatalogFacet(kind=kind, value=value, count=count)
+            for (kind, value), count in counts.items()
+        )
@@ -0,0 +1,61 @@
+import heapq
+
+from django.utils import timezone
+
+from .models import Seat
+from .utils import RESERVATION_TIMEOUT, release_expired_seats
+
+
+class ExpiryScheduler:
+    """
+    Keeps a min-heap of upcoming hold expiries so the worker only wakes
+    when a reservation is actually due.
+
+    New holds are picked up by ``refresh()``, which only reads holds
+    placed after the newest one already scheduled. A hold can never expire
+    sooner than ``RESERVATION_TIMEOUT`` after it is placed, so refreshing
+    every ``max_sleep`` seconds (less than the timeout) never misses one by
+    more than ``max_sleep``. Every due wake-up releases *all* expired holds
+    with one UPDATE, so late-committed holds are still cleaned up.
+    """
+
+    def __init__(self, max_sleep=60):
+        self.max_sleep = max_sleep
+        self._heap = []
+        self._scheduled = set()
+        self._watermark = None
+
+    def refresh(self):
+        holds = Seat.objects.filter(is_reserved=True, reserved_at__isnull=False)
+        if self._watermark is not None:
+            holds = holds.filter(reserved_at__gt=self._watermark)
+
+        for reserved_at in holds.values_list("reserved_at", flat=True).distinct():
+            self.schedule(reserved_at + RESERVATION_TIMEOUT)
+            if self._watermark is None or reserved_at > self._watermark:
+                self._watermark = reserved_at
+
+    def schedule(self, expires_at):
+        if expires_at not in self._scheduled:
+            self._scheduled.add(expires_at)
+            heapq.heappush(self._heap, expires_at)
+
+    def next_due(self):
+        return self._heap[0] if self._heap else None
+
+    def tick(self, now=None):
+        """Release holds if anything is due; returns the number released."""
+        now = now or timezone.now()
+        due = False
+        while self._heap and self._heap[0] <= now:
+            self._scheduled.discard(heapq.heappop(self._heap))
+            due = True
+        return release_expired_seats(now) if due else 0
+
+    def seconds_until_next(self, now=None):
+        now = now or timezone.now()
+        next_due = self.next_due()
+        if next_due is None:
+            return self.max_sleep
+        wait = (next_due - now).total_seconds()
+        return max(0, min(wait, self.max_sleep))
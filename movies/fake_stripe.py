@@ -0,0 +1,143 @@
+"""
+A tiny in-process stand-in for the parts of the Stripe API that checkout
+uses, for tests and benchmarks. Point ``STRIPE_API_BASE`` at ``api_base``.
+
+    with FakeStripe(delay=0.2) as fake:
+        ...
+        fake.pay(session_id)
+        payload, signature = fake.webhook("checkout.session.completed", session_id, secret)
+"""
+import hashlib
+import hmac
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections under a checkout burst.
+    request_queue_size = 256
+
+
+class FakeStripe:
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.sessions = {}
+        self.create_calls = 0
+        self._idempotent = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def api_base(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def pay(self, session_id):
+        session = self.sessions[session_id]
+        session["payment_status"] = "paid"
+        session["status"] = "complete"
+        return session
+
+    def webhook(self, event_type, session_id, secret, timestamp=None):
+        """Return ``(payload, Stripe-Signature header)`` for a signed event."""
+        timestamp = int(timestamp or time.time())
+        payload = json.dumps({
+            "id": f"evt_test_{next(self._ids)}",
+            "object": "event",
+            "type": event_type,
+            "data": {"object": self.sessions[session_id]},
+        })
+        signature = hmac.new(
+            secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+        ).hexdigest()
+        return payload.encode(), f"t={timestamp},v1={signature}"
+
+    def create_session(self, params, idempotency_key):
+        with self._lock:
+            self.create_calls += 1
+            if idempotency_key in self._idempotent:
+                return self._idempotent[idempotency_key]
+
+            session_id = f"cs_test_{next(self._ids)}"
+            session = {
+                "id": session_id,
+                "object": "checkout.session",
+                "url": f"{self.api_base}/pay/{session_id}",
+                "status": "open",
+                "payment_status": "unpaid",
+                "amount_total": int(params.get("line_items[0][price_data][unit_amount]", 0))
+                * int(params.get("line_items[0][quantity]", 1)),
+                "customer_email": params.get("customer_email"),
+                "client_reference_id": params.get("client_reference_id"),
+                "success_url": params.get("success_url"),
+                "metadata": {
+                    key[len("metadata["):-1]: value
+                    for key, value in params.items()
+                    if key.startswith("metadata[")
+                },
+            }
+            self.sessions[session_id] = session
+            if idempotency_key:
+                self._idempotent[idempotency_key] = session
+            return session
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Request-Id", "req_fake")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                params = dict(parse_qsl(self.rfile.read(length).decode()))
+                time.sleep(fake.delay)
+                if self.path != "/v1/checkout/sessions":
+                    return self._respond(404, {"error": {"message": "Unknown path"}})
+                session = fake.create_session(params, self.headers.get("Idempotency-Key"))
+                self._respond(200, session)
+
+            def do_GET(self):
+                time.sleep(fake.delay)
+                prefix = "/v1/checkout/sessions/"
+                session = fake.sessions.get(self.path[len(prefix):]) if self.path.startswith(prefix) else None
+                if session is None:
+                    return self._respond(404, {"error": {
+                        "type": "invalid_request_error",
+                        "message": "No such checkout.session",
+                    }})
+                self._respond(200, session)
+
+        return Handler
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from django import forms
+from django.utils import timezone
+
+from .models import HallLayout
+from .schedule import parse_gaps
+
+
+class HallLayoutForm(forms.ModelForm):
+    class Meta:
+        model = HallLayout
+        fields = ['name', 'rows', 'seats_per_row', 'gaps']
+
+    def clean_gaps(self):
+        gaps = self.cleaned_data['gaps']
+        try:
+            parse_gaps(gaps)
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+        return gaps
+
+
+class GenerateShowsForm(forms.Form):
+    layout = forms.ModelChoiceField(queryset=HallLayout.objects.all())
+    halls = forms.CharField(help_text="Comma-separated hall names, e.g. Audi 1, Audi 2")
+    start = forms.DateField(initial=timezone.localdate, help_text="YYYY-MM-DD")
+    days = forms.IntegerField(min_value=1, max_value=31, initial=7)
+    times = forms.CharField(help_text="Comma-separated show times, e.g. 10:00, 13:30, 19:00")
+
+    def clean_halls(self):
+        halls = [hall.strip() for hall in self.cleaned_data['halls'].split(',') if hall.strip()]
+        if not halls:
+            raise forms.ValidationError("Enter at least one hall.")
+        return halls
+
+    def clean_times(self):
+        try:
+            return [
+                datetime.strptime(value.strip(), '%H:%M').time()
+                for value in self.cleaned_data['times'].split(',')
+                if value.strip()
+            ]
+        except ValueError:
+            raise forms.ValidationError("Use 24-hour times like 10:00, 19:30.")
@@ -0,0 +1,67 @@
+from collections import namedtuple
+
+from django.db.models import Q, Subquery
+from django.utils import timezone
+
+from .models import Booking, Theater
+
+HISTORY_PAGE_SIZE = 10
+UPCOMING, PAST = "upcoming", "past"
+
+# One card on the profile page: a show (theater + showtime) and the seats
+# the user booked for it.
+Show = namedtuple("Show", "theater movie seats booked_at")
+
+
+def parse_when(value):
+    return PAST if value == PAST else UPCOMING
+
+
+def booking_history(user, when=UPCOMING, after=None, page_size=HISTORY_PAGE_SIZE, now=None):
+    """
+    One keyset page of the user's bookings, grouped by show.
+
+    Upcoming shows run soonest first, past shows most recent first. ``after``
+    is the id of the last show on the previous page. Returns
+    ``(shows, next_after)`` in two queries whatever the page or the number of
+    seats booked.
+    """
+    now = now or timezone.now()
+    theaters = Theater.objects.filter(
+        id__in=Booking.objects.filter(user=user).values("theater_id")
+    ).select_related("movie").defer("seat_map")
+
+    if when == PAST:
+        theaters = theaters.filter(time__lt=now).order_by("-time", "-id")
+    else:
+        theaters = theaters.filter(time__gte=now).order_by("time", "id")
+
+    if after is not None:
+        after_time = Subquery(Theater.objects.filter(id=after).values("time")[:1])
+        if when == PAST:
+            theaters = theaters.filter(Q(time__lt=after_time) | Q(time=after_time, id__lt=after))
+        else:
+            theaters = theaters.filter(Q(time__gt=after_time) | Q(time=after_time, id__gt=after))
+
+    page = list(theaters[:page_size + 1])
+    next_after = page[page_size - 1].id if len(page) > page_size else None
+    page = page[:page_size]
+
+    seats = {theater.id: [] for theater in page}
+    booked_at = {}
+    bookings = (
+        Booking.objects.filter(user=user, theater_id__in=seats)
+        .select_related("seat")
+        .order_by("seat_id")
+    )
+    for booking in bookings:
+        seats[booking.theater_id].append(booking.seat.seat_number)
+        booked_at[booking.theater_id] = max(
+            booked_at.get(booking.theater_id, booking.booked_at), booking.booked_at
+        )
+
+    shows = [
+        Show(theater, theater.movie, seats[theater.id], booked_at.get(theater.id))
+        for theater in page
+    ]
+    return shows, next_after
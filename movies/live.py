@@ -0,0 +1,161 @@
+"""
+Live seat-state updates over server-sent events.
+
+Whenever a theater's seat map changes (see ``movies.seatmap``), the seats
+that changed are published after commit as one compact delta,
+``{"booked": [ids], "held": [ids], "free": [ids]}``, to every open seat
+page for that theater. Pages subscribe through ``seat_events`` (ASGI only)
+and get a snapshot of the current state first, then the deltas.
+
+The broadcaster is ``SEAT_EVENTS_BROADCASTER``. The default one fans out
+inside the current process only; with several ASGI workers, swap in one
+backed by a shared pub/sub (e.g. Redis) that implements the same two
+methods: ``publish(channel, message)`` and ``subscribe(channel)``, which
+returns an object with ``async get()`` and ``close()``.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+SUBSCRIBER_QUEUE_SIZE = 100
+RETRY_MS = 3000
+
+# Sent instead of a delta when the subscriber has to start over (its queue
+# overflowed, or seats were added or removed).
+RESET = json.dumps({"reset": True})
+
+
+def seat_channel(theater_id):
+    return f"seats:{theater_id}"
+
+
+class Subscription:
+    def __init__(self, broadcaster, channel, loop, queue_size):
+        self.broadcaster = broadcaster
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+
+    def put(self, message):
+        # Runs on the subscriber's event loop.
+        if self.queue.full():
+            # A slow client gets one reset instead of an unbounded backlog.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESET
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+
+class InMemoryBroadcaster:
+    """Fans messages out to the subscribers in this process."""
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._channels = defaultdict(set)
+
+    def subscribe(self, channel):
+        """Subscribe the running event loop to ``channel``."""
+        subscription = Subscription(self, channel, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel, message):
+        """
+        Send ``message`` (a string) to every subscriber of ``channel``.
+
+        Safe to call from any thread; each event loop is woken once, however
+        many of its subscribers are listening. Returns the subscriber count.
+        """
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        by_loop = defaultdict(list)
+        for subscription in subscribers:
+            by_loop[subscription.loop].append(subscription)
+        for loop, group in by_loop.items():
+            if loop.is_closed():
+                for subscription in group:
+                    self.unsubscribe(subscription)
+                continue
+            loop.call_soon_threadsafe(_deliver, group, message)
+        return len(subscribers)
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._channels.get(channel, ()))
+
+
+def _deliver(subscriptions, message):
+    for subscription in subscriptions:
+        subscription.put(message)
+
+
+@lru_cache(maxsize=None)
+def get_broadcaster():
+    return import_string(settings.SEAT_EVENTS_BROADCASTER)()
+
+
+def publish_seat_changes(theater_id, changes):
+    """Publish a seat delta (or ``None`` for a reset) for the theater."""
+    message = RESET if changes is None else json.dumps(changes, separators=(",", ":"))
+    get_broadcaster().publish(seat_channel(theater_id), message)
+
+
+# ======================
+# EVENT STREAM
+# ======================
+
+def sse(event, data):
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def event_stream(subscription, snapshot, keepalive=None, lifetime=None):
+    """
+    Yield the SSE stream for one subscriber: the snapshot, then deltas.
+
+    A comment line is sent every ``keepalive`` seconds of silence so proxies
+    keep the connection open. Django 4.2 does not notice a client going
+    away while it streams (and ASGI servers drop writes to a closed
+    connection silently), so the stream ends after ``lifetime`` seconds
+    whatever happens; a page that is still open reconnects after
+    ``RETRY_MS`` and gets a fresh snapshot, and a closed one is forgotten.
+    """
+    keepalive = keepalive or settings.SEAT_EVENTS_KEEPALIVE
+    lifetime = lifetime or settings.SEAT_EVENTS_MAX_SECONDS
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + lifetime
+    try:
+        yield f"retry: {RETRY_MS}\n" + sse("snapshot", json.dumps(snapshot, separators=(",", ":")))
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                message = await asyncio.wait_for(subscription.get(), min(keepalive, remaining))
+            except asyncio.TimeoutError:
+                if loop.time() < deadline:
+                    yield ": keepalive\n\n"
+                continue
+            yield sse("reset" if message == RESET else "seats", message)
+    finally:
+        subscription.close()
@@ -0,0 +1,31 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from movies.rollups import BACKFILL_CHUNK_SIZE, backfill_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute hourly/daily booking rollups from existing Booking rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since", help="Only rebuild buckets from this date on (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE,
+            help="Bookings fetched per database round trip.",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            try:
+                day = datetime.strptime(options["since"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--since must be a date like 2026-01-31.")
+            since = datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+        read = backfill_rollups(since, chunk_size=options["chunk_size"])
+        self.stdout.write(f"Rolled up {read} bookings.")
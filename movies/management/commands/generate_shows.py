@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.models import HallLayout, Movie
+from movies.schedule import SEAT_CHUNK_SIZE, generate_shows
+
+
+class Command(BaseCommand):
+    help = "Create showtimes (with all their seats) for a movie from a hall layout."
+
+    def add_arguments(self, parser):
+        parser.add_argument("movie", type=int, help="Movie id.")
+        parser.add_argument("layout", help="HallLayout name.")
+        parser.add_argument(
+            "--hall", action="append", required=True, dest="halls",
+            help="Hall (theater) name; repeat for several halls.",
+        )
+        parser.add_argument("--start", required=True, help="First day (YYYY-MM-DD).")
+        parser.add_argument("--days", type=int, default=7)
+        parser.add_argument(
+            "--times", required=True, help="Comma-separated show times, e.g. 10:00,13:30,19:00.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=SEAT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            movie = Movie.objects.get(id=options["movie"])
+            layout = HallLayout.objects.get(name=options["layout"])
+        except (Movie.DoesNotExist, HallLayout.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        try:
+            start = datetime.strptime(options["start"], "%Y-%m-%d").date()
+            times = [
+                datetime.strptime(value.strip(), "%H:%M").time()
+                for value in options["times"].split(",")
+            ]
+            shows, seats = generate_shows(
+                movie, layout, options["halls"], start, options["days"], times,
+                chunk_size=options["chunk_size"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"Created {shows} shows with {seats} seats.")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from movies.pagecache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = "Report hit ratio and render time saved by the catalog page/fragment cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Clear the counters after reporting.")
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        if not stats:
+            self.stdout.write("No cached pages served yet.")
+
+        for name, counts in stats.items():
+            hits, misses = counts["hits"], counts["misses"]
+            ratio = hits / (hits + misses) if hits + misses else 0
+            # A hit saves roughly what an average miss cost to render.
+            avg_ms = counts["render_us"] / misses / 1000 if misses else 0
+            self.stdout.write(
+                f"{name}: {hits} hits, {misses} misses ({ratio:.0%} hit ratio), "
+                f"avg render {avg_ms:.1f} ms, ~{hits * avg_ms / 1000:.2f} s saved"
+            )
+
+        if options["reset"]:
+            reset_stats()
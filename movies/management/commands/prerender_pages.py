@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from movies.prerender import detail_path, list_path, prerender_catalog, write_page
+
+
+class Command(BaseCommand):
+    help = "Render the movie list and movie pages to static HTML under PRERENDER_ROOT."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--movie", type=int, action="append", dest="movie_ids",
+            help="Only this movie's page and the list (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        if options["movie_ids"]:
+            written = write_page(list_path())
+            for movie_id in options["movie_ids"]:
+                written += write_page(detail_path(movie_id))
+        else:
+            written = prerender_catalog()
+        self.stdout.write(f"Pre-rendered {written} pages.")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.stats import rebuild_stats, stats_drift
+
+
+class Command(BaseCommand):
+    help = "Verify the dashboard booking counters against the Booking table and fix any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only report drift; exit with an error if there is any.",
+        )
+
+    def handle(self, *args, **options):
+        drift = stats_drift()
+        for (kind, object_id), (stored, expected) in sorted(drift.items()):
+            self.stdout.write(f"{kind} {object_id}: stored {stored}, expected {expected}")
+
+        if not drift:
+            self.stdout.write("Booking stats are up to date.")
+        elif options["check"]:
+            raise CommandError(f"{len(drift)} booking counters have drifted.")
+        else:
+            rebuild_stats()
+            self.stdout.write(f"Rebuilt booking stats ({len(drift)} counters fixed).")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from movies.catalog import get_facets, rebuild_facets
+
+
+class Command(BaseCommand):
+    help = "Recount genre/language facets from the Movie table (e.g. after a bulk import)."
+
+    def handle(self, *args, **options):
+        rebuild_facets()
+        for kind, facets in get_facets().items():
+            self.stdout.write(f"{kind}: " + ", ".join(f"{f.value} ({f.count})" for f in facets))
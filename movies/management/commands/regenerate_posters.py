@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from movies.models import Movie
+from movies.pagecache import HOME_TAG, bump_tags, movie_tag
+from movies.prerender import refresh_movie_pages
+from movies.renditions import regenerate_renditions
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Rebuild resized WebP/JPEG poster renditions for every movie in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=None,
+            help="Worker processes (default: one per CPU).",
+        )
+        parser.add_argument(
+            "--missing", action="store_true",
+            help="Only movies without renditions yet.",
+        )
+
+    def handle(self, *args, **options):
+        movies = Movie.objects.exclude(image="").order_by("id")
+        if options["missing"]:
+            movies = movies.filter(poster_renditions__isnull=True)
+        pairs = list(movies.values_list("id", "image"))
+
+        done, failed, batch = 0, 0, []
+        for movie_id, renditions, error in regenerate_renditions(pairs, options["workers"]):
+            if error:
+                failed += 1
+                self.stderr.write(f"Movie {movie_id}: {error}")
+                continue
+            batch.append(Movie(id=movie_id, poster_renditions=renditions))
+            if len(batch) == BATCH_SIZE:
+                done += self.save(batch)
+                batch = []
+        done += self.save(batch)
+
+        self.stdout.write(f"Rendered posters for {done} movies ({failed} failed).")
+
+    def save(self, batch):
+        # bulk_update skips post_save, so expire the cached pages here.
+        Movie.objects.bulk_update(batch, ["poster_renditions"])
+        bump_tags(HOME_TAG, *(movie_tag(movie.id) for movie in batch))
+        refresh_movie_pages([movie.id for movie in batch])
+        return len(batch)
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.expiry import ExpiryScheduler
+from movies.utils import release_expired_seats
+
+
+class Command(BaseCommand):
+    help = "Release expired seat holds, either once or as a long-running worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Release everything that has expired and exit.",
+        )
+        parser.add_argument(
+            "--max-sleep",
+            type=float,
+            default=60,
+            help="Upper bound in seconds between checks for new holds.",
+        )
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            released = release_expired_seats()
+            self.stdout.write(f"Released {released} expired seat(s).")
+            return
+
+        scheduler = ExpiryScheduler(max_sleep=options["max_sleep"])
+        # Anything that expired while the worker was down goes first.
+        release_expired_seats()
+
+        try:
+            while True:
+                scheduler.refresh()
+                released = scheduler.tick()
+                if released:
+                    self.stdout.write(f"Released {released} expired seat(s).")
+                time.sleep(scheduler.seconds_until_next())
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping expiry worker.")
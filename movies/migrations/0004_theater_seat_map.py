@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_movie_trailer_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='theater',
+            name='seat_map',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_payment'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-booked_at'], name='booking_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seat',
+            index=models.Index(condition=models.Q(('is_reserved', True)), fields=['reserved_by', 'theater', 'reserved_at'], name='seat_user_hold_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seat',
+            index=models.Index(condition=models.Q(('is_reserved', True)), fields=['reserved_at'], name='seat_hold_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_seat_booking_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
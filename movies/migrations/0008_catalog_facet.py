@@ -0,0 +1,49 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:22
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_facets(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    CatalogFacet = apps.get_model('movies', 'CatalogFacet')
+    # Keyed like movies.catalog.normalize_facet: trimmed and casefolded.
+    counts = Counter()
+    for field in ('genre', 'language'):
+        for row in Movie.objects.values(field).annotate(count=Count('id')):
+            value = (row[field] or '').strip().casefold()
+            if value:
+                counts[(field, value)] += row['count']
+    CatalogFacet.objects.bulk_create(
+        CatalogFacet(kind=kind, value=value, count=count)
+        for (kind, value), count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_movie_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['kind', 'value'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='catalogfacet',
+            constraint=models.UniqueConstraint(fields=('kind', 'value'), name='unique_catalog_facet'),
+        ),
+        migrations.RunPython(count_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:28
+
+from django.db import migrations, models
+from django.db.models import Count
+
+PRICE_PER_SEAT = 200
+
+
+def count_bookings(apps, schema_editor):
+    Booking = apps.get_model('movies', 'Booking')
+    BookingStat = apps.get_model('movies', 'BookingStat')
+    stats = []
+    for kind, field in (('movie', 'movie_id'), ('theater', 'theater_id')):
+        stats += [
+            BookingStat(kind=kind, object_id=row[field], bookings=row['count'])
+            for row in Booking.objects.values(field).annotate(count=Count('id'))
+        ]
+    for stat in stats:
+        stat.revenue = stat.bookings * PRICE_PER_SEAT
+    BookingStat.objects.bulk_create(stats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_catalog_facet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('movie', 'Movie'), ('theater', 'Theater')], max_length=10)),
+                ('object_id', models.IntegerField(default=0)),
+                ('bookings', models.IntegerField(default=0)),
+                ('revenue', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', '-bookings'], name='booking_stat_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bookingstat',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_booking_stat'),
+        ),
+        migrations.RunPython(count_bookings, migrations.RunPython.noop),
+    ]
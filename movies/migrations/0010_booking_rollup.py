@@ -0,0 +1,30 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_booking_stat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('theater_id', models.IntegerField()),
+                ('movie_id', models.IntegerField()),
+                ('holds', models.IntegerField(default=0)),
+                ('bookings', models.IntegerField(default=0)),
+                ('revenue', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='bookingrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'bucket', 'theater_id'), name='unique_booking_rollup'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0010_booking_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HallLayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('rows', models.PositiveSmallIntegerField()),
+                ('seats_per_row', models.PositiveSmallIntegerField()),
+                ('gaps', models.CharField(blank=True, max_length=500)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0011_hall_layout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='poster_renditions',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0012_movie_poster_renditions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='theater',
+            index=models.Index(fields=['movie', 'time'], name='theater_movie_time_idx'),
+        ),
+    ]
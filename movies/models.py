@@ -12,6 +12,10 @@ class Movie(models.Model):
     genre = models.CharField(max_length=50)      
     language = models.CharField(max_length=50)
     trailer_url = models.URLField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # {"hash": ..., "widths": [...]} of the resized posters written by
+    # movies.renditions; empty until the image is processed.
+    poster_renditions = models.JSONField(null=True, blank=True, editable=False)
     
 
 
@@ -19,10 +23,33 @@ class Movie(models.Model):
     def __str__(self):
         return self.name
 
+class HallLayout(models.Model):
+    """Seat grid of a hall, used by movies.schedule to generate show seats."""
+
+    name = models.CharField(max_length=100, unique=True)
+    rows = models.PositiveSmallIntegerField()
+    seats_per_row = models.PositiveSmallIntegerField()
+    # Comma-separated cells without a seat: "A1, B7" for single seats or a
+    # bare number ("5") for an aisle running through every row.
+    gaps = models.CharField(max_length=500, blank=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.rows} x {self.seats_per_row})'
+
+
 class Theater(models.Model):
     name = models.CharField(max_length=255)
     movie = models.ForeignKey(Movie,on_delete=models.CASCADE,related_name='theaters')
     time= models.DateTimeField()
+    # Packed seat state maintained by movies.seatmap; built lazily.
+    seat_map = models.JSONField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Upcoming shows of a movie (showtime browser); past shows are
+            # skipped by the index range instead of filtered row by row.
+            models.Index(fields=["movie", "time"], name="theater_movie_time_idx"),
+        ]
 
     def __str__(self):
         return f'{self.name} - {self.movie.name} at {self.time}'
@@ -44,6 +71,22 @@ class Seat(models.Model):
         User, null=True, blank=True, on_delete=models.SET_NULL
     )
 
+    class Meta:
+        indexes = [
+            # A user's holds in a theater (confirm, payment, finalize).
+            models.Index(
+                fields=["reserved_by", "theater", "reserved_at"],
+                condition=models.Q(is_reserved=True),
+                name="seat_user_hold_idx",
+            ),
+            # Expiry worker: holds ordered by age.
+            models.Index(
+                fields=["reserved_at"],
+                condition=models.Q(is_reserved=True),
+                name="seat_hold_expiry_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.seat_number
 
@@ -55,5 +98,108 @@ class Booking(models.Model):
     movie=models.ForeignKey(Movie,on_delete=models.CASCADE)
     theater=models.ForeignKey(Theater,on_delete=models.CASCADE)
     booked_at=models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Profile booking history, newest first.
+            models.Index(fields=["user", "-booked_at"], name="booking_user_recent_idx"),
+        ]
+
+    def __str__(self):
+        return f'Booking by{self.user.username} for {self.seat.seat_number} at {self.theater.name}'
+
+
+class Payment(models.Model):
+    PENDING = "pending"
+    PAID = "paid"
+    UNFULFILLED = "unfulfilled"  # paid, but the holds had lapsed
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (PAID, "Paid"),
+        (UNFULFILLED, "Paid, not fulfilled"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    theater = models.ForeignKey(Theater, on_delete=models.CASCADE)
+    session_id = models.CharField(max_length=255, unique=True)
+    seat_ids = models.JSONField(default=list)
+    amount = models.PositiveIntegerField()
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.session_id} ({self.status})'
+
+
+class CatalogFacet(models.Model):
+    """Number of movies per genre / language, kept up to date by movies.signals."""
+
+    kind = models.CharField(max_length=20)  # "genre" or "language"
+    value = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "value"], name="unique_catalog_facet"),
+        ]
+        ordering = ["kind", "value"]
+
+    def __str__(self):
+        return f'{self.kind}: {self.value} ({self.count})'
+
+
+class BookingStat(models.Model):
+    """
+    Booking count and revenue per movie / theater, kept up to date by
+    movies.signals so the dashboard never scans Booking. The site total is
+    the sum of the movie rows.
+    """
+
+    MOVIE, THEATER = "movie", "theater"
+    KIND_CHOICES = [(MOVIE, "Movie"), (THEATER, "Theater")]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.IntegerField(default=0)  # movie / theater id
+    bookings = models.IntegerField(default=0)
+    revenue = models.IntegerField(default=0)  # INR
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="unique_booking_stat"),
+        ]
+        indexes = [
+            # Dashboard: top movies / theaters by bookings.
+            models.Index(fields=["kind", "-bookings"], name="booking_stat_rank_idx"),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}: {self.bookings} bookings'
+
+
+class BookingRollup(models.Model):
+    """
+    Seats held and booked per theater (showtime) per hour / day bucket,
+    written incrementally by movies.rollups for the dashboard charts.
+    """
+
+    HOUR, DAY = "hour", "day"
+    PERIOD_CHOICES = [(HOUR, "Hour"), (DAY, "Day")]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField()  # start of the hour / day (UTC)
+    theater_id = models.IntegerField()
+    movie_id = models.IntegerField()
+    holds = models.IntegerField(default=0)
+    bookings = models.IntegerField(default=0)
+    revenue = models.IntegerField(default=0)  # INR
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "bucket", "theater_id"], name="unique_booking_rollup"
+            ),
+        ]
+
     def __str__(self):
-        return f'Booking by{self.user.username} for {self.seat.seat_number} at {self.theater.name}'
\ No newline at end of file
+        return f'{self.period} {self.bucket:%Y-%m-%d %H:%M} theater {self.theater_id}'
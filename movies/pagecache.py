@@ -0,0 +1,151 @@
+"""
+Tag-versioned caching for the catalog pages.
+
+Every cached page or fragment depends on a few tags (``home``,
+``movie:<id>``, ``theaters:<movie id>``). Each tag has a version counter in
+the cache and the current versions are part of the cache key, so bumping a
+tag from a signal makes exactly the pages that depend on it unreachable.
+
+Anonymous visitors get whole pages from the cache. Logged-in pages carry a
+per-user navbar (and CSRF token), so only their ``{% cachefragment %}``
+blocks are cached.
+"""
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+HOME_TAG = "home"
+STATS_KEY = "pagecache:stats"
+STAT_FIELDS = ("hits", "misses", "render_us")
+
+
+def movie_tag(movie_id):
+    return f"movie:{movie_id}"
+
+
+def theaters_tag(movie_id):
+    return f"theaters:{movie_id}"
+
+
+def _tag_key(tag):
+    return f"pagecache:tag:{tag}"
+
+
+def page_version(tags):
+    """The current versions of ``tags`` as one string, for use in a key."""
+    versions = cache.get_many([_tag_key(tag) for tag in tags])
+    return "-".join(f"{tag}.{versions.get(_tag_key(tag), 0)}" for tag in tags)
+
+
+def bump_tags(*tags):
+    """Expire every page and fragment that depends on any of ``tags``."""
+    for tag in tags:
+        key = _tag_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+
+
+# ======================
+# STATS
+# ======================
+
+def _incr(key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def record(name, hit, render_seconds=0.0):
+    """Count a hit or a miss (with its render time) for ``name``."""
+    names = cache.get(f"{STATS_KEY}:names", set())
+    if name not in names:
+        cache.set(f"{STATS_KEY}:names", names | {name}, timeout=None)
+    if hit:
+        _incr(f"{STATS_KEY}:{name}:hits")
+    else:
+        _incr(f"{STATS_KEY}:{name}:misses")
+        _incr(f"{STATS_KEY}:{name}:render_us", int(render_seconds * 1_000_000))
+
+
+def get_stats():
+    """``{name: {"hits", "misses", "render_us"}}`` for everything recorded."""
+    names = sorted(cache.get(f"{STATS_KEY}:names", set()))
+    keys = [f"{STATS_KEY}:{name}:{field}" for name in names for field in STAT_FIELDS]
+    values = cache.get_many(keys)
+    return {
+        name: {
+            field: values.get(f"{STATS_KEY}:{name}:{field}", 0)
+            for field in STAT_FIELDS
+        }
+        for name in names
+    }
+
+
+def reset_stats():
+    names = cache.get(f"{STATS_KEY}:names", set())
+    cache.delete_many(
+        [f"{STATS_KEY}:{name}:{field}" for name in names for field in STAT_FIELDS]
+        + [f"{STATS_KEY}:names"]
+    )
+
+
+# ======================
+# PAGES
+# ======================
+
+def _cacheable(request):
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.GET
+        and not request.user.is_authenticated
+    )
+
+
+def cache_anonymous_page(name, tags, timeout=None):
+    """
+    Serve the view's page to anonymous visitors from the cache.
+
+    ``tags`` is called with the view's URL kwargs and returns the tags the
+    page depends on. Only plain 200 responses that set no cookies (and used
+    no CSRF token) are stored, for ``timeout`` seconds (default
+    ``PAGE_CACHE_TIMEOUT``); pass a shorter one for pages that show data
+    no tag tracks.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+
+            key = f"pagecache:page:{name}:{page_version(tags(*args, **kwargs))}"
+            cached = cache.get(key)
+            if cached is not None:
+                record(f"page:{name}", hit=True)
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+
+            start = time.perf_counter()
+            response = view(request, *args, **kwargs)
+            if (
+                response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+            ):
+                record(f"page:{name}", hit=False, render_seconds=time.perf_counter() - start)
+                cache.set(
+                    key,
+                    (response.content, response["Content-Type"]),
+                    settings.PAGE_CACHE_TIMEOUT if timeout is None else timeout,
+                )
+            return response
+        return wrapper
+    return decorator
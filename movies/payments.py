@@ -0,0 +1,217 @@
+"""
+Stripe Checkout, off the request thread.
+
+Sessions are created through an async ``StripeClient`` backed by an httpx
+client, so a slow Stripe response parks a coroutine instead of a worker
+when the app runs under ASGI (``bookmyseat/asgi.py``); connections are
+only pooled across requests there. Bookings are
+finalized by ``complete_checkout``, which both the signed webhook and the
+success redirect call; whichever arrives first does the work.
+"""
+import asyncio
+import hashlib
+import logging
+import weakref
+
+import stripe
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Payment, Seat
+from .profiling import timed
+from .stats import PRICE_PER_SEAT
+from .utils import active_hold_q, finalize_bookings
+
+logger = logging.getLogger(__name__)
+
+# One client, and so one connection pool, per event loop: httpx pools can
+# not be shared across loops. Under ASGI the loop lives as long as the
+# process, so connections are reused. Under WSGI each async view runs in a
+# fresh loop, so a client serves one request and nothing is pooled.
+_clients = weakref.WeakKeyDictionary()  # loop -> (client, closer)
+
+
+async def _close_with_loop(http_client):
+    # Suspended until the loop finalizes its async generators (asyncio.run
+    # does so before closing the loop), then closes the httpx client.
+    try:
+        yield
+    finally:
+        await http_client.close_async()
+
+
+async def get_stripe_client():
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(loop)
+    if entry is None:
+        base_addresses = None
+        if settings.STRIPE_API_BASE:
+            base_addresses = {"api": settings.STRIPE_API_BASE}
+        http_client = stripe.HTTPXClient(timeout=settings.STRIPE_TIMEOUT)
+        client = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            base_addresses=base_addresses,
+            http_client=http_client,
+            max_network_retries=2,
+        )
+        closer = _close_with_loop(http_client)
+        await closer.__anext__()
+        entry = _clients[loop] = (client, closer)
+    return entry[0]
+
+
+def prepare_checkout(user, theater_id):
+    """
+    Return ``(seat_ids, amount, idempotency_key)`` for the user's active
+    holds, or ``None`` if there is nothing to pay for.
+
+    The key is derived from the hold itself, so double clicks and retries
+    for the same hold get the same Stripe session back.
+    """
+    holds = list(
+        Seat.objects.filter(active_hold_q(), theater_id=theater_id, reserved_by=user)
+        .order_by("id")
+        .values_list("id", "reserved_at")
+    )
+    if not holds:
+        return None
+
+    digest = hashlib.sha256(
+        f"{user.id}:{theater_id}:{holds!r}".encode()
+    ).hexdigest()
+    seat_ids = [seat_id for seat_id, _ in holds]
+    return seat_ids, len(seat_ids) * PRICE_PER_SEAT, f"checkout-{digest[:40]}"
+
+
+async def create_checkout_session(user, theater_id, seat_ids, amount, idempotency_key,
+                                  success_url, cancel_url):
+    client = await get_stripe_client()
+    with timed("stripe"):
+        return await client.v1.checkout.sessions.create_async(
+            params={
+                "payment_method_types": ["card"],
+                "line_items": [{
+                    "price_data": {
+                        "currency": "inr",
+                        "product_data": {
+                            "name": "Movie Tickets",
+                        },
+                        "unit_amount": amount * 100,
+                    },
+                    "quantity": 1,
+                }],
+                "mode": "payment",
+                "success_url": success_url,
+                "cancel_url": cancel_url,
+                "customer_email": user.email or None,
+                "client_reference_id": str(user.id),
+                "metadata": {
+                    "theater_id": str(theater_id),
+                    "seat_ids": ",".join(str(seat_id) for seat_id in seat_ids),
+                },
+            },
+            options={"idempotency_key": idempotency_key},
+        )
+
+
+async def retrieve_checkout_session(session_id):
+    client = await get_stripe_client()
+    with timed("stripe"):
+        return await client.v1.checkout.sessions.retrieve_async(session_id)
+
+
+def record_payment(user, theater_id, seat_ids, amount, session_id):
+    payment, _ = Payment.objects.get_or_create(
+        session_id=session_id,
+        defaults={
+            "user": user,
+            "theater_id": theater_id,
+            "seat_ids": seat_ids,
+            "amount": amount,
+        },
+    )
+    return payment
+
+
+def complete_checkout(session_id):
+    """
+    Finalize the bookings paid for by a checkout session, exactly once.
+
+    Returns the bookings created by this call; repeated webhooks and
+    redirects for the same session return an empty list.
+    """
+    with transaction.atomic():
+        try:
+            payment = Payment.objects.select_for_update().get(session_id=session_id)
+        except Payment.DoesNotExist:
+            logger.warning("Checkout session %s has no payment record", session_id)
+            return []
+        if payment.status != Payment.PENDING:
+            return []
+
+        bookings = finalize_bookings(payment.user, payment.theater_id, payment.seat_ids)
+        payment.completed_at = timezone.now()
+        if len(bookings) == len(payment.seat_ids):
+            payment.status = Payment.PAID
+        else:
+            payment.status = Payment.UNFULFILLED
+            logger.error(
+                "Session %s paid for %d seats but only %d were still held",
+                session_id, len(payment.seat_ids), len(bookings),
+            )
+        payment.save(update_fields=["status", "completed_at"])
+
+        if bookings:
+            send_booking_confirmation(payment.user, bookings)
+
+    return bookings
+
+
+def send_booking_confirmation(user, bookings):
+    if not user.email:
+        return
+
+    theater = bookings[0].theater
+    seat_numbers = [booking.seat.seat_number for booking in bookings]
+    # Queued in the outbox, so this never waits on SMTP (the "email"
+    # timing shows it if EMAIL_BACKEND is pointed at SMTP directly).
+    with timed("email"):
+        send_mail(
+            subject="🎟 Ticket Booking Confirmation",
+            message=f"""Hi {user.username},
+
+Your booking is confirmed!
+
+Movie: {theater.movie.name}
+Theater: {theater.name}
+Seats: {', '.join(seat_numbers)}
+Total: ₹{len(seat_numbers) * PRICE_PER_SEAT}
+
+Enjoy your show!
+
+- BookMySeat Team
+""",
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[user.email],
+            fail_silently=False,
+        )
+
+
+def handle_webhook(payload, signature):
+    """
+    Verify and apply a Stripe webhook. Raises ``ValueError`` or
+    ``stripe.SignatureVerificationError`` for bad payloads.
+    """
+    event = stripe.Webhook.construct_event(
+        payload, signature, settings.STRIPE_WEBHOOK_SECRET
+    )
+    if event["type"] in (
+        "checkout.session.completed",
+        "checkout.session.async_payment_succeeded",
+    ):
+        session = event["data"]["object"]
+        if session["payment_status"] == "paid":
+            return complete_checkout(session["id"])
+    return []
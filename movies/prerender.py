@@ -0,0 +1,161 @@
+"""
+Static copies of the catalog pages for anonymous visitors.
+
+The movie list (first page, no filters) and each movie's detail page are
+rendered to ``PRERENDER_ROOT/<url path>/index.html`` (plus a gzipped copy)
+by ``manage.py prerender_pages``, and re-rendered after commit whenever a
+Movie is saved or deleted, only for that movie's page and the list.
+Theater changes touch no pre-rendered page: showtimes and seat counts
+stay on the dynamic theater list.
+
+``PrerenderedPageMiddleware`` serves the files through WhiteNoise, with
+its ETag/Last-Modified handling and ``PRERENDER_MAX_AGE``, to GET requests
+that have no query string and no session cookie. Everyone else, and any
+page that has no file yet, falls through to the views.
+
+``PRERENDER_ROOT`` is kept apart from ``STATIC_ROOT``, so
+``collectstatic --clear`` leaves it alone and the pages are not also
+served under ``STATIC_URL``.
+"""
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpRequest
+from django.urls import resolve, reverse
+from django.utils.cache import patch_vary_headers
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .models import Movie
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.html"
+
+
+def page_file(path):
+    return Path(settings.PRERENDER_ROOT) / path.lstrip("/") / INDEX_FILE
+
+
+def list_path():
+    return reverse("movie_list")
+
+
+def detail_path(movie_id):
+    return reverse("movie_detail", args=[movie_id])
+
+
+def render_page(path):
+    """The page an anonymous visitor gets at ``path``, or None if there is none."""
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = path
+    request.META = {"SERVER_NAME": "localhost", "SERVER_PORT": "80"}
+    request.user = AnonymousUser()
+    match = resolve(path)
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+    except Http404:
+        return None
+    if response.status_code != 200 or response.cookies:
+        return None
+    return response.content
+
+
+def _replace(target, content):
+    # Write beside the target and rename, so a request never reads half a page.
+    with tempfile.NamedTemporaryFile(dir=target.parent, delete=False) as tmp:
+        tmp.write(content)
+    os.replace(tmp.name, target)
+
+
+def write_page(path):
+    """(Re)write the file for ``path``, or remove it if the page is gone."""
+    target = page_file(path)
+    content = render_page(path)
+    if content is None:
+        for stale in (target, target.with_name(INDEX_FILE + ".gz")):
+            stale.unlink(missing_ok=True)
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    _replace(target.with_name(INDEX_FILE + ".gz"), gzip.compress(content, mtime=0))
+    _replace(target, content)
+    return True
+
+
+def prerender_catalog():
+    """Render every catalog page and drop pages of deleted movies. Returns the count."""
+    movie_ids = list(Movie.objects.order_by("id").values_list("id", flat=True))
+    written = write_page(list_path())
+    for movie_id in movie_ids:
+        written += write_page(detail_path(movie_id))
+
+    detail_root = page_file(detail_path(0)).parent.parent
+    if detail_root.is_dir():
+        current = {str(movie_id) for movie_id in movie_ids}
+        for stale in detail_root.iterdir():
+            if stale.is_dir() and stale.name not in current:
+                shutil.rmtree(stale)
+    return written
+
+
+def refresh_movie_pages(movie_ids):
+    """Re-render the list and the given movies' pages, if pre-rendering is on."""
+    if not settings.PRERENDER_PAGES:
+        return
+    try:
+        write_page(list_path())
+        for movie_id in movie_ids:
+            write_page(detail_path(movie_id))
+    except OSError as e:
+        # e.g. a read-only deploy; the files refresh on the next build.
+        logger.warning("Could not refresh pre-rendered pages for movies %s: %s", movie_ids, e)
+
+
+class PrerenderedPageMiddleware(WhiteNoise):
+    """
+    Serve pre-rendered pages. Sits below the security, CSRF and
+    clickjacking middleware so the files get the same headers as pages
+    served by the views.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PRERENDER_PAGES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        super().__init__(
+            application=None,
+            max_age=settings.PRERENDER_MAX_AGE,
+            allow_all_origins=False,
+        )
+
+    def __call__(self, request):
+        if (
+            request.method in ("GET", "HEAD")
+            and not request.GET
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        ):
+            static_file = self.find_page(request.path_info)
+            if static_file is not None:
+                response = WhiteNoiseMiddleware.serve(static_file, request)
+                # Logged-in visitors get a different page at the same URL.
+                patch_vary_headers(response, ["Cookie"])
+                return response
+        return self.get_response(request)
+
+    def find_page(self, url):
+        # One stat per request for the single file the URL can map to;
+        # pages are re-rendered in place, so nothing is scanned or cached.
+        if not url.endswith("/") or not self.url_is_canonical(url):
+            return None
+        path = page_file(url)
+        if not path.is_file():
+            return None
+        return self.get_static_file(str(path), url)
@@ -0,0 +1,160 @@
+"""
+Per-request profiling: SQL, template and outbound call time.
+
+With ``PROFILING = True`` every response gets a ``Server-Timing`` header
+(shown in the browser's network panel) and requests slower than
+``PROFILING_SLOW_MS`` are kept, with their slowest queries, in a bounded
+list in the cache that ``admin_dashboard`` shows to staff. With profiling
+off the middleware removes itself at startup and nothing is patched, so
+the only cost left is a context-variable lookup in ``timed()``.
+
+Outbound calls are timed where they are made::
+
+    with timed("stripe"):
+        ...
+"""
+import heapq
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+from django.utils import timezone
+
+SLOW_KEY = "profiling:slow"
+TOP_QUERIES = 5
+SQL_PREVIEW = 300
+
+_current = ContextVar("profile", default=None)
+
+
+class Profile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = []  # (seconds, sql)
+        self.template = 0.0
+        self.template_depth = 0
+        self.external = {}  # kind -> seconds
+
+    @property
+    def db(self):
+        return sum(seconds for seconds, _ in self.queries)
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper() for the request.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((time.perf_counter() - start, sql))
+
+    def server_timing(self, total):
+        entries = [
+            f'db;dur={self.db * 1000:.1f};desc="{len(self.queries)} queries"',
+            f"template;dur={self.template * 1000:.1f}",
+        ]
+        entries += [f"{kind};dur={seconds * 1000:.1f}" for kind, seconds in self.external.items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def timed(kind):
+    """Add the time spent in the block to the current request's ``kind``."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.external[kind] = profile.external.get(kind, 0.0) + time.perf_counter() - start
+
+
+def _patch_template_render():
+    # Only the outermost render is timed; {% include %} renders nest inside it.
+    if getattr(Template.render, "profiled", False):
+        return
+    render = Template.render
+
+    def profiled_render(self, context):
+        profile = _current.get()
+        if profile is None:
+            return render(self, context)
+        profile.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template += time.perf_counter() - start
+
+    profiled_render.profiled = True
+    Template.render = profiled_render
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+        _patch_template_render()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = Profile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        total = time.perf_counter() - profile.start
+        response["Server-Timing"] = profile.server_timing(total)
+        if total * 1000 >= settings.PROFILING_SLOW_MS:
+            record_slow(request, response, profile, total)
+        return response
+
+
+# ======================
+# SLOW REQUEST LOG
+# ======================
+
+def record_slow(request, response, profile, total):
+    entry = {
+        "at": timezone.now(),
+        "method": request.method,
+        "path": request.get_full_path()[:200],
+        "status": response.status_code,
+        "total_ms": round(total * 1000, 1),
+        "db_ms": round(profile.db * 1000, 1),
+        "query_count": len(profile.queries),
+        "template_ms": round(profile.template * 1000, 1),
+        "external_ms": {kind: round(seconds * 1000, 1) for kind, seconds in profile.external.items()},
+        "top_queries": [
+            {"ms": round(seconds * 1000, 2), "sql": sql[:SQL_PREVIEW]}
+            for seconds, sql in heapq.nlargest(TOP_QUERIES, profile.queries, key=lambda q: q[0])
+        ],
+    }
+    # Oldest entries drop off; a lost update under concurrency only loses
+    # one sample.
+    entries = cache.get(SLOW_KEY, [])
+    entries.append(entry)
+    cache.set(SLOW_KEY, entries[-settings.PROFILING_BUFFER_SIZE:], timeout=None)
+
+
+def slow_requests():
+    """The recorded slow requests, slowest first."""
+    return sorted(cache.get(SLOW_KEY, []), key=lambda entry: -entry["total_ms"])
+
+
+def clear_slow_requests():
+    cache.delete(SLOW_KEY)
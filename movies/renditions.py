@@ -0,0 +1,98 @@
+"""
+Resized WebP/JPEG renditions of movie posters.
+
+Cards show posters at a few hundred pixels, so each upload is resized once
+to ``RENDITION_WIDTHS`` in both formats and the templates pick one through
+``srcset`` (see ``movies/templatetags/posters.py``). Files are named after
+a hash of the poster's content, so re-uploading the same image reuses its
+renditions and a new image never hits a stale browser cache.
+"""
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# What Pillow raises for uploads it cannot render: OSError (including
+# UnidentifiedImageError and truncated files), ValueError, SyntaxError for
+# malformed headers, and DecompressionBombError past MAX_IMAGE_PIXELS.
+IMAGE_ERRORS = (OSError, ValueError, SyntaxError, Image.DecompressionBombError)
+
+RENDITION_WIDTHS = (200, 400, 800)
+RENDITION_DIR = "renditions"
+FORMATS = {
+    # extension: (Pillow format, save options)
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def rendition_name(digest, width, ext):
+    return f"{RENDITION_DIR}/{digest[:2]}/{digest}-{width}.{ext}"
+
+
+def rendition_url(renditions, width, ext):
+    return default_storage.url(rendition_name(renditions["hash"], width, ext))
+
+
+def make_renditions(source):
+    """
+    Write the renditions of the image in the file-like ``source`` and
+    return ``{"hash": ..., "widths": [...]}`` for ``Movie.poster_renditions``.
+
+    Images are never upscaled; one narrower than the smallest width gets a
+    single rendition at its own size.
+    """
+    source.seek(0)
+    data = source.read()
+    source.seek(0)
+    digest = hashlib.sha256(data).hexdigest()[:24]
+
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    widths = [width for width in RENDITION_WIDTHS if width <= image.width] or [image.width]
+
+    for width in widths:
+        resized = None
+        for ext, (format, options) in FORMATS.items():
+            name = rendition_name(digest, width, ext)
+            if default_storage.exists(name):
+                continue
+            if resized is None:
+                height = round(image.height * width / image.width)
+                resized = image.resize((width, height), Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, format, **options)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    return {"hash": digest, "widths": widths}
+
+
+def _render_stored(movie_id, image_name):
+    # Runs in a worker process: file work only, the parent writes the rows.
+    try:
+        with default_storage.open(image_name) as source:
+            return movie_id, make_renditions(source), None
+    except Exception as e:
+        return movie_id, None, f"{type(e).__name__}: {e}"
+
+
+def regenerate_renditions(movies, workers=None):
+    """
+    Rebuild renditions for ``movies`` (``(id, image name)`` pairs) in a
+    process pool. Yields ``(movie_id, renditions, error)`` in order.
+    """
+    # Workers only touch storage; rows are written by the caller.
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        futures = [pool.submit(_render_stored, movie_id, name) for movie_id, name in movies]
+        for future in futures:
+            yield future.result()
+
+
+def _setup_worker():
+    import django
+
+    django.setup()
@@ -0,0 +1,196 @@
+"""
+Hourly and daily booking rollups for the admin dashboard.
+
+Holds and bookings are added to their hour and day buckets as they happen
+(see movies.signals), so the charts read a few dozen rollup rows instead of
+scanning Booking and Seat. ``backfill_rollups`` recomputes booking counts
+from existing rows; holds have no history and only accrue from then on.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Booking, BookingRollup, Movie, Theater
+from .seatmap import get_seat_map
+from .stats import PRICE_PER_SEAT
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def bucket_start(when, period):
+    when = when.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if period == BookingRollup.DAY:
+        when = when.replace(hour=0)
+    return when
+
+
+def bump_rollups(theater_id, movie_id, when, holds=0, bookings=0):
+    """Add ``holds`` and ``bookings`` to the hour and day buckets of ``when``."""
+    change = {
+        "holds": F("holds") + holds,
+        "bookings": F("bookings") + bookings,
+        "revenue": F("revenue") + bookings * PRICE_PER_SEAT,
+    }
+    for period in (BookingRollup.HOUR, BookingRollup.DAY):
+        rows = BookingRollup.objects.filter(
+            period=period, bucket=bucket_start(when, period), theater_id=theater_id
+        )
+        if rows.update(**change):
+            continue
+        try:
+            with transaction.atomic():
+                BookingRollup.objects.create(
+                    period=period, bucket=bucket_start(when, period),
+                    theater_id=theater_id, movie_id=movie_id,
+                    holds=holds, bookings=bookings,
+                    revenue=bookings * PRICE_PER_SEAT,
+                )
+        except IntegrityError:
+            # Created concurrently; fall back to the increment.
+            rows.update(**change)
+
+
+def record_booked(bookings, sign=1):
+    shows = Counter(
+        (booking.theater_id, booking.movie_id, bucket_start(booking.booked_at, BookingRollup.HOUR))
+        for booking in bookings
+    )
+    for (theater_id, movie_id, hour), count in shows.items():
+        bump_rollups(theater_id, movie_id, hour, bookings=sign * count)
+
+
+# ======================
+# BACKFILL
+# ======================
+
+def backfill_rollups(since=None, chunk_size=BACKFILL_CHUNK_SIZE):
+    """
+    Recompute booking counts (and revenue) of every bucket from ``since``
+    on from the Booking table. Returns the number of bookings read.
+
+    Bookings are streamed in ``chunk_size`` batches and only the per-bucket
+    counters are kept in memory, so this works on tables of any size.
+    """
+    bookings = Booking.objects.order_by()
+    if since is not None:
+        since = bucket_start(since, BookingRollup.DAY)
+        bookings = bookings.filter(booked_at__gte=since)
+
+    counts = Counter()
+    movies = {}
+    read = 0
+    rows = bookings.values_list("theater_id", "movie_id", "booked_at")
+    for theater_id, movie_id, booked_at in rows.iterator(chunk_size=chunk_size):
+        for period in (BookingRollup.HOUR, BookingRollup.DAY):
+            counts[(period, bucket_start(booked_at, period), theater_id)] += 1
+        movies[theater_id] = movie_id
+        read += 1
+
+    with transaction.atomic():
+        existing = BookingRollup.objects.all()
+        if since is not None:
+            existing = existing.filter(bucket__gte=since)
+        existing.update(bookings=0, revenue=0)
+
+        stored = {
+            (row.period, row.bucket, row.theater_id): row
+            for row in existing.only("id", "period", "bucket", "theater_id")
+        }
+        changed, created = [], []
+        for key, count in counts.items():
+            row = stored.get(key)
+            if row is None:
+                period, bucket, theater_id = key
+                row = BookingRollup(
+                    period=period, bucket=bucket,
+                    theater_id=theater_id, movie_id=movies[theater_id],
+                )
+                created.append(row)
+            else:
+                changed.append(row)
+            row.bookings = count
+            row.revenue = count * PRICE_PER_SEAT
+        BookingRollup.objects.bulk_update(changed, ["bookings", "revenue"], batch_size=chunk_size)
+        BookingRollup.objects.bulk_create(created, batch_size=chunk_size)
+
+    return read
+
+
+# ======================
+# CHARTS
+# ======================
+
+def series(period, count, now=None):
+    """
+    The last ``count`` buckets of ``period`` (oldest first) as dicts with
+    bucket, holds, bookings, revenue, conversion (bookings per hold) and
+    width (percent of the busiest bucket). Empty buckets are filled in.
+    """
+    step = timedelta(hours=1) if period == BookingRollup.HOUR else timedelta(days=1)
+    last = bucket_start(now or timezone.now(), period)
+    buckets = [last - step * i for i in range(count - 1, -1, -1)]
+
+    totals = {
+        row["bucket"]: row
+        for row in BookingRollup.objects.filter(period=period, bucket__gte=buckets[0])
+        .values("bucket")
+        .annotate(holds=Sum("holds"), bookings=Sum("bookings"), revenue=Sum("revenue"))
+    }
+    peak = max([row["bookings"] for row in totals.values()] + [1])
+    points = []
+    for bucket in buckets:
+        row = totals.get(bucket, {})
+        holds, bookings = row.get("holds", 0), row.get("bookings", 0)
+        points.append({
+            "bucket": bucket,
+            "holds": holds,
+            "bookings": bookings,
+            "revenue": row.get("revenue", 0),
+            "conversion": bookings / holds if holds else None,
+            "width": round(100 * bookings / peak),  # bar length in the chart
+        })
+    return points
+
+
+def top_movies(since, limit=5):
+    """Movies with most bookings since ``since``, with ``.bookings`` set."""
+    ranked = list(
+        BookingRollup.objects.filter(period=BookingRollup.HOUR, bucket__gte=since)
+        .values_list("movie_id")
+        .annotate(total=Sum("bookings"))
+        .filter(total__gt=0)
+        .order_by("-total", "movie_id")[:limit]
+    )
+    movies = Movie.objects.in_bulk([movie_id for movie_id, _ in ranked])
+    top = []
+    for movie_id, total in ranked:
+        if movie_id in movies:
+            movies[movie_id].bookings = total
+            top.append(movies[movie_id])
+    return top
+
+
+def showtime_occupancy(limit=10, now=None):
+    """
+    Booked share of the next ``limit`` showtimes, read from the packed seat
+    maps that movies.seatmap keeps current rather than from Seat rows.
+    """
+    theaters = (
+        Theater.objects.filter(time__gte=now or timezone.now())
+        .select_related("movie")
+        .order_by("time", "id")[:limit]
+    )
+    shows = []
+    for theater in theaters:
+        seat_map = get_seat_map(theater)
+        capacity, booked = len(seat_map), seat_map.booked_count()
+        shows.append({
+            "theater": theater,
+            "capacity": capacity,
+            "booked": booked,
+            "occupancy": round(100 * booked / capacity) if capacity else 0,
+        })
+    return shows
@@ -0,0 +1,110 @@
+"""
+Generate showtimes and their seats from a hall layout.
+
+A chain schedules thousands of shows a week, so theaters and seats are
+inserted with chunked ``bulk_create`` calls, one transaction per batch of
+shows, instead of one ``save()`` (and its signals) per seat.
+"""
+import re
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Seat, Theater
+from .pagecache import bump_tags, theaters_tag
+
+SEAT_CHUNK_SIZE = 5000
+GAP_RE = re.compile(r"^(?:[A-Z]+\d+|\d+)$")
+
+
+def row_label(index):
+    """0 -> "A", 25 -> "Z", 26 -> "AA", like spreadsheet columns."""
+    label = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        label = chr(65 + rem) + label
+    return label
+
+
+def parse_gaps(gaps):
+    """Split ``HallLayout.gaps`` into (aisle columns, single seat codes)."""
+    columns, seats = set(), set()
+    for token in gaps.replace(" ", "").upper().split(","):
+        if not token:
+            continue
+        if not GAP_RE.match(token):
+            raise ValueError(f"Invalid gap {token!r}: use a seat like 'A1' or a column number.")
+        if token.isdigit():
+            columns.add(int(token))
+        else:
+            seats.add(token)
+    return columns, seats
+
+
+def seat_numbers(layout):
+    """Seat numbers of the layout in row-major order, gaps left out."""
+    columns, skipped = parse_gaps(layout.gaps)
+    numbers = []
+    for row in range(layout.rows):
+        label = row_label(row)
+        for column in range(1, layout.seats_per_row + 1):
+            number = f"{label}{column}"
+            if column not in columns and number not in skipped:
+                numbers.append(number)
+    return numbers
+
+
+def show_times(start, days, times):
+    """Aware datetimes for ``times`` (``datetime.time``) on ``days`` days from ``start``."""
+    tz = timezone.get_current_timezone()
+    return [
+        timezone.make_aware(datetime.combine(start + timedelta(days=day), at), tz)
+        for day in range(days)
+        for at in times
+    ]
+
+
+def generate_shows(movie, layout, halls, start, days, times, chunk_size=SEAT_CHUNK_SIZE):
+    """
+    Create a show for ``movie`` in every hall at every time for ``days``
+    days from ``start``, each with the layout's seats.
+
+    Shows that already exist (same movie, hall and time) are skipped, so
+    re-running a schedule is safe. Returns ``(shows, seats)`` created.
+    """
+    numbers = seat_numbers(layout)
+    when = show_times(start, days, times)
+    if not numbers or not when or not halls:
+        return 0, 0
+
+    existing = set(
+        Theater.objects.filter(movie=movie, name__in=halls, time__range=(min(when), max(when)))
+        .values_list("name", "time")
+    )
+    pending = [
+        Theater(name=hall, movie=movie, time=at)
+        for at in when
+        for hall in halls
+        if (hall, at) not in existing
+    ]
+
+    shows_per_batch = max(1, chunk_size // len(numbers))
+    for i in range(0, len(pending), shows_per_batch):
+        with transaction.atomic():
+            theaters = Theater.objects.bulk_create(pending[i:i + shows_per_batch])
+            Seat.objects.bulk_create(
+                (
+                    Seat(theater_id=theater.id, seat_number=number)
+                    for theater in theaters
+                    for number in numbers
+                ),
+                batch_size=chunk_size,
+            )
+
+    # bulk_create sends no signals; new shows start with seat_map=None and
+    # build it on first view, but the movie's theater list must expire.
+    if pending:
+        transaction.on_commit(lambda: bump_tags(theaters_tag(movie.id)))
+    return len(pending), len(pending) * len(numbers)
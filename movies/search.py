@@ -0,0 +1,236 @@
+"""
+In-process search over the movie catalog.
+
+An inverted index maps each token to the movies containing it (weighted by
+field), and a trigram index maps trigrams to tokens so misspelt or partial
+query terms still find candidates. The index lives in each process, is
+kept current on Movie save/delete, and catches up with changes made by
+other processes through a version counter in the cache. A per-process
+cache never sees that counter move, so every
+``SEARCH_INDEX_CHECK_SECONDS`` the index also compares the newest
+``updated_at`` and the row count with what it has indexed.
+"""
+import heapq
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Movie
+
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "cast": 2.0,
+    "genre": 1.5,
+    "language": 1.5,
+    "description": 1.0,
+}
+# Minimum trigram similarity for a fuzzy match (pg_trgm uses 0.3).
+SIMILARITY_THRESHOLD = 0.35
+VERSION_KEY = "movie-search:version"
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = defaultdict(dict)  # token -> {movie_id: weight}
+        self.token_trigrams = defaultdict(set)  # trigram -> {token}
+        self.documents = {}  # movie_id -> {token: weight}
+        self.version = None
+        self.watermark = None
+        self.checked = float("-inf")  # time.monotonic() of the last table check
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, movie_id, fields):
+        """(Re)index one movie from a ``{field: text}`` mapping."""
+        weights = defaultdict(float)
+        for field, text in fields.items():
+            for token in tokenize(text):
+                weights[token] += FIELD_WEIGHTS.get(field, 1.0)
+
+        with self._lock:
+            self.remove(movie_id)
+            self.documents[movie_id] = dict(weights)
+            for token, weight in weights.items():
+                if token not in self.postings:
+                    for gram in trigrams(token):
+                        self.token_trigrams[gram].add(token)
+                self.postings[token][movie_id] = weight
+
+    def remove(self, movie_id):
+        with self._lock:
+            for token in self.documents.pop(movie_id, {}):
+                docs = self.postings[token]
+                docs.pop(movie_id, None)
+                if not docs:
+                    del self.postings[token]
+                    for gram in trigrams(token):
+                        self.token_trigrams[gram].discard(token)
+
+    def expand(self, term):
+        """Indexed tokens matching ``term`` exactly, by prefix or fuzzily, with a 0-1 score."""
+        matches = {}
+        if term in self.postings:
+            matches[term] = 1.0
+
+        counts = defaultdict(int)
+        for gram in trigrams(term):
+            for token in self.token_trigrams.get(gram, ()):
+                counts[token] += 1
+
+        term_grams = len(trigrams(term))
+        for token, shared in counts.items():
+            if token in matches:
+                continue
+            if len(term) >= 3 and token.startswith(term):
+                matches[token] = 0.9
+                continue
+            score = shared / (term_grams + len(trigrams(token)) - shared)
+            if score >= SIMILARITY_THRESHOLD:
+                matches[token] = score * 0.8
+        return matches
+
+    def search(self, query, limit=50, allowed=None):
+        """
+        Return ``[(movie_id, score), ...]`` for movies matching every term,
+        among the ids in ``allowed`` if given.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        total = max(len(self.documents), 1)
+        with self._lock:
+            expanded = []
+            for term in terms:
+                matches = [
+                    (self.postings[token], match) for token, match in self.expand(term).items()
+                ]
+                if not matches:
+                    return []
+                expanded.append(matches)
+
+            # Score the rarest term first, then only look at its candidates.
+            expanded.sort(key=lambda matches: sum(len(docs) for docs, _ in matches))
+            scores = None
+            for matches in expanded:
+                weighted = [
+                    (docs, match * math.log(1 + total / len(docs))) for docs, match in matches
+                ]
+                if scores is None:
+                    term_scores = defaultdict(float)
+                    for docs, factor in weighted:
+                        for movie_id, weight in docs.items():
+                            if weight * factor > term_scores[movie_id]:
+                                term_scores[movie_id] = weight * factor
+                    scores = term_scores
+                    continue
+
+                next_scores = {}
+                for movie_id, score in scores.items():
+                    best = max(
+                        (docs.get(movie_id, 0) * factor for docs, factor in weighted),
+                        default=0,
+                    )
+                    if best:
+                        next_scores[movie_id] = score + best
+                scores = next_scores
+                if not scores:
+                    return []
+
+        # Filter before the cut, so filtered results are not crowded out.
+        if allowed is not None:
+            scores = {movie_id: score for movie_id, score in scores.items() if movie_id in allowed}
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def sync(self):
+        """
+        Catch up with catalog changes made by other processes.
+
+        A no-op unless the cached version moved since the last sync, so a
+        search normally costs one cache read and no queries. Otherwise one
+        cheap aggregate every ``SEARCH_INDEX_CHECK_SECONDS`` catches changes
+        the cache did not carry over.
+        """
+        now = time.monotonic()
+        version = cache.get(VERSION_KEY, 0)
+        if version == self.version and now < self.checked + settings.SEARCH_INDEX_CHECK_SECONDS:
+            return
+
+        with self._lock:
+            self.checked = now
+            if version == self.version:
+                table = Movie.objects.aggregate(latest=Max("updated_at"), count=Count("id"))
+                if (table["latest"], table["count"]) == (self.watermark, len(self.documents)):
+                    return
+
+            changed = Movie.objects.all()
+            if self.watermark is not None:
+                changed = changed.filter(updated_at__gte=self.watermark)
+            for movie in changed.values("id", "updated_at", *FIELD_WEIGHTS):
+                self.add(movie["id"], {field: movie[field] for field in FIELD_WEIGHTS})
+                if self.watermark is None or movie["updated_at"] > self.watermark:
+                    self.watermark = movie["updated_at"]
+
+            if Movie.objects.count() != len(self.documents):
+                live = set(Movie.objects.values_list("id", flat=True))
+                for movie_id in set(self.documents) - live:
+                    self.remove(movie_id)
+
+            self.version = version
+
+
+_index = SearchIndex()
+
+
+def get_search_index():
+    _index.sync()
+    return _index
+
+
+def movie_saved(movie):
+    _apply_change(lambda: _index.add(
+        movie.id, {field: getattr(movie, field) for field in FIELD_WEIGHTS}
+    ))
+
+
+def movie_deleted(movie_id):
+    _apply_change(lambda: _index.remove(movie_id))
+
+
+def _apply_change(change):
+    """Apply a Movie change to this process's index and tell the others."""
+    synced = _index.version
+    if synced is not None:
+        change()
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        version = 1 if cache.add(VERSION_KEY, 1, timeout=None) else None
+
+    # Nobody else changed the catalog in between, so we are still current.
+    if synced is not None and version == (synced or 0) + 1:
+        _index.version = version
+
+
+def search_movies(query, limit=50, allowed=None):
+    """Movie ids for ``query``, best match first, among ``allowed`` ids if given."""
+    return [movie_id for movie_id, _ in get_search_index().search(query, limit, allowed)]
@@ -0,0 +1,88 @@
+"""
+Compact JSON seat data for polling clients and the seat page.
+
+    {
+      "theater": 7,
+      "rows": [["A", 1, 101, 20], ["B", 1, 121, 20]],
+      "state": "20f2h18b"
+    }
+
+``rows`` are runs of seats whose ids and numbers both go up by one:
+row label, first number, first seat id and count. A seat number that is
+not a label followed by digits gets a run of its own with number ``null``.
+``state`` is run-length encoded over the seats in id order: ``f`` free,
+``h`` held, ``b`` booked (stale holds count as free).
+
+The body is built from the packed seat map, never from ``Seat`` rows, and
+cached per seat-map version; its hash is a strong ETag, so an unchanged
+poll costs two cache reads and a 304.
+"""
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .seatmap import get_cached_theater, get_seat_map, seat_map_version
+from .utils import hold_cutoff
+
+SEAT_NUMBER_RE = re.compile(r"^([A-Za-z]*)(\d+)$")
+
+
+def encode_rows(seat_map):
+    rows = []
+    last = None  # (label, number, id) of the previous seat in a run
+    for seat_id, seat_number in zip(seat_map.ids, seat_map.numbers):
+        match = SEAT_NUMBER_RE.match(seat_number)
+        if match is None:
+            rows.append([seat_number, None, seat_id, 1])
+            last = None
+            continue
+        label, number = match.group(1), int(match.group(2))
+        if last == (label, number - 1, seat_id - 1):
+            rows[-1][3] += 1
+        else:
+            rows.append([label, number, seat_id, 1])
+        last = (label, number, seat_id)
+    return rows
+
+
+def encode_state(seat_map, held):
+    runs = []
+    code, length = None, 0
+    for pos in range(len(seat_map)):
+        bit = 1 << pos
+        current = "b" if seat_map.booked & bit else "h" if held & bit else "f"
+        if current == code:
+            length += 1
+            continue
+        if length:
+            runs.append(f"{length}{code}")
+        code, length = current, 1
+    if length:
+        runs.append(f"{length}{code}")
+    return "".join(runs)
+
+
+def seat_payload(theater_id, now=None):
+    """
+    Return ``(etag, body)`` for the theater's seat data. Raises Http404 for
+    an unknown theater.
+    """
+    key = f"seatjson:{theater_id}:v{seat_map_version(theater_id)}"
+    seat_map = get_seat_map(get_cached_theater(theater_id))
+    held = seat_map.active_held(hold_cutoff(now))
+
+    # Holds expire with time alone, so the active holds are part of the key.
+    cached = cache.get(key)
+    if cached is not None and cached[0] == held:
+        return cached[1], cached[2]
+
+    body = json.dumps(
+        {"theater": theater_id, "rows": encode_rows(seat_map), "state": encode_state(seat_map, held)},
+        separators=(",", ":"),
+    ).encode()
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    cache.set(key, (held, etag, body), settings.SEAT_MAP_CACHE_TIMEOUT)
+    return etag, body
@@ -0,0 +1,287 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+
+from .live import publish_seat_changes
+from .models import Seat, Theater
+
+SeatCell = namedtuple("SeatCell", ["id", "seat_number", "is_booked", "is_held"])
+
+
+def _popcount(value):
+    return bin(value).count("1")
+
+
+class SeatMap:
+    """
+    Compact seat state for one theater, stored on ``Theater.seat_map``.
+
+    Seats are addressed by their position in id order. Booked and held seats
+    are packed into two integer bitmaps; ``held_at`` keeps the hold time of
+    each held position so stale holds read as free without touching ``Seat``.
+    """
+
+    def __init__(self, ids=None, numbers=None, booked=0, held=0, held_at=None):
+        self.ids = list(ids or [])
+        self.numbers = list(numbers or [])
+        self.booked = booked
+        self.held = held
+        self.held_at = dict(held_at or {})
+        self._positions = {seat_id: pos for pos, seat_id in enumerate(self.ids)}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from ``(id, seat_number, is_booked, is_reserved, reserved_at)`` rows."""
+        seat_map = cls()
+        for seat_id, number, is_booked, is_reserved, reserved_at in rows:
+            seat_map._positions[seat_id] = len(seat_map.ids)
+            seat_map.ids.append(seat_id)
+            seat_map.numbers.append(number)
+            seat_map.set_state(seat_id, is_booked, reserved_at if is_reserved else None)
+        return seat_map
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            ids=data["ids"],
+            numbers=data["numbers"],
+            booked=int(data["booked"], 16),
+            held=int(data["held"], 16),
+            held_at={int(pos): at for pos, at in data["held_at"].items()},
+        )
+
+    def to_json(self):
+        return {
+            "ids": self.ids,
+            "numbers": self.numbers,
+            "booked": format(self.booked, "x"),
+            "held": format(self.held, "x"),
+            "held_at": {str(pos): at for pos, at in self.held_at.items()},
+        }
+
+    def __contains__(self, seat_id):
+        return seat_id in self._positions
+
+    def __len__(self):
+        return len(self.ids)
+
+    def set_state(self, seat_id, is_booked, reserved_at=None):
+        pos = self._positions[seat_id]
+        bit = 1 << pos
+        self.booked = self.booked | bit if is_booked else self.booked & ~bit
+        if reserved_at is None:
+            self.held &= ~bit
+            self.held_at.pop(pos, None)
+        else:
+            self.held |= bit
+            self.held_at[pos] = reserved_at.timestamp()
+
+    def mark_held(self, seat_ids, reserved_at):
+        for seat_id in seat_ids:
+            self.set_state(seat_id, False, reserved_at)
+
+    def mark_booked(self, seat_ids):
+        for seat_id in seat_ids:
+            self.set_state(seat_id, True)
+
+    def release(self, seat_ids):
+        for seat_id in seat_ids:
+            self.set_state(seat_id, self.is_booked(seat_id))
+
+    def active_held(self, cutoff):
+        """Bitmap of holds placed at or after ``cutoff``."""
+        cutoff = cutoff.timestamp()
+        stale = 0
+        for pos, at in self.held_at.items():
+            if at < cutoff:
+                stale |= 1 << pos
+        return self.held & ~stale
+
+    def is_booked(self, seat_id):
+        return bool(self.booked >> self._positions[seat_id] & 1)
+
+    def is_free(self, seat_id, cutoff):
+        bit = 1 << self._positions[seat_id]
+        return not (self.booked | self.active_held(cutoff)) & bit
+
+    def booked_count(self):
+        return _popcount(self.booked)
+
+    def held_count(self, cutoff):
+        return _popcount(self.active_held(cutoff))
+
+    def available_count(self, cutoff):
+        return len(self.ids) - _popcount(self.booked | self.active_held(cutoff))
+
+    def changes(self, booked, held):
+        """
+        Seats whose state differs from the ``booked`` and ``held`` bitmaps
+        of an earlier version of this map, as ``{state: [seat ids]}`` with
+        states "booked", "held" and "free". Empty if nothing changed.
+        """
+        changes = {}
+        changed = (self.booked ^ booked) | (self.held ^ held)
+        while changed:
+            bit = changed & -changed
+            changed ^= bit
+            if self.booked & bit:
+                state = "booked"
+            elif self.held & bit:
+                state = "held"
+            else:
+                state = "free"
+            changes.setdefault(state, []).append(self.ids[bit.bit_length() - 1])
+        return changes
+
+    def snapshot(self, cutoff):
+        """Ids of booked and actively held seats, for live updates."""
+        held = self.active_held(cutoff)
+        return {
+            "booked": [seat_id for pos, seat_id in enumerate(self.ids) if self.booked >> pos & 1],
+            "held": [seat_id for pos, seat_id in enumerate(self.ids) if held >> pos & 1],
+        }
+
+    def seats(self, cutoff):
+        held = self.active_held(cutoff)
+        for pos, (seat_id, number) in enumerate(zip(self.ids, self.numbers)):
+            yield SeatCell(
+                seat_id, number, bool(self.booked >> pos & 1), bool(held >> pos & 1)
+            )
+
+
+def build_seat_map(theater_id):
+    rows = (
+        Seat.objects.filter(theater_id=theater_id)
+        .order_by("id")
+        .values_list("id", "seat_number", "is_booked", "is_reserved", "reserved_at")
+    )
+    return SeatMap.from_rows(rows)
+
+
+def rebuild_seat_map(theater_id):
+    with transaction.atomic():
+        # Lock first so the Seat read below sees every committed change.
+        before = list(
+            Theater.objects.select_for_update().filter(id=theater_id).values_list("seat_map", flat=True)
+        )
+        seat_map = build_seat_map(theater_id)
+        Theater.objects.filter(id=theater_id).update(seat_map=seat_map.to_json())
+        transaction.on_commit(lambda: bump_seat_map_version(theater_id))
+        if before and before[0] is not None:
+            old = SeatMap.from_json(before[0])
+            if old.ids == seat_map.ids:
+                publish_changes(theater_id, seat_map.changes(old.booked, old.held))
+            else:
+                publish_changes(theater_id, None)
+    return seat_map
+
+
+def reset_seat_map(theater_id):
+    """Drop the stored map (e.g. seats were added) so the next read rebuilds it."""
+    Theater.objects.filter(id=theater_id).update(seat_map=None)
+    transaction.on_commit(lambda: bump_seat_map_version(theater_id))
+    publish_changes(theater_id, None)
+
+
+def get_seat_map(theater):
+    """Return the theater's seat map, building it on first use."""
+    if theater.seat_map is None:
+        theater.seat_map = rebuild_seat_map(theater.id).to_json()
+    return SeatMap.from_json(theater.seat_map)
+
+
+def load_seat_map(theater_id):
+    data = Theater.objects.values_list("seat_map", flat=True).get(id=theater_id)
+    if data is None:
+        return rebuild_seat_map(theater_id)
+    return SeatMap.from_json(data)
+
+
+def update_seat_map(theater_id, change):
+    """
+    Apply ``change(seat_map)`` under a row lock on the theater and save it.
+
+    Callers that also update ``Seat`` rows should do so inside the same
+    transaction so the map and the table can never drift apart.
+    """
+    with transaction.atomic():
+        data = (
+            Theater.objects.select_for_update()
+            .values_list("seat_map", flat=True)
+            .get(id=theater_id)
+        )
+        if data is None:
+            # A fresh build already reflects the Seat rows in this transaction.
+            return rebuild_seat_map(theater_id)
+        seat_map = SeatMap.from_json(data)
+        booked, held = seat_map.booked, seat_map.held
+        try:
+            change(seat_map)
+        except KeyError:
+            # A seat was added behind the map's back (e.g. bulk_create).
+            return rebuild_seat_map(theater_id)
+        Theater.objects.filter(id=theater_id).update(seat_map=seat_map.to_json())
+        transaction.on_commit(lambda: bump_seat_map_version(theater_id))
+        publish_changes(theater_id, seat_map.changes(booked, held))
+    return seat_map
+
+
+def publish_changes(theater_id, changes):
+    """
+    Push the changed seats to open seat pages after commit (``None`` tells
+    them to start over). Nothing is sent if no seat changed state.
+    """
+    if changes is None or changes:
+        transaction.on_commit(lambda: publish_seat_changes(theater_id, changes))
+
+
+# ======================
+# VERSIONED CACHE
+# ======================
+
+def _version_key(theater_id):
+    return f"seatmap:{theater_id}:version"
+
+
+def seat_map_version(theater_id):
+    return cache.get(_version_key(theater_id), 0)
+
+
+def bump_seat_map_version(theater_id):
+    """
+    Invalidate every cached snapshot of the theater.
+
+    Called after commit, so a reader can never cache pre-commit state under
+    the new version.
+    """
+    key = _version_key(theater_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+
+
+def get_cached_theater(theater_id):
+    """
+    Return the theater (with its movie and seat map) from the cache.
+
+    Snapshots are keyed by the theater's version, so any change to its seats
+    makes old entries unreachable. ``SEAT_MAP_CACHE_TIMEOUT`` bounds how long
+    a per-process cache (locmem) can lag behind other workers.
+    """
+    version = seat_map_version(theater_id)
+    key = f"seatmap:{theater_id}:v{version}"
+    theater = cache.get(key)
+    if theater is None:
+        try:
+            theater = Theater.objects.select_related("movie").get(id=theater_id)
+        except Theater.DoesNotExist:
+            raise Http404("No Theater matches the given query.")
+        get_seat_map(theater)
+        cache.set(key, theater, settings.SEAT_MAP_CACHE_TIMEOUT)
+    return theater
@@ -0,0 +1,67 @@
+"""
+Upcoming showtimes of a movie with their remaining seats, for the
+showtime browser (``theater_list``).
+
+Remaining seats for every show come from one aggregate query over Seat,
+and the result is cached per movie for ``SHOWTIMES_CACHE_TIMEOUT``
+seconds, keyed by the movie's ``theaters`` tag so new or moved shows
+appear at once. Counts can lag by up to the timeout; the seat page is
+always exact.
+"""
+from collections import namedtuple
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Theater
+from .pagecache import page_version, theaters_tag
+from .utils import hold_cutoff
+
+Show = namedtuple("Show", ["id", "venue", "time", "capacity", "remaining"])
+Venue = namedtuple("Venue", ["name", "shows"])
+Day = namedtuple("Day", ["date", "venues"])
+
+
+def upcoming_shows(movie_id, now=None):
+    """The movie's shows from ``now`` on, with capacity and remaining seats."""
+    now = now or timezone.now()
+    cutoff = hold_cutoff(now)
+    free = Q(seat__is_booked=False) & (Q(seat__is_reserved=False) | Q(seat__reserved_at__lt=cutoff))
+    rows = (
+        Theater.objects.filter(movie_id=movie_id, time__gte=now)
+        .order_by("time", "name", "id")
+        .values_list("id", "name", "time")
+        .annotate(capacity=Count("seat"), remaining=Count("seat", filter=free))
+    )
+    return [Show(*row) for row in rows]
+
+
+def cached_upcoming_shows(movie_id, now=None):
+    now = now or timezone.now()
+    key = f"showtimes:{movie_id}:{page_version([theaters_tag(movie_id)])}"
+    shows = cache.get(key)
+    if shows is None:
+        shows = upcoming_shows(movie_id, now)
+        cache.set(key, shows, settings.SHOWTIMES_CACHE_TIMEOUT)
+    # Shows that started since the list was cached drop out here.
+    return [show for show in shows if show.time >= now]
+
+
+def group_shows(shows):
+    """
+    Group shows by local date, then venue (alphabetically), keeping each
+    venue's shows in time order: ``[Day(date, [Venue(name, [Show])])]``.
+    """
+    days = []
+    by_date = groupby(shows, key=lambda show: timezone.localtime(show.time).date())
+    for date, day_shows in by_date:
+        day_shows = sorted(day_shows, key=lambda show: (show.venue, show.time))
+        venues = [
+            Venue(name, list(venue_shows))
+            for name, venue_shows in groupby(day_shows, key=lambda show: show.venue)
+        ]
+        days.append(Day(date, venues))
+    return days
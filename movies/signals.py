@@ -1,6 +1,26 @@
-from django.db.models.signals import post_delete, post_save
-from django.dispatch import receiver
-from .models import Booking, Seat
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from .catalog import FACET_FIELDS, adjust_facets, facet_changes, facet_keys, facet_values, home_movies
+from .models import Booking, Movie, Seat, Theater
+from .pagecache import HOME_TAG, bump_tags, movie_tag, theaters_tag
+from .prerender import refresh_movie_pages
+from .renditions import IMAGE_ERRORS, make_renditions
+from .rollups import bump_rollups, record_booked
+from .search import movie_deleted, movie_saved
+from .seatmap import bump_seat_map_version, reset_seat_map, update_seat_map
+from .stats import record_bookings
+
+logger = logging.getLogger(__name__)
+
+# Sent by movies.utils.finalize_bookings with the list of bookings it
+# bulk-created; post_save does not fire for bulk_create.
+bookings_created = Signal()
+
+# Sent by movies.utils.reserve_seats with the seat ids a user just won.
+seats_held = Signal()
 
 @receiver(post_save, sender=Booking)
 def mark_seat_booked(sender, instance, created, **kwargs):
@@ -9,6 +29,42 @@ def mark_seat_booked(sender, instance, created, **kwargs):
         seat.is_booked = True
         seat.save()
 
+@receiver(bookings_created, sender=Booking)
+def mark_seats_booked_in_bulk(sender, bookings, theater, **kwargs):
+    # The Seat rows were already updated in one UPDATE; sync the map once.
+    seat_ids = [booking.seat_id for booking in bookings]
+    update_seat_map(theater.id, lambda seat_map: seat_map.mark_booked(seat_ids))
+
+@receiver(bookings_created, sender=Booking)
+def count_bulk_bookings(sender, bookings, **kwargs):
+    record_bookings(bookings)
+
+@receiver(post_save, sender=Booking)
+def count_booking(sender, instance, created, **kwargs):
+    if created:
+        record_bookings([instance])
+
+@receiver(post_delete, sender=Booking)
+def uncount_booking(sender, instance, **kwargs):
+    record_bookings([instance], sign=-1)
+
+@receiver(bookings_created, sender=Booking)
+def roll_up_bulk_bookings(sender, bookings, **kwargs):
+    record_booked(bookings)
+
+@receiver(post_save, sender=Booking)
+def roll_up_booking(sender, instance, created, **kwargs):
+    if created:
+        record_booked([instance])
+
+@receiver(post_delete, sender=Booking)
+def roll_down_booking(sender, instance, **kwargs):
+    record_booked([instance], sign=-1)
+
+@receiver(seats_held, sender=Seat)
+def roll_up_holds(sender, theater, seat_ids, reserved_at, **kwargs):
+    bump_rollups(theater.id, theater.movie_id, reserved_at, holds=len(seat_ids))
+
 @receiver(post_delete, sender=Booking)
 def release_seat_if_no_other_bookings(sender, instance, **kwargs):
     seat = instance.seat
@@ -17,3 +73,123 @@ def release_seat_if_no_other_bookings(sender, instance, **kwargs):
     if not Booking.objects.filter(seat=seat).exists():
         seat.is_booked = False
         seat.save()
+
+
+@receiver(post_save, sender=Seat)
+def sync_seat_map(sender, instance, created, **kwargs):
+    if created:
+        # Positions shift when seats are added, so let the next read rebuild it.
+        reset_seat_map(instance.theater_id)
+        return
+
+    update_seat_map(
+        instance.theater_id,
+        lambda seat_map: seat_map.set_state(
+            instance.id,
+            instance.is_booked,
+            instance.reserved_at if instance.is_reserved else None,
+        ),
+    )
+
+
+@receiver(post_delete, sender=Seat)
+def invalidate_seat_map(sender, instance, **kwargs):
+    reset_seat_map(instance.theater_id)
+
+
+@receiver(post_save, sender=Theater)
+@receiver(post_delete, sender=Theater)
+def bump_theater_seat_cache(sender, instance, **kwargs):
+    theater_id = instance.id  # cleared by the time the callback runs
+    transaction.on_commit(lambda: bump_seat_map_version(theater_id))
+
+
+@receiver(post_save, sender=Movie)
+def bump_movie_seat_cache(sender, instance, **kwargs):
+    # The cached seat page shows the movie name.
+    theater_ids = list(instance.theaters.values_list("id", flat=True))
+
+    def bump():
+        for theater_id in theater_ids:
+            bump_seat_map_version(theater_id)
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Movie)
+def index_movie(sender, instance, **kwargs):
+    transaction.on_commit(lambda: movie_saved(instance))
+
+
+@receiver(post_delete, sender=Movie)
+def unindex_movie(sender, instance, **kwargs):
+    movie_id = instance.id  # cleared by the time the callback runs
+    transaction.on_commit(lambda: movie_deleted(movie_id))
+
+
+@receiver(pre_save, sender=Movie)
+def remember_movie_facets(sender, instance, **kwargs):
+    old = None
+    if instance.pk:
+        old = Movie.objects.filter(pk=instance.pk).values(*FACET_FIELDS).first()
+    instance._old_facets = facet_keys(old) if old else set()
+
+
+@receiver(post_save, sender=Movie)
+def count_movie_facets(sender, instance, **kwargs):
+    adjust_facets(facet_changes(instance._old_facets, facet_values(instance)))
+
+
+@receiver(post_delete, sender=Movie)
+def uncount_movie_facets(sender, instance, **kwargs):
+    adjust_facets(facet_changes(facet_values(instance), set()))
+
+
+@receiver(post_save, sender=Movie)
+def expire_movie_pages(sender, instance, created, **kwargs):
+    tags = [movie_tag(instance.id)]
+    if created or instance.id in home_movies().values_list("id", flat=True):
+        tags.append(HOME_TAG)
+    transaction.on_commit(lambda: bump_tags(*tags))
+
+
+@receiver(post_delete, sender=Movie)
+def expire_deleted_movie_pages(sender, instance, **kwargs):
+    tags = [movie_tag(instance.id), HOME_TAG]
+    transaction.on_commit(lambda: bump_tags(*tags))
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def prerender_movie_pages(sender, instance, **kwargs):
+    movie_id = instance.id  # cleared on delete by the time the callback runs
+    transaction.on_commit(lambda: refresh_movie_pages([movie_id]))
+
+
+@receiver(pre_save, sender=Theater)
+def remember_theater_movie(sender, instance, **kwargs):
+    instance._old_movie_id = None
+    if instance.pk:
+        instance._old_movie_id = (
+            Theater.objects.filter(pk=instance.pk).values_list("movie_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Theater)
+@receiver(post_delete, sender=Theater)
+def expire_theater_list(sender, instance, **kwargs):
+    # A theater moved to another movie leaves the old movie's list too.
+    movie_ids = {instance.movie_id, getattr(instance, "_old_movie_id", None)} - {None}
+    tags = [theaters_tag(movie_id) for movie_id in movie_ids]
+    transaction.on_commit(lambda: bump_tags(*tags))
+
+
+@receiver(pre_save, sender=Movie)
+def render_poster(sender, instance, **kwargs):
+    # Only fresh uploads; regenerate_posters covers files already stored.
+    if not instance.image or instance.image._committed:
+        return
+    try:
+        instance.poster_renditions = make_renditions(instance.image)
+    except IMAGE_ERRORS as e:
+        logger.warning("Could not render poster for %s: %s", instance.name, e)
+        instance.poster_renditions = None
@@ -0,0 +1,137 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Booking, BookingStat, Movie, Theater
+
+PRICE_PER_SEAT = 200  # INR
+
+
+def _keys(movie_id, theater_id):
+    # No site-wide row: every checkout would queue on its lock. The total
+    # is summed from the movie rows instead.
+    return [
+        (BookingStat.MOVIE, movie_id),
+        (BookingStat.THEATER, theater_id),
+    ]
+
+
+def _matching(keys):
+    q = Q()
+    for kind, object_id in keys:
+        q |= Q(kind=kind, object_id=object_id)
+    return BookingStat.objects.filter(q)
+
+
+def adjust_stats(movie_id, theater_id, count):
+    """
+    Add ``count`` bookings (negative to remove) for one show to the movie
+    and theater rows.
+
+    One UPDATE in the steady state; missing rows are created first. Callers
+    run inside the transaction that creates or deletes the bookings, so the
+    counters commit or roll back with them.
+    """
+    if not count:
+        return
+    keys = _keys(movie_id, theater_id)
+    change = {
+        "bookings": F("bookings") + count,
+        "revenue": F("revenue") + count * PRICE_PER_SEAT,
+    }
+    if _matching(keys).update(**change) == len(keys):
+        return
+
+    with transaction.atomic():
+        existing = set(_matching(keys).values_list("kind", "object_id"))
+        missing = [key for key in keys if key not in existing]
+        BookingStat.objects.bulk_create(
+            [BookingStat(kind=kind, object_id=object_id) for kind, object_id in missing],
+            ignore_conflicts=True,
+        )
+        # Rows that were already there got the first UPDATE.
+        _matching(missing).update(**change)
+
+
+def record_bookings(bookings, sign=1):
+    """Count a batch of bookings (``sign=-1`` when they are deleted)."""
+    shows = Counter((booking.movie_id, booking.theater_id) for booking in bookings)
+    for (movie_id, theater_id), count in shows.items():
+        adjust_stats(movie_id, theater_id, sign * count)
+
+
+# ======================
+# DASHBOARD
+# ======================
+
+def total_stats():
+    totals = BookingStat.objects.filter(kind=BookingStat.MOVIE).aggregate(
+        bookings=Sum("bookings"), revenue=Sum("revenue")
+    )
+    return totals["bookings"] or 0, totals["revenue"] or 0
+
+
+def top(kind, limit=5):
+    """The ``limit`` movies or theaters with most bookings, with ``.bookings`` set."""
+    model = Movie if kind == BookingStat.MOVIE else Theater
+    stats = list(
+        BookingStat.objects.filter(kind=kind, bookings__gt=0)
+        .order_by("-bookings", "object_id")[:limit]
+    )
+    objects = model.objects.in_bulk([stat.object_id for stat in stats])
+    ranked = []
+    for stat in stats:
+        obj = objects.get(stat.object_id)
+        if obj is not None:
+            obj.bookings = stat.bookings
+            ranked.append(obj)
+    return ranked
+
+
+# ======================
+# REBUILD / VERIFY
+# ======================
+
+def expected_stats():
+    """``{(kind, object_id): bookings}`` recounted from the Booking table."""
+    expected = {}
+    for kind, field in ((BookingStat.MOVIE, "movie_id"), (BookingStat.THEATER, "theater_id")):
+        for row in Booking.objects.values(field).annotate(count=Count("id")):
+            expected[(kind, row[field])] = row["count"]
+    return expected
+
+
+def stats_drift():
+    """
+    ``{(kind, object_id): (stored, expected)}`` for every counter that does
+    not match the Booking table. Revenue is checked at the current price.
+    """
+    expected = expected_stats()
+    stored = {
+        (stat.kind, stat.object_id): stat
+        for stat in BookingStat.objects.all()
+    }
+    drift = {}
+    for key in expected.keys() | stored.keys():
+        count = expected.get(key, 0)
+        stat = stored.get(key)
+        if stat is None:
+            if count:
+                drift[key] = (0, count)
+        elif stat.bookings != count or stat.revenue != count * PRICE_PER_SEAT:
+            drift[key] = (stat.bookings, count)
+    return drift
+
+
+def rebuild_stats():
+    """Replace every counter with a recount from the Booking table."""
+    with transaction.atomic():
+        BookingStat.objects.all().delete()
+        BookingStat.objects.bulk_create(
+            BookingStat(
+                kind=kind, object_id=object_id,
+                bookings=count, revenue=count * PRICE_PER_SEAT,
+            )
+            for (kind, object_id), count in expected_stats().items()
+        )
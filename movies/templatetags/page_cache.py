@@ -0,0 +1,51 @@
+import time
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+
+from movies.pagecache import record
+
+register = template.Library()
+
+
+class CacheFragmentNode(template.Node):
+    def __init__(self, nodelist, name, version):
+        self.nodelist = nodelist
+        self.name = name
+        self.version = version
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        key = f"pagecache:fragment:{name}:{self.version.resolve(context)}"
+        content = cache.get(key)
+        if content is not None:
+            record(f"fragment:{name}", hit=True)
+            return content
+
+        start = time.perf_counter()
+        content = self.nodelist.render(context)
+        record(f"fragment:{name}", hit=False, render_seconds=time.perf_counter() - start)
+        cache.set(key, content, settings.PAGE_CACHE_TIMEOUT)
+        return content
+
+
+@register.tag
+def cachefragment(parser, token):
+    """
+    Cache a user-agnostic block of a page::
+
+        {% cachefragment "movie_detail" cache_version %} ... {% endcachefragment %}
+
+    ``cache_version`` comes from ``movies.pagecache.page_version`` in the view.
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' takes a fragment name and a version."
+        )
+    nodelist = parser.parse(("endcachefragment",))
+    parser.delete_first_token()
+    return CacheFragmentNode(
+        nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2])
+    )
@@ -0,0 +1,36 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from movies.renditions import FORMATS, rendition_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def poster(movie, sizes="100vw", **attrs):
+    """
+    ``<img>`` for the movie's poster with a ``srcset`` of its renditions
+    (WebP where supported, JPEG otherwise)::
+
+        {% poster movie sizes="(min-width: 768px) 33vw, 100vw" class="card-img-top" %}
+
+    Falls back to the original upload until renditions exist.
+    """
+    attrs.setdefault("loading", "lazy")
+    extra = format_html_join("", ' {}="{}"', attrs.items())
+    renditions = movie.poster_renditions
+    if not renditions:
+        return format_html('<img src="{}" alt="{}"{}>', movie.image.url, movie.name, extra)
+
+    widths = renditions["widths"]
+    srcsets = {
+        ext: ", ".join(f"{rendition_url(renditions, width, ext)} {width}w" for width in widths)
+        for ext in FORMATS
+    }
+    # Middle size as the plain src for browsers without srcset.
+    fallback = rendition_url(renditions, widths[len(widths) // 2], "jpg")
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}"{}></picture>',
+        srcsets["webp"], sizes, fallback, srcsets["jpg"], sizes, movie.name, extra,
+    )
@@ -1,3 +1,2053 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import tracemalloc
+from datetime import date, datetime, time, timedelta
+from io import BytesIO, StringIO
+from time import perf_counter
+from unittest import mock
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
 
+from bookmyseat import routers
+
+from .catalog import get_facets, rebuild_facets
+from .expiry import ExpiryScheduler
+from .exports import export_lines
+from .fake_stripe import FakeStripe
+from .live import RESET, InMemoryBroadcaster, event_stream, get_broadcaster, seat_channel
+from .models import (
+    Booking,
+    BookingRollup,
+    BookingStat,
+    CatalogFacet,
+    HallLayout,
+    Movie,
+    Payment,
+    Seat,
+    Theater,
+)
+from .renditions import RENDITION_WIDTHS, rendition_name
+from .rollups import backfill_rollups, bucket_start, series, showtime_occupancy
+from .pagecache import get_stats
+from .payments import get_stripe_client
+from .prerender import page_file, prerender_catalog
+from .profiling import slow_requests, timed
+from .schedule import generate_shows, row_label, seat_numbers
+from .search import SearchIndex, get_search_index
+from .views import SEARCH_LIMIT
+from .stats import stats_drift, total_stats
+from .seatjson import seat_payload
+from .showtimes import Show, cached_upcoming_shows, group_shows, upcoming_shows
+from .seatmap import (
+    SeatMap,
+    build_seat_map,
+    get_cached_theater,
+    get_seat_map,
+    load_seat_map,
+    seat_map_version,
+)
+from . import waitingroom
+from .utils import (
+    RESERVATION_TIMEOUT,
+    active_hold_q,
+    finalize_bookings,
+    hold_cutoff,
+    release_expired_seats,
+    reserve_seats,
+)
+
+
+def seat_updates(queries):
+    return [q for q in queries if q["sql"].startswith('UPDATE "movies_seat"')]
+
+
+def make_theater(seat_count=10):
+    movie = Movie.objects.create(
+        name="Inception",
+        image="movies/inception.jpg",
+        rating="8.8",
+        cast="Leonardo DiCaprio",
+        genre="Thriller",
+        language="English",
+    )
+    theater = Theater.objects.create(
+        name="PVR", movie=movie, time=timezone.now() + timedelta(hours=2)
+    )
+    Seat.objects.bulk_create(
+        Seat(theater=theater, seat_number=f"A{i}") for i in range(1, seat_count + 1)
+    )
+    return theater
+
+
+class ReserveSeatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.theater = make_theater(seat_count=4)
+        self.alice = User.objects.create_user("alice", password="pass")
+        self.bob = User.objects.create_user("bob", password="pass")
+        self.seat_ids = list(
+            Seat.objects.filter(theater=self.theater).values_list("id", flat=True)
+        )
+
+    def test_reserves_free_seats_in_one_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            won, lost = reserve_seats(self.theater, self.alice, self.seat_ids[:2])
+
+        self.assertEqual(len(seat_updates(ctx.captured_queries)), 1)
+        self.assertEqual(won, sorted(self.seat_ids[:2]))
+        self.assertEqual(lost, [])
+        self.assertEqual(
+            Seat.objects.filter(reserved_by=self.alice, is_reserved=True).count(), 2
+        )
+
+    def test_partial_mode_reports_lost_seats(self):
+        reserve_seats(self.theater, self.alice, self.seat_ids[:2])
+
+        won, lost = reserve_seats(self.theater, self.bob, self.seat_ids[1:3])
+
+        self.assertEqual(won, [self.seat_ids[2]])
+        self.assertEqual(lost, [self.seat_ids[1]])
+
+    def test_all_or_nothing_rolls_back_on_conflict(self):
+        reserve_seats(self.theater, self.alice, self.seat_ids[:1])
+
+        won, lost = reserve_seats(
+            self.theater, self.bob, self.seat_ids[:3], all_or_nothing=True
+        )
+
+        self.assertEqual(won, [])
+        self.assertEqual(lost, sorted(self.seat_ids[:3]))
+        self.assertFalse(Seat.objects.filter(reserved_by=self.bob).exists())
+
+    def test_booked_seats_and_other_theaters_are_never_won(self):
+        Seat.objects.filter(id=self.seat_ids[0]).update(is_booked=True)
+        other = make_theater(seat_count=1)
+        foreign_id = Seat.objects.get(theater=other).id
+
+        won, lost = reserve_seats(
+            self.theater, self.alice, [self.seat_ids[0], foreign_id]
+        )
+
+        self.assertEqual(won, [])
+        self.assertEqual(lost, sorted([self.seat_ids[0], foreign_id]))
+
+    def test_stale_hold_can_be_taken_before_expiry_worker_runs(self):
+        Seat.objects.filter(id=self.seat_ids[0]).update(
+            is_reserved=True,
+            reserved_by=self.alice,
+            reserved_at=timezone.now() - RESERVATION_TIMEOUT - timedelta(seconds=1),
+        )
+
+        won, lost = reserve_seats(self.theater, self.bob, self.seat_ids[:1])
+
+        self.assertEqual(won, self.seat_ids[:1])
+        self.assertEqual(Seat.objects.get(id=self.seat_ids[0]).reserved_by, self.bob)
+
+    def test_book_seats_view_shows_error_when_seats_are_taken(self):
+        reserve_seats(self.theater, self.alice, self.seat_ids[:1])
+        self.client.login(username="bob", password="pass")
+
+        response = self.client.post(
+            f"/movies/theater/{self.theater.id}/seats/book/",
+            {"seats": self.seat_ids[:1]},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "just taken")
+
+    def test_book_seats_view_ignores_tampered_seat_values(self):
+        self.client.login(username="bob", password="pass")
+
+        response = self.client.post(
+            f"/movies/theater/{self.theater.id}/seats/book/",
+            {"seats": ["abc", "1 OR 1=1", "-5"]},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Please select at least one seat.")
+        self.assertFalse(Seat.objects.filter(reserved_by=self.bob).exists())
+
+
+class ReserveSeatsConcurrencyTests(TransactionTestCase):
+    THREADS = 8
+
+    def test_no_seat_is_reserved_twice(self):
+        theater = make_theater(seat_count=20)
+        seat_ids = list(
+            Seat.objects.filter(theater=theater).values_list("id", flat=True)
+        )
+        users = [
+            User.objects.create(username=f"user{i}")
+            for i in range(self.THREADS)
+        ]
+        barrier = threading.Barrier(self.THREADS)
+        results = {}
+
+        def worker(user):
+            try:
+                barrier.wait()
+                results[user.id] = reserve_seats(theater, user, seat_ids)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), self.THREADS)
+        won = [seat_id for seat_ids_won, _ in results.values() for seat_id in seat_ids_won]
+        self.assertEqual(len(won), len(set(won)))
+        self.assertEqual(sorted(won), sorted(seat_ids))
+        for user in users:
+            self.assertEqual(
+                sorted(Seat.objects.filter(reserved_by=user).values_list("id", flat=True)),
+                results[user.id][0],
+            )
+
+
+class ExpirySchedulerTests(TestCase):
+    def setUp(self):
+        self.theater = make_theater(seat_count=3)
+        self.user = User.objects.create(username="alice")
+        self.seats = list(Seat.objects.filter(theater=self.theater).order_by("id"))
+        self.now = timezone.now()
+
+    def hold(self, seat, age):
+        Seat.objects.filter(id=seat.id).update(
+            is_reserved=True, reserved_by=self.user, reserved_at=self.now - age
+        )
+
+    def test_release_expired_seats_is_a_single_update(self):
+        self.hold(self.seats[0], RESERVATION_TIMEOUT + timedelta(minutes=1))
+        self.hold(self.seats[1], RESERVATION_TIMEOUT + timedelta(minutes=2))
+        self.hold(self.seats[2], timedelta(minutes=1))
+
+        with CaptureQueriesContext(connection) as ctx:
+            released = release_expired_seats(self.now)
+
+        self.assertEqual(len(seat_updates(ctx.captured_queries)), 1)
+        self.assertEqual(released, 2)
+        self.assertEqual(
+            list(Seat.objects.filter(is_reserved=True).values_list("id", flat=True)),
+            [self.seats[2].id],
+        )
+
+    def test_scheduler_sleeps_until_the_next_expiry(self):
+        self.hold(self.seats[0], timedelta(minutes=4))
+        scheduler = ExpiryScheduler(max_sleep=600)
+        scheduler.refresh()
+
+        self.assertEqual(scheduler.next_due(), self.now + timedelta(minutes=1))
+        self.assertAlmostEqual(scheduler.seconds_until_next(self.now), 60, places=3)
+        self.assertEqual(scheduler.tick(self.now), 0)
+
+    def test_scheduler_releases_once_a_hold_is_due(self):
+        self.hold(self.seats[0], timedelta(minutes=4))
+        scheduler = ExpiryScheduler()
+        scheduler.refresh()
+
+        later = self.now + timedelta(minutes=1, seconds=1)
+        self.assertEqual(scheduler.tick(later), 1)
+        self.assertIsNone(scheduler.next_due())
+        self.assertFalse(Seat.objects.filter(is_reserved=True).exists())
+
+    def test_refresh_only_schedules_new_holds(self):
+        self.hold(self.seats[0], timedelta(minutes=4))
+        scheduler = ExpiryScheduler()
+        scheduler.refresh()
+        self.hold(self.seats[1], timedelta(minutes=2))
+        scheduler.refresh()
+        scheduler.refresh()
+
+        self.assertEqual(len(scheduler._heap), 2)
+        self.assertEqual(scheduler.seconds_until_next(self.now + timedelta(hours=1)), 0)
+
+    def test_confirm_booking_ignores_stale_holds(self):
+        self.user.set_password("pass")
+        self.user.save()
+        self.client.login(username="alice", password="pass")
+        self.hold(self.seats[0], RESERVATION_TIMEOUT + timedelta(minutes=1))
+
+        response = self.client.get(f"/movies/theater/{self.theater.id}/confirm/")
+
+        self.assertRedirects(response, "/movies/", fetch_redirect_response=False)
+
+
+class SeatMapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.theater = make_theater(seat_count=5)
+        self.user = User.objects.create_user("alice", password="pass")
+        self.seat_ids = list(
+            Seat.objects.filter(theater=self.theater).order_by("id").values_list("id", flat=True)
+        )
+
+    def assertInSync(self):
+        self.assertEqual(load_seat_map(self.theater.id).to_json(), build_seat_map(self.theater.id).to_json())
+
+    def test_json_round_trip_and_counts(self):
+        now = timezone.now()
+        seat_map = build_seat_map(self.theater.id)
+        seat_map.mark_booked(self.seat_ids[:2])
+        seat_map.mark_held(self.seat_ids[2:3], now)
+
+        restored = SeatMap.from_json(seat_map.to_json())
+
+        self.assertEqual(restored.booked_count(), 2)
+        self.assertEqual(restored.held_count(hold_cutoff(now)), 1)
+        self.assertEqual(restored.available_count(hold_cutoff(now)), 2)
+        self.assertFalse(restored.is_free(self.seat_ids[2], hold_cutoff(now)))
+        self.assertTrue(restored.is_free(self.seat_ids[4], hold_cutoff(now)))
+
+    def test_stale_holds_read_as_free(self):
+        now = timezone.now()
+        seat_map = build_seat_map(self.theater.id)
+        seat_map.mark_held(self.seat_ids[:1], now - RESERVATION_TIMEOUT - timedelta(seconds=1))
+
+        self.assertTrue(seat_map.is_free(self.seat_ids[0], hold_cutoff(now)))
+        self.assertEqual(seat_map.available_count(hold_cutoff(now)), 5)
+
+    def test_map_follows_reservations_bookings_and_expiry(self):
+        get_seat_map(self.theater)
+
+        reserve_seats(self.theater, self.user, self.seat_ids[:3])
+        self.assertInSync()
+
+        seat = Seat.objects.get(id=self.seat_ids[0])
+        Booking.objects.create(user=self.user, seat=seat, movie=self.theater.movie, theater=self.theater)
+        self.assertInSync()
+
+        later = timezone.now() + RESERVATION_TIMEOUT + timedelta(seconds=1)
+        release_expired_seats(later)
+        self.assertInSync()
+        self.assertEqual(load_seat_map(self.theater.id).booked_count(), 1)
+
+    def test_added_seat_invalidates_map(self):
+        get_seat_map(self.theater)
+        Seat.objects.create(theater=self.theater, seat_number="B1")
+
+        self.assertEqual(len(load_seat_map(self.theater.id)), 6)
+
+    def test_seat_page_renders_without_reading_seat_rows(self):
+        get_seat_map(self.theater)
+        self.client.login(username="alice", password="pass")
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f"/movies/theater/{self.theater.id}/seats/book/")
+
+        self.assertContains(response, 'name="seats"', count=5)
+        self.assertFalse([q for q in ctx.captured_queries if '"movies_seat"' in q["sql"]])
+
+
+class SeatDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.theater = make_theater(seat_count=6)
+        self.user = User.objects.create_user("alice", password="pass")
+        self.seat_ids = list(
+            Seat.objects.filter(theater=self.theater).order_by("id").values_list("id", flat=True)
+        )
+        self.url = f"/movies/theater/{self.theater.id}/seats.json"
+
+    def test_payload_is_run_length_encoded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(self.theater, self.user, self.seat_ids[2:4])
+            finalize_bookings(self.user, self.theater.id, self.seat_ids[3:4])
+
+        data = self.client.get(self.url).json()
+
+        self.assertEqual(data["rows"], [["A", 1, self.seat_ids[0], 6]])
+        self.assertEqual(data["state"], "2f1h1b2f")
+
+    def test_irregular_seat_numbers_get_their_own_run(self):
+        Seat.objects.create(theater=self.theater, seat_number="VIP")
+        Seat.objects.create(theater=self.theater, seat_number="A7")
+
+        rows = self.client.get(self.url).json()["rows"]
+
+        self.assertEqual(rows[1:], [["VIP", None, self.seat_ids[-1] + 1, 1], ["A", 7, self.seat_ids[-1] + 2, 1]])
+
+    def test_unchanged_poll_is_304_without_reading_seats(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+        self.assertFalse([q for q in ctx.captured_queries if '"movies_seat"' in q["sql"]])
+
+    def test_etag_follows_seat_state(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(self.theater, self.user, self.seat_ids[:1])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        # Expired holds read as free without any write bumping the version.
+        later = timezone.now() + RESERVATION_TIMEOUT + timedelta(seconds=1)
+        self.assertEqual(seat_payload(self.theater.id, later)[0], etag)
+
+    def test_seat_page_embeds_payload(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(f"/movies/theater/{self.theater.id}/seats/book/")
+
+        self.assertContains(response, '<script id="seat-data" type="application/json">')
+        self.assertEqual(response.context["seat_data"]["state"], "6f")
+
+
+class Listener:
+    """A seat-events subscriber on its own event loop, driven from the test."""
+
+    def __init__(self, theater_id, broadcaster=None):
+        self.loop = asyncio.new_event_loop()
+        broadcaster = broadcaster or get_broadcaster()
+
+        async def subscribe():
+            return broadcaster.subscribe(seat_channel(theater_id))
+
+        self.subscription = self.loop.run_until_complete(subscribe())
+
+    def messages(self):
+        self.loop.run_until_complete(asyncio.sleep(0))  # run pending deliveries
+        queue = self.subscription.queue
+        return [RESET if m == RESET else json.loads(m) for m in iter_queue(queue)]
+
+    def close(self):
+        self.subscription.close()
+        self.loop.close()
+
+
+def iter_queue(queue):
+    while not queue.empty():
+        yield queue.get_nowait()
+
+
+class LiveSeatTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.theater = make_theater(seat_count=5)
+        self.user = User.objects.create_user("alice", password="pass")
+        self.seat_ids = list(
+            Seat.objects.filter(theater=self.theater).order_by("id").values_list("id", flat=True)
+        )
+        get_seat_map(self.theater)
+        self.listener = Listener(self.theater.id)
+        self.addCleanup(self.listener.close)
+
+    def test_holds_bookings_and_expiry_publish_deltas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(self.theater, self.user, self.seat_ids[:2])
+        self.assertEqual(self.listener.messages(), [{"held": self.seat_ids[:2]}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            finalize_bookings(self.user, self.theater.id, self.seat_ids[:1])
+        self.assertEqual(self.listener.messages(), [{"booked": self.seat_ids[:1]}])
+
+        later = timezone.now() + RESERVATION_TIMEOUT + timedelta(seconds=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            release_expired_seats(later)
+        self.assertEqual(self.listener.messages(), [{"free": self.seat_ids[1:2]}])
+
+    def test_nothing_is_published_before_commit_or_for_no_change(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            reserve_seats(self.theater, self.user, self.seat_ids[:1])
+        self.assertEqual(self.listener.messages(), [])
+
+        for callback in callbacks:
+            callback()
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(self.theater, self.user, self.seat_ids[:1])  # already held
+
+        self.assertEqual(self.listener.messages(), [{"held": self.seat_ids[:1]}])
+
+    def test_added_seat_sends_reset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Seat.objects.create(theater=self.theater, seat_number="B1")
+
+        self.assertEqual(self.listener.messages(), [RESET])
+
+    def test_slow_subscriber_gets_one_reset(self):
+        broadcaster = InMemoryBroadcaster(queue_size=3)
+        listener = Listener(self.theater.id, broadcaster)
+        self.addCleanup(listener.close)
+
+        for i in range(5):
+            broadcaster.publish(seat_channel(self.theater.id), json.dumps({"free": [i]}))
+
+        self.assertEqual(listener.messages(), [RESET, {"free": [4]}])
+
+    def test_fan_out_to_1000_subscribers(self):
+        broadcaster = InMemoryBroadcaster()
+        channel = seat_channel(self.theater.id)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def fan_out():
+            subscriptions = [broadcaster.subscribe(channel) for _ in range(1000)]
+            start = perf_counter()
+            # Published from another thread, as on_commit callbacks are.
+            publisher = threading.Thread(
+                target=broadcaster.publish, args=(channel, json.dumps({"booked": [1]}))
+            )
+            publisher.start()
+            received = await asyncio.gather(*(s.get() for s in subscriptions))
+            elapsed = perf_counter() - start
+            publisher.join()
+            for subscription in subscriptions:
+                subscription.close()
+            return received, elapsed
+
+        received, elapsed = loop.run_until_complete(fan_out())
+
+        self.assertEqual(len(received), 1000)
+        self.assertEqual(set(received), {'{"booked": [1]}'})
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(broadcaster.subscriber_count(channel), 0)
+
+    def test_wsgi_requests_get_no_stream(self):
+        response = self.client.get(f"/movies/theater/{self.theater.id}/seats/events/")
+
+        self.assertEqual(response.status_code, 204)
+
+    async def test_event_stream_starts_with_snapshot(self):
+        await sync_to_async(reserve_seats)(self.theater, self.user, self.seat_ids[:1])
+
+        response = await self.async_client.get(f"/movies/theater/{self.theater.id}/seats/events/")
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        first = (await anext(stream)).decode()
+        self.assertIn("event: snapshot", first)
+        snapshot = json.loads(first.split("data: ", 1)[1])
+        self.assertEqual(snapshot, {"booked": [], "held": self.seat_ids[:1]})
+        await stream.aclose()
+
+    async def test_stream_ends_after_its_lifetime_and_unsubscribes(self):
+        broadcaster = InMemoryBroadcaster()
+        channel = seat_channel(self.theater.id)
+        subscription = broadcaster.subscribe(channel)
+
+        chunks = [
+            chunk async for chunk in event_stream(subscription, {}, keepalive=0.02, lifetime=0.1)
+        ]
+
+        self.assertIn(": keepalive\n\n", chunks)
+        self.assertEqual(broadcaster.subscriber_count(channel), 0)
+
+    async def test_failed_setup_releases_the_subscription(self):
+        channel = seat_channel(self.theater.id)
+        before = get_broadcaster().subscriber_count(channel)
+
+        with mock.patch("movies.views.get_cached_theater", side_effect=RuntimeError("cache down")):
+            with self.assertRaises(RuntimeError):
+                await self.async_client.get(f"/movies/theater/{self.theater.id}/seats/events/")
+
+        self.assertEqual(get_broadcaster().subscriber_count(channel), before)
+
+
+class SeatAvailabilityCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.theater = make_theater(seat_count=3)
+        self.user = User.objects.create_user("alice", password="pass")
+        self.seat_ids = list(
+            Seat.objects.filter(theater=self.theater).order_by("id").values_list("id", flat=True)
+        )
+        self.url = f"/movies/theater/{self.theater.id}/seats/book/"
+        self.client.login(username="alice", password="pass")
+
+    def test_repeat_views_are_served_from_cache(self):
+        self.client.get(self.url)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+
+        self.assertContains(response, 'name="seats"', count=3)
+        self.assertFalse([q for q in ctx.captured_queries if "movies_" in q["sql"]])
+
+    def test_reservation_bumps_version_and_next_view_is_fresh(self):
+        self.client.get(self.url)
+        version = seat_map_version(self.theater.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(self.theater, User.objects.create(username="bob"), self.seat_ids[:1])
+
+        self.assertGreater(seat_map_version(self.theater.id), version)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'name="seats"', count=2)
+
+    def test_booking_expiry_and_theater_edits_bump_version(self):
+        get_cached_theater(self.theater.id)
+        seat = Seat.objects.get(id=self.seat_ids[0])
+
+        for change in (
+            lambda: Booking.objects.create(
+                user=self.user, seat=seat, movie=self.theater.movie, theater=self.theater
+            ),
+            lambda: reserve_seats(self.theater, self.user, self.seat_ids[1:2]),
+            lambda: release_expired_seats(timezone.now() + RESERVATION_TIMEOUT * 2),
+            lambda: Theater.objects.get(id=self.theater.id).save(),
+            lambda: self.theater.movie.save(),
+        ):
+            version = seat_map_version(self.theater.id)
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            self.assertGreater(seat_map_version(self.theater.id), version)
+
+    def test_movie_and_theater_edits_bump_only_on_commit(self):
+        for change in (
+            lambda: Theater.objects.get(id=self.theater.id).save(),
+            lambda: self.theater.movie.save(),
+        ):
+            version = seat_map_version(self.theater.id)
+            with self.captureOnCommitCallbacks() as callbacks:
+                change()
+                # A reader before the commit must not get the new version.
+                self.assertEqual(seat_map_version(self.theater.id), version)
+            for callback in callbacks:
+                callback()
+            self.assertGreater(seat_map_version(self.theater.id), version)
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = "django.core.cache.backends.filebased.FileBasedCache"
+            with override_settings(CACHES={"default": {"BACKEND": backend, "LOCATION": location}}):
+                from django.core.cache import cache as file_cache
+
+                file_cache.clear()
+                first = get_cached_theater(self.theater.id)
+                with self.captureOnCommitCallbacks(execute=True):
+                    reserve_seats(self.theater, self.user, self.seat_ids[:1])
+                second = get_cached_theater(self.theater.id)
+
+                self.assertEqual(get_seat_map(first).held, 0)
+                self.assertEqual(get_seat_map(second).held, 1)
+
+
+class FinalizeBookingsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("alice", password="pass")
+
+    def hold_all(self, seat_count):
+        theater = make_theater(seat_count=seat_count)
+        get_seat_map(theater)
+        seat_ids = Seat.objects.filter(theater=theater).values_list("id", flat=True)
+        reserve_seats(theater, self.user, seat_ids)
+        return theater
+
+    def test_query_count_is_constant_in_seat_count(self):
+        # SAVEPOINT, SELECT ... FOR UPDATE, SELECT theater, UPDATE seats,
+        # INSERT bookings, seat map (SAVEPOINT, SELECT, UPDATE, RELEASE),
+        # booking stats (UPDATE; first booking of the show: SAVEPOINT, SELECT,
+        # INSERT, UPDATE, RELEASE), hourly and daily rollups (UPDATE x2), RELEASE
+        for seat_count in (1, 10, 100):
+            with self.subTest(seat_count=seat_count):
+                theater = self.hold_all(seat_count)
+
+                with self.assertNumQueries(18):
+                    bookings = finalize_bookings(self.user, theater.id)
+
+                self.assertEqual(len(bookings), seat_count)
+                self.assertEqual(Booking.objects.filter(theater=theater).count(), seat_count)
+                self.assertFalse(
+                    Seat.objects.filter(theater=theater, is_booked=False).exists()
+                )
+                self.assertFalse(
+                    Seat.objects.filter(theater=theater, is_reserved=True).exists()
+                )
+                self.assertEqual(load_seat_map(theater.id).booked_count(), seat_count)
+
+    def test_repeated_finalize_is_a_no_op(self):
+        theater = self.hold_all(3)
+        finalize_bookings(self.user, theater.id)
+
+        self.assertEqual(finalize_bookings(self.user, theater.id), [])
+        self.assertEqual(Booking.objects.count(), 3)
+
+    def test_bare_success_redirect_books_nothing(self):
+        theater = self.hold_all(2)
+        self.client.login(username="alice", password="pass")
+
+        response = self.client.get(f"/movies/theater/{theater.id}/success/")
+
+        self.assertRedirects(response, "/profile/", fetch_redirect_response=False)
+        self.assertFalse(Booking.objects.exists())
+
+
+class StripeCheckoutTests(TestCase):
+    WEBHOOK_SECRET = "whsec_test"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake = FakeStripe().start()
+        cls.settings_override = override_settings(
+            STRIPE_SECRET_KEY="sk_test_fake",
+            STRIPE_API_BASE=cls.fake.api_base,
+            STRIPE_WEBHOOK_SECRET=cls.WEBHOOK_SECRET,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.fake.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.theater = make_theater(seat_count=3)
+        self.user = User.objects.create_user("alice", email="alice@example.com", password="pass")
+        seat_ids = Seat.objects.filter(theater=self.theater).values_list("id", flat=True)
+        reserve_seats(self.theater, self.user, list(seat_ids)[:2])
+        self.client.login(username="alice", password="pass")
+
+    def checkout(self):
+        response = self.client.get(f"/movies/theater/{self.theater.id}/payment/")
+        self.assertEqual(response.status_code, 302)
+        return Payment.objects.get(user=self.user)
+
+    def post_webhook(self, session_id):
+        payload, signature = self.fake.webhook(
+            "checkout.session.completed", session_id, self.WEBHOOK_SECRET
+        )
+        return self.client.post(
+            "/movies/stripe/webhook/", payload,
+            content_type="application/json", HTTP_STRIPE_SIGNATURE=signature,
+        )
+
+    def test_make_payment_creates_one_session_per_hold(self):
+        payment = self.checkout()
+        self.checkout()
+
+        self.assertEqual(len(self.fake.sessions), 1)
+        self.assertEqual(payment.amount, 400)
+        self.assertEqual(self.fake.sessions[payment.session_id]["amount_total"], 40000)
+        self.assertEqual(payment.status, Payment.PENDING)
+
+    def test_webhook_finalizes_bookings_exactly_once(self):
+        payment = self.checkout()
+        self.fake.pay(payment.session_id)
+
+        self.assertEqual(self.post_webhook(payment.session_id).status_code, 200)
+        self.assertEqual(self.post_webhook(payment.session_id).status_code, 200)
+        self.client.get(f"/movies/theater/{self.theater.id}/success/?session_id={payment.session_id}")
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.PAID)
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_webhook_rejects_bad_signatures(self):
+        payment = self.checkout()
+        self.fake.pay(payment.session_id)
+        payload, _ = self.fake.webhook("checkout.session.completed", payment.session_id, "wrong")
+
+        response = self.client.post(
+            "/movies/stripe/webhook/", payload,
+            content_type="application/json", HTTP_STRIPE_SIGNATURE="t=1,v1=bad",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_success_redirect_only_books_paid_sessions(self):
+        payment = self.checkout()
+        url = f"/movies/theater/{self.theater.id}/success/?session_id={payment.session_id}"
+
+        self.client.get(url)
+        self.assertFalse(Booking.objects.exists())
+
+        self.fake.pay(payment.session_id)
+        response = self.client.get(url)
+
+        self.assertRedirects(response, "/profile/", fetch_redirect_response=False)
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 2)
+
+    def test_anonymous_users_are_sent_to_login(self):
+        self.client.logout()
+
+        response = self.client.get(f"/movies/theater/{self.theater.id}/payment/")
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith("/login/"))
+
+    @override_settings(PROFILING=True)
+    def test_profiling_times_stripe_calls(self):
+        response = self.client.get(f"/movies/theater/{self.theater.id}/payment/")
+
+        self.assertRegex(response["Server-Timing"], r"stripe;dur=\d")
+
+    async def test_make_payment_under_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+
+        response = await self.async_client.get(f"/movies/theater/{self.theater.id}/payment/")
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(self.fake.api_base))
+
+    def test_stripe_client_is_reused_per_loop_and_closed_with_it(self):
+        async def two_clients():
+            return await get_stripe_client(), await get_stripe_client()
+
+        # asyncio.run is how WSGI runs an async view: one loop per request.
+        first, second = asyncio.run(two_clients())
+
+        self.assertIs(first, second)
+        self.assertTrue(first._requestor._client._client_async.is_closed)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Fail if a hot query would read a whole table. Runs on SQLite, and on
+    PostgreSQL when DATABASE_URL points at one (with sequential scans
+    discouraged so tiny test tables do not hide a missing index).
+    """
+
+    FULL_SCAN = {
+        "sqlite": re.compile(r"\bSCAN (movies_\w+)\b(?! USING)"),
+        "postgresql": re.compile(r"Seq Scan on (movies_\w+)"),
+    }
+
+    def hot_queries(self):
+        now = timezone.now()
+        return {
+            "user holds in theater": Seat.objects.filter(
+                active_hold_q(), theater_id=1, reserved_by_id=1
+            ),
+            "expired holds": Seat.objects.filter(
+                is_reserved=True, reserved_at__lt=hold_cutoff(now)
+            ),
+            "new holds for scheduler": Seat.objects.filter(
+                is_reserved=True, reserved_at__isnull=False, reserved_at__gt=now
+            ).values_list("reserved_at", flat=True).distinct(),
+            "seat map build": Seat.objects.filter(theater_id=1).order_by("id").values_list(
+                "id", "seat_number", "is_booked", "is_reserved", "reserved_at"
+            ),
+            "profile bookings": Booking.objects.filter(user_id=1).order_by("-booked_at"),
+            "bookings per movie": Booking.objects.values("movie").annotate(n=Count("id")),
+            "bookings per theater": Booking.objects.values("theater").annotate(n=Count("id")),
+            "bookings for one movie": Booking.objects.filter(movie_id=1),
+            "upcoming shows of a movie": Theater.objects.filter(movie_id=1, time__gte=now)
+            .order_by("time").values_list("id", "name", "time"),
+        }
+
+    def explain(self, queryset):
+        if connection.vendor == "postgresql":
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                return queryset.explain()
+        return queryset.explain()
+
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor not in self.FULL_SCAN:
+            self.skipTest(f"No plan checks for {connection.vendor}")
+
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(name):
+                plan = self.explain(queryset)
+                self.assertIsNone(
+                    self.FULL_SCAN[connection.vendor].search(plan),
+                    f"{name} falls back to a full table scan:\n{plan}",
+                )
+
+    def test_full_scans_are_detected(self):
+        if connection.vendor not in self.FULL_SCAN:
+            self.skipTest(f"No plan checks for {connection.vendor}")
+
+        plan = self.explain(Seat.objects.filter(seat_number="A1"))
+
+        self.assertIsNotNone(self.FULL_SCAN[connection.vendor].search(plan), plan)
+
+
+class MovieSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("movies.search._index", SearchIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.inception = self.movie(
+            "Inception", cast="Leonardo DiCaprio, Tom Hardy", genre="Thriller",
+            description="A thief steals secrets through dreams.",
+        )
+        self.titanic = self.movie(
+            "Titanic", cast="Leonardo DiCaprio, Kate Winslet", genre="Romance",
+        )
+        self.dreamgirls = self.movie(
+            "Dreamgirls", cast="Beyonce", genre="Drama", language="Hindi",
+            description="Inception of a girl group.",
+        )
+
+    def movie(self, name, cast, genre, description="", language="English"):
+        return Movie.objects.create(
+            name=name, image="movies/x.jpg", rating="8.0", cast=cast,
+            description=description, genre=genre, language=language,
+        )
+
+    def ids(self, query):
+        return [movie_id for movie_id, _ in get_search_index().search(query)]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.ids("inception"), [self.inception.id, self.dreamgirls.id])
+
+    def test_searches_cast(self):
+        self.assertEqual(set(self.ids("dicaprio")), {self.inception.id, self.titanic.id})
+        self.assertEqual(self.ids("dicaprio winslet"), [self.titanic.id])
+
+    def test_tolerates_typos_and_prefixes(self):
+        self.assertEqual(self.ids("incepton")[0], self.inception.id)
+        self.assertEqual(self.ids("leonard caprio")[:2], self.ids("leonardo dicaprio")[:2])
+        self.assertEqual(self.ids("tita"), [self.titanic.id])
+
+    def test_save_and_delete_update_the_index(self):
+        get_search_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.titanic.name = "Avatar"
+            self.titanic.save()
+            self.inception.delete()
+
+        with self.assertNumQueries(0):
+            index = get_search_index()
+            self.assertEqual(self.ids("avatar"), [self.titanic.id])
+            self.assertEqual(self.ids("inception"), [self.dreamgirls.id])
+
+        self.assertEqual(len(index), 2)
+
+    def test_other_processes_catch_up_through_the_cache_version(self):
+        other = SearchIndex()
+        other.sync()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie("Interstellar", cast="Matthew McConaughey", genre="Drama")
+
+        other.sync()
+
+        self.assertEqual(len(other), 4)
+        self.assertTrue(other.search("interstellar"))
+
+    def test_other_processes_catch_up_without_a_shared_cache(self):
+        patcher = mock.patch("movies.search.time.monotonic", return_value=1000.0)
+        clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        other = SearchIndex()
+        other.sync()
+        # Changed elsewhere: no signal here and no cache version bump.
+        Movie.objects.filter(id=self.titanic.id).update(name="Avatar", updated_at=timezone.now())
+        Movie.objects.filter(id=self.inception.id).delete()
+
+        with self.assertNumQueries(0):
+            other.sync()
+        self.assertFalse(other.search("avatar"))
+
+        clock.return_value += settings.SEARCH_INDEX_CHECK_SECONDS
+        other.sync()
+        self.assertEqual([movie_id for movie_id, _ in other.search("avatar")], [self.titanic.id])
+        self.assertEqual(len(other), 2)
+
+        # Nothing changed since: one aggregate, no re-indexing.
+        clock.return_value += settings.SEARCH_INDEX_CHECK_SECONDS
+        with self.assertNumQueries(1):
+            other.sync()
+
+    def test_movie_list_view_uses_ranked_search(self):
+        response = self.client.get("/movies/", {"search": "incepton"})
+        self.assertEqual(list(response.context["movies"])[0], self.inception)
+
+        response = self.client.get("/movies/", {"search": "inception", "genre": "drama"})
+        self.assertEqual(list(response.context["movies"]), [self.dreamgirls])
+
+    def test_filters_apply_before_the_result_limit(self):
+        Movie.objects.bulk_create(
+            Movie(name=f"Heist {i}", image="movies/x.jpg", rating="7.0", cast="Crew",
+                  genre="Thriller", language="English")
+            for i in range(SEARCH_LIMIT + 10)
+        )
+        # Only a description match, so it ranks below every name match.
+        noir = self.movie("The Job", cast="Crew", genre="Noir", description="A heist gone wrong.")
+
+        response = self.client.get("/movies/", {"search": "heist", "genre": "noir"})
+
+        self.assertEqual(list(response.context["movies"]), [noir])
+
+
+class CatalogTests(TestCase):
+    def add_movies(self, count, genre="Drama", language="English"):
+        Movie.objects.bulk_create(
+            Movie(
+                name=f"Movie {i}", image="movies/x.jpg", rating="7.0", cast="Cast",
+                genre=genre, language=language,
+            )
+            for i in range(count)
+        )
+
+    def facet_counts(self):
+        return {
+            kind: {facet.value: facet.count for facet in facets}
+            for kind, facets in get_facets().items()
+        }
+
+    def test_pages_follow_the_keyset_cursor(self):
+        self.add_movies(30)
+
+        first = self.client.get("/movies/")
+        second = self.client.get("/movies/", {"after": first.context["next_after"]})
+        third = self.client.get("/movies/", {"after": second.context["next_after"]})
+
+        seen = [m.id for r in (first, second, third) for m in r.context["movies"]]
+        self.assertEqual(seen, list(Movie.objects.order_by("id").values_list("id", flat=True)))
+        self.assertIsNone(third.context["next_after"])
+        self.assertContains(first, "More movies")
+
+    def test_page_cost_is_flat_as_the_catalog_grows(self):
+        self.add_movies(20)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get("/movies/")
+        self.add_movies(500)
+        cursor = Movie.objects.order_by("id")[300].id
+        with CaptureQueriesContext(connection) as large:
+            self.client.get("/movies/", {"after": cursor})
+
+        self.assertEqual(len(small), len(large))
+
+    def test_facets_follow_movie_saves_and_deletes(self):
+        movie = Movie.objects.create(
+            name="Kantara", image="movies/x.jpg", rating="8.5", cast="Rishab Shetty",
+            genre="Thriller", language="Kannada",
+        )
+        Movie.objects.create(
+            name="Drishyam", image="movies/x.jpg", rating="8.2", cast="Mohanlal",
+            genre="Thriller", language="Malyalam",
+        )
+        self.assertEqual(self.facet_counts()["genre"], {"thriller": 2})
+
+        movie.genre = "Action"
+        movie.save()
+        self.assertEqual(self.facet_counts()["genre"], {"action": 1, "thriller": 1})
+
+        movie.delete()
+        self.assertEqual(
+            self.facet_counts(),
+            {"genre": {"thriller": 1}, "language": {"malyalam": 1}},
+        )
+
+    def test_dropdowns_show_real_values_with_counts(self):
+        Movie.objects.create(
+            name="Kantara", image="movies/x.jpg", rating="8.5", cast="Rishab Shetty",
+            genre="Thriller", language="Kannada",
+        )
+
+        response = self.client.get("/movies/")
+
+        self.assertContains(response, "Thriller (1)")
+        self.assertContains(response, "Kannada (1)")
+        self.assertNotContains(response, "Fantasy")
+
+    def test_facets_ignore_case_and_whitespace_like_the_filter(self):
+        for genre in ("Action", "action", " ACTION "):
+            Movie.objects.create(
+                name=f"Movie {genre}", image="movies/x.jpg", rating="7.0", cast="Cast",
+                genre=genre, language="Hindi",
+            )
+        self.assertEqual(self.facet_counts()["genre"], {"action": 3})
+
+        response = self.client.get("/movies/", {"genre": "action"})
+        self.assertEqual(len(response.context["movies"]), 3)
+        self.assertContains(response, '<option value="action" selected>Action (3)</option>', html=True)
+
+        CatalogFacet.objects.all().delete()
+        rebuild_facets()
+        self.assertEqual(self.facet_counts()["genre"], {"action": 3})
+
+    def test_rebuild_recounts_bulk_imports(self):
+        self.add_movies(3, genre="Comedy", language="Hindi")
+        self.assertFalse(CatalogFacet.objects.exists())
+
+        rebuild_facets()
+
+        self.assertEqual(
+            self.facet_counts(), {"genre": {"comedy": 3}, "language": {"hindi": 3}}
+        )
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.theater = make_theater(seat_count=1)
+        self.movie = self.theater.movie
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other = Movie.objects.create(
+                name="Kantara", image="movies/x.jpg", rating="8.5",
+                cast="Rishab Shetty", genre="Thriller", language="Kannada",
+            )
+
+    def edit(self, obj, **fields):
+        for name, value in fields.items():
+            setattr(obj, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+
+    def test_anonymous_pages_are_served_without_queries(self):
+        for url in ("/", f"/movies/movie/{self.movie.id}/", f"/movies/{self.movie.id}/theaters/"):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(first.content, second.content)
+
+    def test_rating_edit_expires_only_that_movies_pages(self):
+        self.client.get(f"/movies/movie/{self.movie.id}/")
+        self.client.get(f"/movies/movie/{self.other.id}/")
+        self.client.get(f"/movies/{self.other.id}/theaters/")
+
+        self.edit(self.movie, description="Dreams within dreams")
+
+        self.assertContains(self.client.get(f"/movies/movie/{self.movie.id}/"), "Dreams within dreams")
+        with self.assertNumQueries(0):
+            self.client.get(f"/movies/movie/{self.other.id}/")
+            self.client.get(f"/movies/{self.other.id}/theaters/")
+
+    def test_theater_changes_expire_the_theater_list(self):
+        url = f"/movies/{self.movie.id}/theaters/"
+        self.client.get(url)
+
+        self.edit(self.theater, name="INOX")
+        self.assertContains(self.client.get(url), "INOX Theater")
+
+        self.edit(self.theater, movie=self.other)
+        self.assertNotContains(self.client.get(url), "INOX Theater")
+        self.assertContains(self.client.get(f"/movies/{self.other.id}/theaters/"), "INOX Theater")
+
+    def test_home_expires_on_new_and_edited_home_movies(self):
+        self.client.get("/")
+
+        self.edit(self.other, name="Kantara Chapter 1")
+        self.assertContains(self.client.get("/"), "Kantara Chapter 1")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+        self.assertNotContains(self.client.get("/"), "Kantara Chapter 1")
+
+    def test_logged_in_users_get_fragments_not_pages(self):
+        self.client.get(f"/movies/movie/{self.movie.id}/")
+        user = User.objects.create_user(username="asha", password="pw")
+        self.client.force_login(user)
+
+        response = self.client.get(f"/movies/movie/{self.movie.id}/")
+        self.client.get(f"/movies/movie/{self.movie.id}/")
+
+        self.assertContains(response, "Logout")
+        # The anonymous render already filled the fragment.
+        self.assertEqual(get_stats()["fragment:movie_detail"]["hits"], 2)
+        self.assertEqual(get_stats()["page:movie_detail"]["misses"], 1)
+
+    def test_stats_command_reports_hit_ratio(self):
+        for _ in range(4):
+            self.client.get(f"/movies/movie/{self.movie.id}/")
+        out = StringIO()
+
+        call_command("page_cache_stats", stdout=out)
+
+        self.assertIn("page:movie_detail: 3 hits, 1 misses (75% hit ratio)", out.getvalue())
+
+
+class PrerenderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(PRERENDER_PAGES=True, PRERENDER_ROOT=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.movie = make_theater(seat_count=1).movie
+        self.other = Movie.objects.create(
+            name="Kantara", image="movies/x.jpg", rating="8.5",
+            cast="Rishab Shetty", genre="Thriller", language="Kannada",
+        )
+        self.list_file = page_file("/movies/")
+        self.detail_file = page_file(f"/movies/movie/{self.movie.id}/")
+
+    def mark(self, path):
+        # Stands in for a page rendered earlier, to see what gets rewritten.
+        path.write_bytes(b"earlier")
+
+    def test_command_renders_anonymous_pages(self):
+        dynamic = self.client.get(f"/movies/movie/{self.movie.id}/")
+        out = StringIO()
+        call_command("prerender_pages", stdout=out)
+
+        self.assertIn("Pre-rendered 3 pages.", out.getvalue())
+        self.assertEqual(self.detail_file.read_bytes(), dynamic.content)
+        self.assertIn(b"Kantara", self.list_file.read_bytes())
+        self.assertTrue(self.list_file.with_name("index.html.gz").exists())
+
+    def test_files_are_served_to_anonymous_visitors_only(self):
+        prerender_catalog()
+        self.mark(self.list_file)
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/movies/")
+        self.assertEqual(b"".join(response.streaming_content), b"earlier")
+        self.assertEqual(response["Cache-Control"], "max-age=60, public")
+        self.assertIn("Cookie", response["Vary"])
+        self.assertIn("ETag", response)
+        self.assertEqual(response["X-Frame-Options"], "DENY")
+        self.assertEqual(self.client.get("/movies/../movies/").status_code, 404)
+
+        self.assertNotContains(self.client.get("/movies/?genre=Thriller"), "earlier")
+        self.client.force_login(User.objects.create_user("alice", password="pass"))
+        self.assertNotContains(self.client.get("/movies/"), "earlier")
+
+    def test_movie_change_rerenders_only_its_pages(self):
+        prerender_catalog()
+        other_file = page_file(f"/movies/movie/{self.other.id}/")
+        for path in (self.list_file, self.detail_file, other_file):
+            self.mark(path)
+
+        self.movie.description = "Dreams within dreams"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.save()
+
+        self.assertIn(b"Dreams within dreams", self.detail_file.read_bytes())
+        self.assertNotEqual(self.list_file.read_bytes(), b"earlier")
+        self.assertEqual(other_file.read_bytes(), b"earlier")
+
+    def test_deleted_movie_page_is_removed(self):
+        prerender_catalog()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.delete()
+
+        self.assertFalse(self.detail_file.exists())
+        self.assertNotIn(b"Inception", self.list_file.read_bytes())
+
+    def test_missing_page_falls_back_to_the_view(self):
+        response = self.client.get(f"/movies/movie/{self.movie.id}/")
+
+        self.assertContains(response, "Inception")
+        self.assertFalse(self.detail_file.exists())
+
+
+class ShowtimeBrowserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.pvr = make_theater(seat_count=4)
+        self.movie = self.pvr.movie
+        self.inox = self.show("INOX", timedelta(hours=1), seats=2)
+        self.pvr_tomorrow = self.show("PVR", timedelta(days=1), seats=3)
+        self.past = self.show("PVR", -timedelta(hours=1), seats=3)
+        self.user = User.objects.create_user("alice", password="pass")
+
+    def show(self, name, offset, seats):
+        theater = Theater.objects.create(name=name, movie=self.movie, time=self.now + offset)
+        Seat.objects.bulk_create(
+            Seat(theater=theater, seat_number=f"A{i}") for i in range(1, seats + 1)
+        )
+        return theater
+
+    def seat_ids(self, theater):
+        return list(Seat.objects.filter(theater=theater).order_by("id").values_list("id", flat=True))
+
+    def test_remaining_seats_in_one_query(self):
+        pvr_seats = self.seat_ids(self.pvr)
+        reserve_seats(self.pvr, self.user, pvr_seats[:2])
+        finalize_bookings(self.user, self.pvr.id, pvr_seats[:1])
+        stale = self.now - RESERVATION_TIMEOUT - timedelta(minutes=1)
+        Seat.objects.filter(id__in=self.seat_ids(self.inox)).update(is_reserved=True, reserved_at=stale)
+
+        with self.assertNumQueries(1):
+            shows = upcoming_shows(self.movie.id, self.now)
+
+        self.assertEqual(
+            [(show.id, show.capacity, show.remaining) for show in shows],
+            [(self.inox.id, 2, 2), (self.pvr.id, 4, 2), (self.pvr_tomorrow.id, 3, 3)],
+        )
+
+    def test_shows_are_grouped_by_date_then_venue(self):
+        day = timezone.make_aware(datetime(2026, 11, 1, 10))
+        shows = [
+            Show(1, "PVR", day, 10, 10),
+            Show(2, "INOX", day + timedelta(hours=2), 10, 5),
+            Show(3, "PVR", day + timedelta(hours=3), 10, 0),
+            Show(4, "PVR", day + timedelta(days=1), 10, 10),
+        ]
+
+        days = group_shows(shows)
+
+        self.assertEqual([d.date for d in days], [date(2026, 11, 1), date(2026, 11, 2)])
+        self.assertEqual(
+            [(venue.name, [show.id for show in venue.shows]) for venue in days[0].venues],
+            [("INOX", [2]), ("PVR", [1, 3])],
+        )
+
+    def test_counts_are_cached_per_movie_until_shows_change(self):
+        cached_upcoming_shows(self.movie.id)
+        with self.assertNumQueries(0):
+            cached_upcoming_shows(self.movie.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inox.name = "INOX Insignia"
+            self.inox.save()
+
+        venues = {show.venue for show in cached_upcoming_shows(self.movie.id)}
+        self.assertIn("INOX Insignia", venues)
+
+    def test_page_lists_upcoming_shows_only(self):
+        Seat.objects.filter(theater=self.inox).update(is_booked=True)
+
+        response = self.client.get(f"/movies/{self.movie.id}/theaters/")
+
+        self.assertContains(response, "INOX Theater")
+        self.assertContains(response, "Sold out", count=1)
+        self.assertContains(response, "4 of 4 seats left")
+        self.assertContains(response, f"/movies/theater/{self.pvr.id}/seats/book/")
+        self.assertNotContains(response, f"/movies/theater/{self.past.id}/seats/book/")
+        self.assertNotContains(response, f"/movies/theater/{self.inox.id}/seats/book/")
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        routers._down_until.clear()
+        self.movie = make_theater().movie
+        User.objects.create_user("alice", password="pass")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def tearDown(self):
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        routers._down_until.clear()
+
+    def add_replica(self, name):
+        replica = dict(connections.settings["default"], NAME=name)
+        connections.settings["replica"] = replica
+
+    def make_replica(self):
+        # A copy of the primary that then drifts, like a lagging replica.
+        path = os.path.join(self.tmp.name, "replica.sqlite3")
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        connection.connection.backup(target)
+        target.close()
+        self.add_replica(path)
+        Movie.objects.using("replica").filter(id=self.movie.id).update(name="Stale Inception")
+
+    def test_catalog_reads_go_to_the_replica(self):
+        self.make_replica()
+
+        response = self.client.get("/movies/")
+
+        self.assertContains(response, "Stale Inception")
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_tag_cached_pages_never_cache_the_replica(self):
+        self.make_replica()
+        self.client.get(f"/movies/movie/{self.movie.id}/")
+
+        # Changed on the primary only; the replica still lags behind.
+        self.movie.name = "Inception Redux"
+        self.movie.save()
+
+        for url in ("/", f"/movies/movie/{self.movie.id}/", f"/movies/{self.movie.id}/theaters/"):
+            for _ in range(2):
+                response = self.client.get(url)
+                self.assertContains(response, "Inception Redux")
+                self.assertNotContains(response, "Stale Inception")
+
+    def test_writer_is_pinned_to_the_primary(self):
+        self.make_replica()
+
+        response = self.client.post("/login/", {"username": "alice", "password": "pass"})
+
+        cookie = response.cookies[routers.PIN_COOKIE]
+        self.assertEqual(cookie["max-age"], settings.REPLICA_PIN_SECONDS)
+        response = self.client.get("/movies/")
+        self.assertContains(response, "Inception")
+        self.assertNotContains(response, "Stale Inception")
+
+    def test_writes_never_go_to_the_replica(self):
+        self.make_replica()
+        router = routers.ReplicaRouter()
+        movie = Movie.objects.using("replica").get(id=self.movie.id)
+
+        self.assertEqual(router.db_for_write(Movie, instance=movie), "default")
+        self.assertFalse(router.allow_migrate("replica", "movies"))
+
+    def test_unavailable_replica_fails_over_to_the_primary(self):
+        self.add_replica(os.path.join(self.tmp.name, "missing", "replica.sqlite3"))
+
+        with self.assertLogs("bookmyseat.routers", "WARNING"):
+            response = self.client.get("/movies/")
+        self.assertContains(response, "Inception")
+
+        # Skipped without another connection attempt until the retry time.
+        with mock.patch.object(connections["replica"], "ensure_connection") as ensure:
+            self.client.get("/movies/")
+        ensure.assert_not_called()
+
+
+@override_settings(WAITING_ROOM_ACTIVE_USERS=2, WAITING_ROOM_ADMISSION_SECONDS=600, WAITING_ROOM_POLL_SECONDS=10)
+class WaitingRoomTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        waitingroom.get_store.cache_clear()
+        self.addCleanup(waitingroom.get_store.cache_clear)
+        self.theater = make_theater(seat_count=4)
+        self.url = f"/movies/theater/{self.theater.id}/seats/book/"
+        self.users = [User.objects.create_user(f"user{i}", password="pass") for i in range(4)]
+
+    def client_for(self, user):
+        client = self.client_class()
+        client.force_login(user)
+        return client
+
+    def test_queue_is_first_in_first_out(self):
+        store = waitingroom.InMemoryWaitingRoomStore()
+        enter = lambda user, now: store.enter(1, user, now, limit=2, lifetime=600, idle=300)
+
+        self.assertTrue(enter("a", 0).admitted)
+        self.assertTrue(enter("b", 0).admitted)
+        self.assertEqual(enter("c", 1), waitingroom.Ticket(False, 1, 600))
+        self.assertEqual(enter("d", 2).position, 2)
+        self.assertEqual(enter("e", 3), waitingroom.Ticket(False, 3, 1200))
+
+        store.leave(1, "a", 120)
+        self.assertEqual(enter("d", 121).position, 1)
+        self.assertTrue(enter("c", 122).admitted)
+        # The wait estimate follows how long sessions actually take.
+        self.assertEqual(enter("d", 123).eta, 120)
+
+    def test_idle_and_expired_entries_are_dropped(self):
+        store = waitingroom.InMemoryWaitingRoomStore()
+        enter = lambda user, now: store.enter(1, user, now, limit=1, lifetime=600, idle=30)
+
+        enter("a", 0)
+        enter("b", 0)
+        enter("c", 20)
+        self.assertEqual(enter("c", 40).position, 1)  # b stopped polling
+        self.assertTrue(enter("c", 600).admitted)  # a's admission expired
+
+    def test_users_over_the_limit_wait_with_their_position(self):
+        clients = [self.client_for(user) for user in self.users]
+        for client in clients[:2]:
+            response = client.get(self.url)
+            self.assertContains(response, 'id="seat-data"')
+            self.assertIn(waitingroom.cookie_name(self.theater.id), response.cookies)
+
+        response = clients[3].get(self.url)
+        response = clients[2].get(self.url)
+        self.assertTemplateUsed(response, "movies/waiting_room.html")
+        self.assertEqual(response.context["position"], 2)
+        self.assertEqual(response.context["wait_minutes"], 10)
+        self.assertEqual(response["Refresh"], "10")
+        self.assertEqual(response["Cache-Control"], "no-store")
+
+        # Admitted users get through on their token alone.
+        with mock.patch.object(waitingroom, "get_store") as get_store:
+            self.assertEqual(clients[0].get(self.url).status_code, 200)
+        get_store.assert_not_called()
+
+        clients[0].get(f"/movies/theater/{self.theater.id}/success/")
+        self.assertContains(clients[3].get(self.url), 'id="seat-data"')
+        self.assertTemplateUsed(clients[2].get(self.url), "movies/waiting_room.html")
+
+    def test_token_is_bound_to_user_and_theater(self):
+        token = waitingroom.admission_token(self.theater.id, self.users[0].id)
+
+        self.assertTrue(waitingroom.is_admitted(token, self.theater.id, self.users[0].id))
+        self.assertFalse(waitingroom.is_admitted(token, self.theater.id, self.users[1].id))
+        self.assertFalse(waitingroom.is_admitted(token, self.theater.id + 1, self.users[0].id))
+        self.assertFalse(waitingroom.is_admitted(token + "x", self.theater.id, self.users[0].id))
+
+    def test_payment_return_frees_the_slot(self):
+        client = self.client_for(self.users[0])
+        client.get(self.url)
+
+        response = client.get(f"/movies/theater/{self.theater.id}/success/")
+
+        self.assertEqual(response.cookies[waitingroom.cookie_name(self.theater.id)]["max-age"], 0)
+        self.assertEqual(waitingroom.get_store()._rooms, {})
+
+
+class BookingStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("alice", password="pass")
+        self.theater = make_theater(seat_count=5)
+        self.seats = list(Seat.objects.filter(theater=self.theater).order_by("id"))
+
+    def book(self, seats, theater=None):
+        theater = theater or self.theater
+        reserve_seats(theater, self.user, [seat.id for seat in seats])
+        return finalize_bookings(self.user, theater.id)
+
+    def stat(self, kind, object_id):
+        return BookingStat.objects.get(kind=kind, object_id=object_id)
+
+    def test_bulk_finalize_updates_counters(self):
+        self.book(self.seats[:3])
+
+        self.assertEqual(total_stats(), (3, 600))
+        self.assertEqual(self.stat(BookingStat.MOVIE, self.theater.movie_id).bookings, 3)
+        self.assertEqual(self.stat(BookingStat.THEATER, self.theater.id).revenue, 600)
+        self.assertEqual(stats_drift(), {})
+
+    def test_single_creates_and_deletes_update_counters(self):
+        booking = Booking.objects.create(
+            user=self.user, seat=self.seats[0],
+            movie=self.theater.movie, theater=self.theater,
+        )
+        self.assertEqual(total_stats(), (1, 200))
+
+        booking.delete()
+        self.assertEqual(total_stats(), (0, 0))
+
+        self.book(self.seats[:2])
+        self.theater.movie.delete()
+        self.assertEqual(total_stats(), (0, 0))
+        self.assertEqual(stats_drift(), {})
+
+    def test_bookings_for_different_shows_share_no_row(self):
+        other = make_theater(seat_count=2)
+        self.book(self.seats[:1])
+        self.book(Seat.objects.filter(theater=other), theater=other)
+
+        self.assertEqual(
+            set(BookingStat.objects.values_list("kind", "object_id")),
+            {
+                (BookingStat.MOVIE, self.theater.movie_id), (BookingStat.THEATER, self.theater.id),
+                (BookingStat.MOVIE, other.movie_id), (BookingStat.THEATER, other.id),
+            },
+        )
+        self.assertEqual(total_stats(), (3, 600))
+
+    def test_counters_roll_back_with_the_booking(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.book(self.seats[:2])
+            raise RuntimeError
+
+        self.assertEqual(total_stats(), (0, 0))
+
+    def test_dashboard_reads_counters_not_bookings(self):
+        other = make_theater(seat_count=2)
+        self.book(self.seats)
+        self.book(Seat.objects.filter(theater=other), theater=other)
+        staff = User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.force_login(staff)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/movies/admin-dashboard/")
+
+        self.assertFalse([q for q in queries if '"movies_booking"' in q["sql"]])
+        self.assertEqual(response.context["total_bookings"], 7)
+        self.assertEqual(response.context["total_revenue"], 1400)
+        self.assertEqual(
+            [(t.id, t.bookings) for t in response.context["busy_theaters"]],
+            [(self.theater.id, 5), (other.id, 2)],
+        )
+
+    def test_command_fixes_drift(self):
+        self.book(self.seats[:2])
+        BookingStat.objects.filter(kind=BookingStat.MOVIE).update(bookings=9)
+        Booking.objects.bulk_create([
+            Booking(user=self.user, seat=self.seats[4], movie=self.theater.movie, theater=self.theater)
+        ])
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_booking_stats", "--check", stdout=StringIO())
+        call_command("rebuild_booking_stats", stdout=StringIO())
+
+        self.assertEqual(stats_drift(), {})
+        self.assertEqual(total_stats(), (3, 600))
+
+
+class BookingRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("alice", password="pass")
+        self.theater = make_theater(seat_count=4)
+        self.seat_ids = list(
+            Seat.objects.filter(theater=self.theater).order_by("id").values_list("id", flat=True)
+        )
+
+    def rollups(self, period):
+        return {
+            (row.bucket, row.theater_id): (row.holds, row.bookings, row.revenue)
+            for row in BookingRollup.objects.filter(period=period)
+        }
+
+    def test_holds_and_bookings_land_in_hour_and_day_buckets(self):
+        reserve_seats(self.theater, self.user, self.seat_ids[:3])
+        finalize_bookings(self.user, self.theater.id, self.seat_ids[:2])
+        now = timezone.now()
+
+        for period in (BookingRollup.HOUR, BookingRollup.DAY):
+            with self.subTest(period=period):
+                self.assertEqual(
+                    self.rollups(period),
+                    {(bucket_start(now, period), self.theater.id): (3, 2, 400)},
+                )
+
+        hour = series(BookingRollup.HOUR, 24)[-1]
+        self.assertEqual((hour["bookings"], hour["holds"]), (2, 3))
+        self.assertAlmostEqual(hour["conversion"], 2 / 3)
+        self.assertEqual(hour["width"], 100)
+
+    def test_deleted_bookings_leave_their_bucket(self):
+        reserve_seats(self.theater, self.user, self.seat_ids[:2])
+        finalize_bookings(self.user, self.theater.id)
+
+        Booking.objects.filter(seat_id=self.seat_ids[0]).delete()
+
+        day = series(BookingRollup.DAY, 1)[0]
+        self.assertEqual((day["bookings"], day["revenue"]), (1, 200))
+
+    def test_series_fills_empty_buckets(self):
+        now = timezone.now()
+        points = series(BookingRollup.DAY, 7, now=now)
+
+        self.assertEqual(len(points), 7)
+        self.assertEqual(points[-1]["bucket"], bucket_start(now, BookingRollup.DAY))
+        self.assertEqual(points[0]["bucket"], points[-1]["bucket"] - timedelta(days=6))
+        self.assertTrue(all(p["bookings"] == 0 and p["conversion"] is None for p in points))
+
+    def test_backfill_streams_existing_bookings_in_chunks(self):
+        last_week = timezone.now() - timedelta(days=7)
+        Booking.objects.bulk_create(
+            Booking(user=self.user, seat_id=seat_id, movie=self.theater.movie, theater=self.theater)
+            for seat_id in self.seat_ids
+        )
+        Booking.objects.filter(seat_id__in=self.seat_ids[:3]).update(booked_at=last_week)
+        # A drifted bucket that the backfill must correct.
+        BookingRollup.objects.create(
+            period=BookingRollup.DAY, bucket=bucket_start(last_week, BookingRollup.DAY),
+            theater_id=self.theater.id, movie_id=self.theater.movie_id, holds=5, bookings=9,
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(backfill_rollups(chunk_size=2), 4)
+
+        selects = [q for q in queries if 'FROM "movies_booking"' in q["sql"]]
+        self.assertEqual(len(selects), 1)
+        days = self.rollups(BookingRollup.DAY)
+        self.assertEqual(
+            days[(bucket_start(last_week, BookingRollup.DAY), self.theater.id)], (5, 3, 600)
+        )
+        self.assertEqual(sum(bookings for _, bookings, _ in days.values()), 4)
+        self.assertEqual(sum(b for _, b, _ in self.rollups(BookingRollup.HOUR).values()), 4)
+
+    def test_occupancy_reads_seat_maps(self):
+        Theater.objects.filter(id=self.theater.id).update(time=timezone.now() + timedelta(hours=2))
+        reserve_seats(self.theater, self.user, self.seat_ids[:1])
+        finalize_bookings(self.user, self.theater.id)
+
+        show, = showtime_occupancy()
+
+        self.assertEqual((show["booked"], show["capacity"], show["occupancy"]), (1, 4, 25))
+
+    def test_dashboard_charts_render(self):
+        reserve_seats(self.theater, self.user, self.seat_ids[:2])
+        finalize_bookings(self.user, self.theater.id)
+        staff = User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get("/movies/admin-dashboard/")
+
+        self.assertContains(response, "Bookings per Hour")
+        self.assertContains(response, "100%")
+        self.assertEqual(response.context["trending_movies"][0].bookings, 2)
+
+
+@override_settings(PROFILING=True, PROFILING_SLOW_MS=0)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.theater = make_theater(seat_count=4)
+
+    def test_server_timing_header(self):
+        response = self.client.get(f"/movies/{self.theater.movie.id}/theaters/")
+
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertRegex(timing, r"template;dur=[\d.]+")
+        self.assertRegex(timing, r"total;dur=[\d.]+")
+        self.assertNotIn("template;dur=0.0,", timing)
+
+    @override_settings(PROFILING=False)
+    def test_disabled_middleware_is_removed(self):
+        response = self.client.get(f"/movies/{self.theater.movie.id}/theaters/")
+
+        self.assertNotIn("Server-Timing", response)
+
+    def test_slow_requests_keep_top_queries(self):
+        self.client.get(f"/movies/{self.theater.movie.id}/theaters/")
+
+        entry, = slow_requests()
+        self.assertEqual(entry["path"], f"/movies/{self.theater.movie.id}/theaters/")
+        self.assertEqual(entry["status"], 200)
+        self.assertGreater(entry["query_count"], 0)
+        self.assertLessEqual(len(entry["top_queries"]), 5)
+        self.assertIn("SELECT", entry["top_queries"][0]["sql"])
+
+    @override_settings(PROFILING_BUFFER_SIZE=2)
+    def test_slow_request_log_is_bounded(self):
+        for _ in range(3):
+            self.client.get("/movies/")
+
+        self.assertEqual(len(slow_requests()), 2)
+
+    def test_timed_is_a_no_op_outside_requests(self):
+        with timed("stripe"):
+            pass
+
+        self.assertEqual(slow_requests(), [])
+
+    def test_dashboard_lists_slow_requests(self):
+        self.client.get(f"/movies/{self.theater.movie.id}/theaters/")
+        staff = User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get("/movies/admin-dashboard/")
+
+        self.assertContains(response, "Slowest Requests")
+        self.assertContains(response, f"GET /movies/{self.theater.movie.id}/theaters/")
+
+
+class ShowGeneratorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.movie = Movie.objects.create(
+            name="Inception", image="movies/inception.jpg", rating="8.8",
+            cast="Leonardo DiCaprio", genre="Thriller", language="English",
+        )
+        self.layout = HallLayout.objects.create(
+            name="Audi", rows=3, seats_per_row=6, gaps="3, C6"
+        )
+        self.start = timezone.localdate() + timedelta(days=1)
+
+    def generate(self, **kwargs):
+        options = {
+            "halls": ["Audi 1", "Audi 2"],
+            "start": self.start,
+            "days": 2,
+            "times": [time(10), time(19, 30)],
+        }
+        options.update(kwargs)
+        return generate_shows(self.movie, self.layout, **options)
+
+    def test_layout_seat_numbers_skip_gaps(self):
+        self.assertEqual(
+            seat_numbers(self.layout),
+            ["A1", "A2", "A4", "A5", "A6", "B1", "B2", "B4", "B5", "B6", "C1", "C2", "C4", "C5"],
+        )
+        self.assertEqual([row_label(i) for i in (0, 25, 26, 27)], ["A", "Z", "AA", "AB"])
+
+    def test_generates_every_hall_time_and_seat(self):
+        self.assertEqual(self.generate(), (8, 8 * 14))
+
+        theaters = Theater.objects.filter(movie=self.movie)
+        self.assertEqual(theaters.count(), 8)
+        self.assertEqual(
+            sorted({timezone.localtime(t.time).time() for t in theaters}), [time(10), time(19, 30)]
+        )
+        for theater in theaters:
+            self.assertEqual(Seat.objects.filter(theater=theater).count(), 14)
+        self.assertEqual(get_seat_map(theaters[0]).available_count(hold_cutoff()), 14)
+
+    def test_rerun_skips_existing_shows(self):
+        self.generate(days=1)
+
+        self.assertEqual(self.generate(days=2), (4, 4 * 14))
+        self.assertEqual(Theater.objects.filter(movie=self.movie).count(), 8)
+
+    def test_queries_grow_with_chunks_not_seats(self):
+        with CaptureQueriesContext(connection) as small:
+            self.generate(days=1, chunk_size=10_000)
+        self.layout.rows = 20
+        self.layout.save()
+        with CaptureQueriesContext(connection) as large:
+            self.generate(start=self.start + timedelta(days=5), days=1, chunk_size=10_000)
+
+        self.assertLessEqual(len(large), len(small) + 2)
+
+    def test_new_shows_expire_the_theater_list(self):
+        url = f"/movies/{self.movie.id}/theaters/"
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.generate(halls=["IMAX"], days=1)
+
+        self.assertContains(self.client.get(url), "IMAX Theater")
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            "generate_shows", str(self.movie.id), "Audi", "--hall", "Audi 1",
+            "--start", self.start.isoformat(), "--days", "3", "--times", "10:00,13:00",
+            stdout=out,
+        )
+
+        self.assertIn("Created 6 shows with 84 seats.", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command(
+                "generate_shows", str(self.movie.id), "Audi", "--hall", "X",
+                "--start", "tomorrow", "--times", "10:00", stdout=StringIO(),
+            )
+
+    @override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+    def test_admin_action(self):
+        admin_user = User.objects.create_superuser("admin", password="pass")
+        self.client.force_login(admin_user)
+        data = {"action": "generate_showtimes", "_selected_action": [self.movie.id]}
+
+        form = self.client.post("/admin/movies/movie/", data)
+        self.assertContains(form, "Generate showtimes")
+
+        data.update({
+            "apply": "Generate", "layout": self.layout.id, "halls": "Audi 1",
+            "start": self.start.isoformat(), "days": 1, "times": "10:00",
+        })
+        response = self.client.post("/admin/movies/movie/", data)
+
+        self.assertRedirects(response, "/admin/movies/movie/", fetch_redirect_response=False)
+        self.assertEqual(Seat.objects.filter(theater__movie=self.movie).count(), 14)
+
+
+def poster_upload(width=1000, height=1500, color="red", name="poster.png"):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class PosterRenditionTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def create(self, image):
+        return Movie.objects.create(
+            name="Inception", image=image, rating="8.8",
+            cast="Leonardo DiCaprio", genre="Thriller", language="English",
+        )
+
+    def stored(self, renditions, width, ext):
+        path = os.path.join(self.media_root, rendition_name(renditions["hash"], width, ext))
+        return Image.open(path) if os.path.exists(path) else None
+
+    def test_upload_writes_every_width_in_both_formats(self):
+        movie = self.create(poster_upload())
+
+        renditions = movie.poster_renditions
+        self.assertEqual(renditions["widths"], list(RENDITION_WIDTHS))
+        for width in RENDITION_WIDTHS:
+            self.assertEqual(self.stored(renditions, width, "webp").size, (width, width * 3 // 2))
+            self.assertEqual(self.stored(renditions, width, "jpg").format, "JPEG")
+
+    def test_same_content_shares_renditions(self):
+        first = self.create(poster_upload(name="a.png"))
+        second = self.create(poster_upload(name="b.png"))
+        other = self.create(poster_upload(color="blue"))
+
+        self.assertEqual(first.poster_renditions, second.poster_renditions)
+        self.assertNotEqual(first.poster_renditions["hash"], other.poster_renditions["hash"])
+
+    def test_small_posters_are_not_upscaled(self):
+        movie = self.create(poster_upload(width=120, height=180))
+
+        self.assertEqual(movie.poster_renditions["widths"], [120])
+
+    def test_malformed_uploads_are_saved_without_renditions(self):
+        png = poster_upload().read()
+        uploads = {
+            "truncated": lambda: SimpleUploadedFile("cut.png", png[:60], content_type="image/png"),
+            "decompression bomb": poster_upload,
+        }
+        for name, upload in uploads.items():
+            with self.subTest(name), mock.patch.object(Image, "MAX_IMAGE_PIXELS", 1000):
+                with self.assertLogs("movies.signals", "WARNING"):
+                    movie = self.create(upload())
+                self.assertIsNone(movie.poster_renditions)
+
+        with mock.patch("movies.signals.make_renditions", side_effect=SyntaxError("broken PNG file")):
+            with self.assertLogs("movies.signals", "WARNING"):
+                self.assertIsNone(self.create(poster_upload()).poster_renditions)
+
+    def test_tag_emits_srcset(self):
+        movie = self.create(poster_upload())
+        template = Template('{% load posters %}{% poster movie sizes="33vw" class="card-img-top" %}')
+
+        html = template.render(Context({"movie": movie}))
+
+        self.assertIn('<source type="image/webp" srcset="/media/renditions/', html)
+        self.assertIn("-200.webp 200w", html)
+        self.assertIn("-800.jpg 800w", html)
+        self.assertIn('sizes="33vw"', html)
+        self.assertIn('class="card-img-top"', html)
+
+        movie.poster_renditions = None
+        html = template.render(Context({"movie": movie}))
+        self.assertIn(f'<img src="{movie.image.url}"', html)
+
+    def test_command_regenerates_in_a_process_pool(self):
+        movie = self.create(poster_upload())
+        Movie.objects.filter(id=movie.id).update(poster_renditions=None)
+        for path in (os.path.join(root, f) for root, _, files in os.walk(self.media_root) for f in files):
+            if "renditions" in path:
+                os.remove(path)
+        out = StringIO()
+
+        call_command("regenerate_posters", "--workers", "2", "--missing", stdout=out)
+
+        movie.refresh_from_db()
+        self.assertIn("Rendered posters for 1 movies (0 failed).", out.getvalue())
+        self.assertEqual(movie.poster_renditions["widths"], list(RENDITION_WIDTHS))
+        self.assertIsNotNone(self.stored(movie.poster_renditions, 400, "webp"))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("alice", email="alice@example.com", password="pass")
+        self.theater = make_theater(seat_count=6)
+        self.other = make_theater(seat_count=2)
+        self.book(self.theater, 4)
+        self.book(self.other, 1)
+        staff = User.objects.create_user("admin", password="pass", is_staff=True, is_superuser=True)
+        self.client.force_login(staff)
+
+    def book(self, theater, count):
+        seats = Seat.objects.filter(theater=theater).order_by("id")[:count]
+        Booking.objects.bulk_create(
+            Booking(user=self.user, seat=seat, movie=theater.movie, theater=theater)
+            for seat in seats
+        )
+
+    def content(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def test_bookings_csv_streams_joined_rows(self):
+        response = self.client.get("/movies/export/bookings.csv")
+
+        self.assertTrue(response.streaming)
+        self.assertIn('filename="bookings-', response["Content-Disposition"])
+        lines = self.content(response).splitlines()
+        self.assertEqual(
+            lines[0], "id,booked_at,user,email,movie,theater,show_time,seat"
+        )
+        self.assertEqual(len(lines), 6)
+        self.assertIn(",alice,alice@example.com,Inception,PVR,", lines[1])
+        self.assertTrue(lines[1].endswith(",A1"))
+
+    def test_seats_ndjson(self):
+        response = self.client.get(f"/movies/export/seats.ndjson?theater={self.theater.id}")
+
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]["booked_by"], "alice")
+        self.assertIsNone(rows[5]["booked_by"])
+        self.assertEqual(rows[0]["seat"], "A1")
+
+    def test_filters(self):
+        Booking.objects.filter(theater=self.other).update(
+            booked_at=timezone.now() - timedelta(days=10)
+        )
+        today = timezone.localdate().isoformat()
+
+        def count(query):
+            return len(self.content(self.client.get(f"/movies/export/bookings.csv?{query}")).splitlines()) - 1
+
+        self.assertEqual(count(f"start={today}"), 4)
+        self.assertEqual(count(f"end={(timezone.localdate() - timedelta(days=1)).isoformat()}"), 1)
+        self.assertEqual(count(f"theater={self.other.id}"), 1)
+        self.assertEqual(count(f"movie={self.theater.movie_id}&start={today}&end={today}"), 4)
+
+    def test_one_query_and_flat_memory_whatever_the_row_count(self):
+        def measure():
+            with CaptureQueriesContext(connection) as queries:
+                tracemalloc.start()
+                for _ in export_lines("seats", Seat.objects.all(), "csv", chunk_size=100):
+                    pass
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            return len(queries), peak
+
+        def add_seats(count):
+            Seat.objects.bulk_create(
+                Seat(theater=self.other, seat_number=f"B{i}") for i in range(count)
+            )
+
+        add_seats(2000)
+        small_queries, small_peak = measure()
+        add_seats(8000)
+        large_queries, large_peak = measure()
+
+        self.assertEqual(small_queries, large_queries)
+        # Five times the rows, (about) the same peak: one write buffer.
+        self.assertLess(large_peak, small_peak * 1.3)
+
+    def test_unknown_export_and_non_staff(self):
+        self.assertEqual(self.client.get("/movies/export/users.csv").status_code, 404)
+        self.assertEqual(self.client.get("/movies/export/bookings.xml").status_code, 404)
+
+        self.client.force_login(self.user)
+        response = self.client.get("/movies/export/bookings.csv")
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+    def test_admin_action_streams_selected_rows(self):
+        selected = Booking.objects.filter(theater=self.theater).values_list("id", flat=True)
+
+        response = self.client.post("/admin/movies/booking/", {
+            "action": "export_ndjson", "_selected_action": list(selected),
+        })
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(self.content(response).splitlines()), 4)
+
+    async def test_asgi_exports_stream_asynchronously(self):
+        staff = await sync_to_async(User.objects.get)(username="admin")
+        await sync_to_async(self.async_client.force_login)(staff)
+
+        response = await self.async_client.get("/movies/export/bookings.csv")
+
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(body.splitlines()), 6)
@@ -1,18 +1,128 @@
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta
-from .models import Seat
+from .models import Booking, Seat, Theater
+from .seatmap import rebuild_seat_map, update_seat_map
+from .signals import bookings_created, seats_held
 
+RESERVATION_TIMEOUT = timedelta(minutes=5)
 
-def release_expired_seats():
-    expiry_time = timezone.now() - timedelta(minutes=5)
 
-    expired_seats = Seat.objects.filter(
+def hold_cutoff(now=None):
+    return (now or timezone.now()) - RESERVATION_TIMEOUT
+
+
+def active_hold_q(now=None):
+    """Seats held by someone whose reservation has not yet expired."""
+    return Q(is_reserved=True, reserved_at__gte=hold_cutoff(now))
+
+
+def free_seat_q(now=None):
+    """Seats nobody has booked or currently holds (stale holds count as free)."""
+    return Q(is_booked=False) & (
+        Q(is_reserved=False) | Q(reserved_at__lt=hold_cutoff(now))
+    )
+
+
+def release_expired_seats(now=None):
+    """Clear every expired hold in a single UPDATE and return how many."""
+    expired = Seat.objects.filter(
         is_reserved=True,
-        reserved_at__lt=expiry_time
+        reserved_at__lt=hold_cutoff(now)
     )
 
-    for seat in expired_seats:
-        seat.is_reserved = False
-        seat.reserved_at = None
-        seat.reserved_by = None
-        seat.save()
+    with transaction.atomic():
+        theater_ids = list(expired.values_list("theater_id", flat=True).distinct())
+        released = expired.update(
+            is_reserved=False,
+            reserved_at=None,
+            reserved_by=None,
+        )
+        for theater_id in theater_ids:
+            rebuild_seat_map(theater_id)
+
+    return released
+
+
+def reserve_seats(theater, user, seat_ids, all_or_nothing=False):
+    """
+    Reserve the requested seats for ``user`` with one conditional UPDATE.
+
+    The availability check lives in the WHERE clause, so two users racing
+    for the same seat can never both win it. Returns ``(won, lost)`` as
+    lists of seat ids. With ``all_or_nothing`` the hold is rolled back
+    unless every requested seat was won.
+    """
+    # Form values are untrusted; anything that is not an id is ignored.
+    seat_ids = {int(seat_id) for seat_id in seat_ids if str(seat_id).isdecimal()}
+    if not seat_ids:
+        return [], []
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        updated = Seat.objects.filter(
+            free_seat_q(now),
+            id__in=seat_ids,
+            theater=theater,
+        ).update(
+            is_reserved=True,
+            reserved_by=user,
+            reserved_at=now,
+        )
+
+        if all_or_nothing and updated != len(seat_ids):
+            transaction.set_rollback(True)
+            return [], sorted(seat_ids)
+
+        won = set(
+            Seat.objects.filter(
+                id__in=seat_ids,
+                reserved_by=user,
+                reserved_at=now,
+            ).values_list("id", flat=True)
+        )
+        if won:
+            update_seat_map(theater.id, lambda seat_map: seat_map.mark_held(won, now))
+            seats_held.send(sender=Seat, theater=theater, seat_ids=won, reserved_at=now)
+
+    return sorted(won), sorted(seat_ids - won)
+
+
+def finalize_bookings(user, theater_id, seat_ids=None):
+    """
+    Turn ``user``'s active holds in a theater (optionally only ``seat_ids``)
+    into bookings.
+
+    Runs in one transaction with a constant number of queries: lock the
+    held seats, flip them to booked in one UPDATE, ``bulk_create`` the
+    bookings and send ``bookings_created`` for the bulk side effects.
+    Returns the new bookings (empty if there was nothing to finalize, e.g.
+    a repeated success redirect).
+    """
+    held = Seat.objects.select_for_update().filter(
+        active_hold_q(), theater_id=theater_id, reserved_by=user
+    )
+    if seat_ids is not None:
+        held = held.filter(id__in=seat_ids)
+
+    with transaction.atomic():
+        seats = list(held.only("id", "seat_number", "theater_id").order_by("id"))
+        if not seats:
+            return []
+
+        theater = Theater.objects.select_related("movie").get(id=theater_id)
+        Seat.objects.filter(id__in=[seat.id for seat in seats]).update(
+            is_booked=True,
+            is_reserved=False,
+            reserved_by=None,
+            reserved_at=None,
+        )
+        bookings = Booking.objects.bulk_create(
+            Booking(user=user, seat=seat, movie=theater.movie, theater=theater)
+            for seat in seats
+        )
+        bookings_created.send(sender=Booking, bookings=bookings, theater=theater)
+
+    return bookings
@@ -1,19 +1,47 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
-from django.core.mail import send_mail
+from django.contrib.auth.views import redirect_to_login
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.db.models.functions import Trim
 from django.utils import timezone
-from django.db.models import Count
-from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_safe
+from asgiref.sync import sync_to_async
+from bookmyseat.routers import replica_reads
 
+import json
 import stripe
 import logging
-
-from .models import Movie, Theater, Seat, Booking
-from .utils import release_expired_seats
-
-PRICE_PER_SEAT = 200  # INR
+from datetime import timedelta
+
+from .catalog import catalog_page, get_facets, parse_cursor
+from .exports import EXPORTS, FORMATS, export_response, filter_export
+from .live import event_stream, get_broadcaster, seat_channel
+from .models import Movie, Theater, Seat, BookingRollup, BookingStat
+from .pagecache import cache_anonymous_page, movie_tag, page_version, theaters_tag
+from .payments import (
+    complete_checkout,
+    create_checkout_session,
+    handle_webhook,
+    prepare_checkout,
+    record_payment,
+    retrieve_checkout_session,
+)
+from .profiling import slow_requests
+from .rollups import series, showtime_occupancy, top_movies
+from .search import search_movies
+from .seatjson import seat_payload
+from .showtimes import cached_upcoming_shows, group_shows
+from .seatmap import get_cached_theater, get_seat_map, load_seat_map
+from .stats import top, total_stats
+from .utils import active_hold_q, hold_cutoff, reserve_seats
+from .waitingroom import admission_required, cookie_name, release
+
+SEARCH_LIMIT = 60
 logger = logging.getLogger(__name__)
 
 
@@ -21,30 +49,67 @@ logger = logging.getLogger(__name__)
 # MOVIES
 # ======================
 
+@replica_reads
 def movie_list(request):
     movies = Movie.objects.all()
+    filtered = False
 
-    if request.GET.get("search"):
-        movies = movies.filter(name__icontains=request.GET["search"])
+    # Matched like the facets are counted: trimmed and case-insensitive.
     if request.GET.get("genre"):
-        movies = movies.filter(genre__iexact=request.GET["genre"])
+        movies = movies.alias(genre_key=Trim("genre")).filter(genre_key__iexact=request.GET["genre"].strip())
+        filtered = True
     if request.GET.get("language"):
-        movies = movies.filter(language__iexact=request.GET["language"])
+        movies = movies.alias(language_key=Trim("language")).filter(
+            language_key__iexact=request.GET["language"].strip()
+        )
+        filtered = True
+    if request.GET.get("search"):
+        # Ranked, typo-tolerant search over name, cast, description, genre
+        # and language instead of a name__icontains table scan. Filters are
+        # applied inside the ranking so the limit counts matching movies only.
+        allowed = set(movies.values_list("id", flat=True)) if filtered else None
+        ranked_ids = search_movies(request.GET["search"], limit=SEARCH_LIMIT, allowed=allowed)
+        by_id = movies.in_bulk(ranked_ids)
+        movies = [by_id[movie_id] for movie_id in ranked_ids if movie_id in by_id]
+        next_after = None
+    else:
+        movies, next_after = catalog_page(movies, parse_cursor(request.GET.get("after")))
+
+    return render(request, "movies/movie_list.html", {
+        "movies": movies,
+        "next_after": next_after,
+        "facets": get_facets(),
+    })
+
+
+def movie_detail_tags(movie_id):
+    return [movie_tag(movie_id)]
 
-    return render(request, "movies/movie_list.html", {"movies": movies})
 
+def theater_list_tags(movie_id):
+    return [movie_tag(movie_id), theaters_tag(movie_id)]
 
+
+# Tag-cached pages read from the primary: a render from a lagging replica
+# right after a bump would be stored under the new tag version and served
+# until it times out.
+@cache_anonymous_page("movie_detail", movie_detail_tags)
 def movie_detail(request, movie_id):
     movie = get_object_or_404(Movie, id=movie_id)
-    return render(request, "movies/movie_detail.html", {"movie": movie})
+    return render(request, "movies/movie_detail.html", {
+        "movie": movie,
+        "cache_version": page_version(movie_detail_tags(movie_id)),
+    })
 
 
+# Remaining-seat counts change with every hold, so the page is only kept
+# as long as the showtimes cache behind it.
+@cache_anonymous_page("theater_list", theater_list_tags, timeout=settings.SHOWTIMES_CACHE_TIMEOUT)
 def theater_list(request, movie_id):
     movie = get_object_or_404(Movie, id=movie_id)
-    theaters = Theater.objects.filter(movie=movie)
     return render(request, "movies/theater_list.html", {
         "movie": movie,
-        "theaters": theaters
+        "days": group_shows(cached_upcoming_shows(movie_id)),
     })
 
 
@@ -52,38 +117,94 @@ def theater_list(request, movie_id):
 # SEAT BOOKING
 # ======================
 
-@login_required
-def book_seats(request, theater_id):
-    release_expired_seats()
-    theater = get_object_or_404(Theater, id=theater_id)
+def seat_cells(seat_map):
+    # Stale holds are shown as free without waiting for the expiry worker.
+    return list(seat_map.seats(hold_cutoff()))
 
-    if request.method == "POST":
-        seat_ids = request.POST.getlist("seats")
-
-        for seat in Seat.objects.filter(id__in=seat_ids, theater=theater):
-            if not seat.is_booked and not seat.is_reserved:
-                seat.is_reserved = True
-                seat.reserved_by = request.user
-                seat.reserved_at = timezone.now()
-                seat.save()
 
-        return redirect("confirm_booking", theater_id=theater.id)
-
-    seats = Seat.objects.filter(theater=theater)
+def seat_page(request, theater, seat_map, error=None):
+    # The grid is drawn by the page's script from seat_data; the cells are
+    # only rendered for browsers without JavaScript.
+    etag, body = seat_payload(theater.id)
     return render(request, "movies/seat_selection.html", {
         "theater": theater,
-        "seats": seats
+        "seats": seat_cells(seat_map),
+        "seat_data": json.loads(body),
+        "seat_etag": etag,
+        "error": error,
     })
 
 
+@login_required
+@admission_required
+def book_seats(request, theater_id):
+    theater = get_cached_theater(theater_id)
+
+    if request.method == "POST":
+        seat_ids = request.POST.getlist("seats")
+        won, lost = reserve_seats(theater, request.user, seat_ids)
+
+        if won:
+            return redirect("confirm_booking", theater_id=theater.id)
+
+        error = "Please select at least one seat."
+        if lost:
+            error = "Sorry, the selected seats were just taken. Please pick again."
+        return seat_page(request, theater, load_seat_map(theater.id), error)
+
+    return seat_page(request, theater, get_seat_map(theater))
+
+
+@require_safe
+def seat_data(request, theater_id):
+    """
+    The theater's seats as compact JSON (see movies/seatjson.py) for
+    polling clients; a poll with the current ETag gets a 304.
+    """
+    etag, body = seat_payload(theater_id)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+async def seat_events(request, theater_id):
+    """
+    Server-sent events with the theater's seat changes, for the seat page.
+
+    Streams only under ASGI; a WSGI worker would be held for as long as the
+    page is open, so there a 204 tells EventSource not to reconnect.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    # Subscribe before reading the snapshot so no change falls in between.
+    subscription = get_broadcaster().subscribe(seat_channel(theater_id))
+    try:
+        theater = await sync_to_async(get_cached_theater)(theater_id)
+        snapshot = get_seat_map(theater).snapshot(hold_cutoff())
+    except BaseException:
+        # From here on the stream owns the subscription and closes it.
+        subscription.close()
+        raise
+
+    response = StreamingHttpResponse(
+        event_stream(subscription, snapshot), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @login_required
 def confirm_booking(request, theater_id):
-    release_expired_seats()
     theater = get_object_or_404(Theater, id=theater_id)
 
     seats = Seat.objects.filter(
+        active_hold_q(),
         theater=theater,
-        is_reserved=True,
         reserved_by=request.user
     )
 
@@ -103,9 +224,17 @@ def confirm_booking(request, theater_id):
 # PAYMENT (STRIPE)
 # ======================
 
-@login_required
-def make_payment(request, theater_id):
-    release_expired_seats()
+async def authenticated_user(request):
+    # login_required only learns to wrap async views in Django 5.0.
+    return await sync_to_async(
+        lambda: request.user if request.user.is_authenticated else None
+    )()
+
+
+async def make_payment(request, theater_id):
+    user = await authenticated_user(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
 
     if not settings.STRIPE_SECRET_KEY:
         return HttpResponse(
@@ -113,125 +242,69 @@ def make_payment(request, theater_id):
             status=503
         )
 
-    stripe.api_key = settings.STRIPE_SECRET_KEY
-
-    seats = Seat.objects.filter(
-        theater_id=theater_id,
-        is_reserved=True,
-        reserved_by=request.user
-    )
-
-    if not seats.exists():
+    checkout = await sync_to_async(prepare_checkout)(user, theater_id)
+    if checkout is None:
         return redirect("movie_list")
+    seat_ids, amount, idempotency_key = checkout
 
-    amount = seats.count() * PRICE_PER_SEAT
-
+    success_url = request.build_absolute_uri(
+        f"/movies/theater/{theater_id}/success/"
+    ) + "?session_id={CHECKOUT_SESSION_ID}"
+    cancel_url = request.build_absolute_uri(
+        f"/movies/theater/{theater_id}/confirm/"
+    )
     try:
-        success_url = request.build_absolute_uri(
-            f"/movies/theater/{theater_id}/success/"
-        )
-        cancel_url = request.build_absolute_uri(
-            f"/movies/theater/{theater_id}/confirm/"
+        session = await create_checkout_session(
+            user, theater_id, seat_ids, amount, idempotency_key,
+            success_url, cancel_url,
         )
-        print(f"Creating Stripe session with success_url: {success_url}")
-        session = stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=[{
-                "price_data": {
-                    "currency": "inr",
-                    "product_data": {
-                        "name": "Movie Tickets",
-                    },
-                    "unit_amount": amount * 100,
-                },
-                "quantity": 1,
-            }],
-            mode="payment",
-            success_url=success_url,
-            cancel_url=cancel_url,
-            customer_email=request.user.email,
-        )
-        print(f"Stripe session created: {session.id}, URL: {session.url}")
-    except Exception as e:
+    except stripe.StripeError as e:
         return HttpResponse(f"Stripe error: {str(e)}", status=500)
 
+    await sync_to_async(record_payment)(user, theater_id, seat_ids, amount, session.id)
+    logger.info("Stripe session %s created for user %s", session.id, user.id)
     return redirect(session.url)
 
 
-@login_required
-def payment_success(request, theater_id):
-    print(f"Payment success view called for user {request.user.username}")
-    release_expired_seats()
-    seats = Seat.objects.filter(
-        theater_id=theater_id,
-        is_reserved=True,
-        reserved_by=request.user
-    )
-
-    if not seats.exists():
-        print("No reserved seats found, redirecting to movie_list")
-        return redirect("movie_list")
-
-    # Evaluate the queryset once to avoid issues
-    seats = list(seats)
-    if not seats:
-        print("Seats list is empty after evaluation, redirecting")
-        return redirect("movie_list")
-
-    # Get movie and theater details from the first seat
-    first_seat = seats[0]
-    movie = first_seat.theater.movie
-    theater = first_seat.theater
+async def payment_success(request, theater_id):
+    """
+    Stripe redirects here after checkout. The redirect itself proves
+    nothing, so the session is re-read from Stripe before finalizing; the
+    webhook normally gets there first and this is then a no-op.
+    """
+    user = await authenticated_user(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+
+    session_id = request.GET.get("session_id")
+    if session_id and settings.STRIPE_SECRET_KEY:
+        try:
+            session = await retrieve_checkout_session(session_id)
+        except stripe.StripeError as e:
+            logger.warning("Could not verify session %s: %s", session_id, e)
+        else:
+            if session.payment_status == "paid":
+                await sync_to_async(complete_checkout)(session.id)
 
-    seat_numbers = []
+    # Checkout is over: hand the waiting-room slot to the next in line.
+    await sync_to_async(release)(theater_id, user.id)
+    response = redirect("profile")
+    response.delete_cookie(cookie_name(theater_id), path=f"/movies/theater/{theater_id}/")
+    return response
 
-    for seat in seats:
-        Booking.objects.create(
-            user=request.user,
-            seat=seat,
-            movie=seat.theater.movie,
-            theater=seat.theater
-        )
-        seat.is_booked = True
-        seat.is_reserved = False
-        seat.reserved_by = None
-        seat.reserved_at = None
-        seat.save()
-        seat_numbers.append(seat.seat_number)
 
-    print(f"User email: {request.user.email}")
-    print(f"EMAIL_HOST_USER configured: {bool(settings.EMAIL_HOST_USER)}")
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        return HttpResponse("Webhook secret not configured.", status=503)
 
-    # Send email with proper error handling
     try:
-        if request.user.email and settings.EMAIL_HOST_USER:
-            print("Attempting to send email")
-            send_mail(
-                subject="🎟 Ticket Booking Confirmation",
-                message=f"""Hi {request.user.username},
-
-Your booking is confirmed!
-
-Movie: {movie.name}
-Theater: {theater.name}
-Seats: {', '.join(seat_numbers)}
-Total: ₹{len(seat_numbers) * PRICE_PER_SEAT}
-
-Enjoy your show!
-
-- BookMySeat Team
-""",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[request.user.email],
-                fail_silently=False,
-            )
-            print(f"Email sent successfully to {request.user.email}")
-        else:
-            print(f"Cannot send email. User email: {request.user.email}, Host user configured: {bool(settings.EMAIL_HOST_USER)}")
-    except Exception as e:
-        print(f"Failed to send email: {str(e)}")
+        handle_webhook(request.body, request.META.get("HTTP_STRIPE_SIGNATURE", ""))
+    except (ValueError, stripe.SignatureVerificationError):
+        return HttpResponse(status=400)
 
-    return redirect("profile")
+    return HttpResponse(status=200)
 
 
 # ======================
@@ -239,15 +312,35 @@ Enjoy your show!
 # ======================
 
 @staff_member_required
+@replica_reads
 def admin_dashboard(request):
+    # Counters maintained by movies.signals; see rebuild_booking_stats.
+    total_bookings, total_revenue = total_stats()
     context = {
-        "total_bookings": Booking.objects.count(),
-        "total_revenue": Booking.objects.count() * PRICE_PER_SEAT,
-        "popular_movies": Movie.objects.annotate(
-            bookings=Count("booking")
-        ).order_by("-bookings")[:5],
-        "busy_theaters": Theater.objects.annotate(
-            bookings=Count("booking")
-        ).order_by("-bookings")[:5],
+        "total_bookings": total_bookings,
+        "total_revenue": total_revenue,
+        "popular_movies": top(BookingStat.MOVIE),
+        "busy_theaters": top(BookingStat.THEATER),
+        # Charts read only the rollups (see backfill_booking_rollups).
+        "hourly": series(BookingRollup.HOUR, 24),
+        "daily": series(BookingRollup.DAY, 30),
+        "trending_movies": top_movies(timezone.now() - timedelta(hours=24)),
+        "occupancy": showtime_occupancy(),
+        "profiling": settings.PROFILING,
+        "profiling_slow_ms": settings.PROFILING_SLOW_MS,
+        "slow_requests": slow_requests(),
     }
     return render(request, "movies/admin_dashboard.html", context)
+
+
+@staff_member_required
+def export_data(request, kind, format):
+    """
+    Stream all bookings or seats as CSV / NDJSON, e.g.
+    /movies/export/bookings.csv?start=2026-01-01&end=2026-01-31&theater=3
+    """
+    if kind not in EXPORTS or format not in FORMATS:
+        raise Http404("Unknown export.")
+    model = EXPORTS[kind][0]
+    queryset = filter_export(kind, model.objects.all(), request.GET)
+    return export_response(request, kind, queryset, format)
@@ -0,0 +1,182 @@
+"""
+Virtual waiting room in front of seat booking.
+
+At most ``WAITING_ROOM_ACTIVE_USERS`` users per theater are admitted to
+``book_seats`` at a time; everyone else waits in a FIFO queue and sees
+their position and an estimated wait on a page that reloads itself
+every ``WAITING_ROOM_POLL_SECONDS``. Each refresh doubles as a heartbeat:
+a queued user who stops polling loses their place.
+
+An admitted user gets a signed admission cookie for the theater, valid
+for ``WAITING_ROOM_ADMISSION_SECONDS``, so later booking requests are
+checked without touching the store. Their slot is freed when payment
+returns, or when the admission expires.
+
+The store is ``WAITING_ROOM_STORE``. The default one is in-memory, so each
+process admits its own quota; with several workers, swap in one backed by
+a shared store (e.g. Redis) with the same ``enter`` and ``leave`` methods.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict, namedtuple
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.core import signing
+from django.shortcuts import render
+from django.utils.module_loading import import_string
+
+Ticket = namedtuple("Ticket", ["admitted", "position", "eta"])
+
+# Weight of the latest session in the running average used for the ETA.
+SESSION_SMOOTHING = 0.2
+
+
+class Room:
+    def __init__(self):
+        self.queue = OrderedDict()  # user id -> last seen, in arrival order
+        self.active = {}  # user id -> (admitted at, expires at)
+        self.avg_session = None
+
+
+class InMemoryWaitingRoomStore:
+    """Per-theater FIFO queues and admission slots for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = defaultdict(Room)
+
+    def enter(self, theater_id, user_id, now, limit, lifetime, idle):
+        """
+        Queue ``user_id`` for the theater (or refresh their place) and admit
+        from the front while fewer than ``limit`` are active. Admissions last
+        ``lifetime`` seconds; queued users not seen for ``idle`` are dropped.
+        """
+        with self._lock:
+            room = self._rooms[theater_id]
+            for other, (admitted_at, expires) in list(room.active.items()):
+                if expires <= now:
+                    self._end_session(room, other, now)
+            for other, seen in list(room.queue.items()):
+                if seen < now - idle:
+                    del room.queue[other]
+
+            if user_id not in room.active:
+                room.queue[user_id] = now
+                while room.queue and len(room.active) < limit:
+                    admitted, _ = room.queue.popitem(last=False)
+                    room.active[admitted] = (now, now + lifetime)
+
+            if user_id in room.active:
+                return Ticket(True, 0, 0)
+            position = list(room.queue).index(user_id) + 1
+            avg_session = room.avg_session or lifetime
+            return Ticket(False, position, math.ceil(position / limit) * avg_session)
+
+    def leave(self, theater_id, user_id, now):
+        with self._lock:
+            room = self._rooms.get(theater_id)
+            if room is None:
+                return
+            room.queue.pop(user_id, None)
+            if user_id in room.active:
+                self._end_session(room, user_id, now)
+            if not room.queue and not room.active:
+                del self._rooms[theater_id]
+
+    def _end_session(self, room, user_id, now):
+        admitted_at, expires = room.active.pop(user_id)
+        duration = min(now, expires) - admitted_at
+        if room.avg_session is None:
+            room.avg_session = duration
+        else:
+            room.avg_session += SESSION_SMOOTHING * (duration - room.avg_session)
+
+
+@lru_cache(maxsize=None)
+def get_store():
+    return import_string(settings.WAITING_ROOM_STORE)()
+
+
+# ======================
+# ADMISSION TOKENS
+# ======================
+
+def _signer():
+    return signing.TimestampSigner(salt="movies.waitingroom")
+
+
+def cookie_name(theater_id):
+    return f"admission-{theater_id}"
+
+
+def admission_token(theater_id, user_id):
+    return _signer().sign(f"{theater_id}:{user_id}")
+
+
+def is_admitted(token, theater_id, user_id):
+    if not token:
+        return False
+    try:
+        value = _signer().unsign(token, max_age=settings.WAITING_ROOM_ADMISSION_SECONDS)
+    except signing.BadSignature:
+        return False
+    return value == f"{theater_id}:{user_id}"
+
+
+def enter(theater_id, user_id, now=None):
+    return get_store().enter(
+        theater_id,
+        user_id,
+        now or time.time(),
+        limit=settings.WAITING_ROOM_ACTIVE_USERS,
+        lifetime=settings.WAITING_ROOM_ADMISSION_SECONDS,
+        # A couple of missed refreshes are tolerated.
+        idle=3 * settings.WAITING_ROOM_POLL_SECONDS,
+    )
+
+
+def release(theater_id, user_id, now=None):
+    """Free the user's slot (and their place in the queue) for the theater."""
+    get_store().leave(theater_id, user_id, now or time.time())
+
+
+def admission_required(view):
+    """
+    Let the user through to ``view(request, theater_id)`` only once the
+    waiting room admits them; until then, render their place in the queue.
+    Expects an authenticated user (apply below ``login_required``).
+    """
+    @wraps(view)
+    def wrapper(request, theater_id, *args, **kwargs):
+        if not settings.WAITING_ROOM_ACTIVE_USERS:
+            return view(request, theater_id, *args, **kwargs)
+        if is_admitted(request.COOKIES.get(cookie_name(theater_id)), theater_id, request.user.id):
+            return view(request, theater_id, *args, **kwargs)
+
+        ticket = enter(theater_id, request.user.id)
+        if not ticket.admitted:
+            response = render(request, "movies/waiting_room.html", {
+                "theater_id": theater_id,
+                "position": ticket.position,
+                "wait_minutes": math.ceil(ticket.eta / 60),
+                "refresh": settings.WAITING_ROOM_POLL_SECONDS,
+            })
+            # Browsers reload on their own; the reload is the heartbeat.
+            response["Refresh"] = settings.WAITING_ROOM_POLL_SECONDS
+            response["Retry-After"] = settings.WAITING_ROOM_POLL_SECONDS
+            response["Cache-Control"] = "no-store"
+            return response
+
+        response = view(request, theater_id, *args, **kwargs)
+        response.set_cookie(
+            cookie_name(theater_id),
+            admission_token(theater_id, request.user.id),
+            max_age=settings.WAITING_ROOM_ADMISSION_SECONDS,
+            path=f"/movies/theater/{theater_id}/",
+            httponly=True,
+            samesite="Lax",
+        )
+        return response
+    return wrapper
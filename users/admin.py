@@ -1,3 +1,18 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from .models import OutgoingEmail
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    readonly_fields = ['attempts', 'last_error', 'created_at', 'sent_at']
+    actions = ['requeue']
+
+    @admin.action(description="Requeue selected emails")
+    def requeue(self, request, queryset):
+        queryset.exclude(status=OutgoingEmail.SENT).update(
+            status=OutgoingEmail.PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
@@ -0,0 +1,132 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed batch is hidden from other workers while it is sent.
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+class OutboxBackend(BaseEmailBackend):
+    """
+    Email backend that stores messages in the outbox instead of sending them.
+
+    Set as ``EMAIL_BACKEND`` so ``send_mail`` and Django's password-reset
+    views return immediately; ``manage.py send_queued_mail`` delivers the
+    messages through ``OUTBOX_DELIVERY_BACKEND``. Enqueuing inside a
+    transaction means the email is dropped if the transaction rolls back.
+    """
+
+    def send_messages(self, email_messages):
+        emails = [self._to_outbox(message) for message in email_messages]
+        OutgoingEmail.objects.bulk_create(emails)
+        return len(emails)
+
+    def _to_outbox(self, message):
+        return OutgoingEmail(
+            subject=message.subject,
+            body=message.body,
+            from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+            to=list(message.to),
+            cc=list(message.cc),
+            bcc=list(message.bcc),
+            reply_to=list(message.reply_to),
+            headers=dict(message.extra_headers),
+            alternatives=[list(alt) for alt in getattr(message, "alternatives", [])],
+        )
+
+
+def to_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        cc=email.cc,
+        bcc=email.bcc,
+        reply_to=email.reply_to,
+        headers=email.headers,
+        connection=connection,
+    )
+    for content, mimetype in email.alternatives:
+        message.attach_alternative(content, mimetype)
+    return message
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def claim_batch(batch_size, now):
+    with transaction.atomic():
+        ids = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        OutgoingEmail.objects.filter(id__in=ids).update(next_attempt_at=now + CLAIM_LEASE)
+    return list(OutgoingEmail.objects.filter(id__in=ids).order_by("id"))
+
+
+def deliver_batch(batch_size=50, now=None):
+    """
+    Send one batch of due emails over a single delivery connection.
+
+    Failures are retried with exponential backoff; after
+    ``OUTBOX_MAX_ATTEMPTS`` the email is dead-lettered. Returns
+    ``(sent, retried, dead)``.
+    """
+    now = now or timezone.now()
+    emails = claim_batch(batch_size, now)
+    if not emails:
+        return 0, 0, 0
+
+    sent, failed = [], []
+    connection = get_connection(settings.OUTBOX_DELIVERY_BACKEND)
+    try:
+        connection.open()
+        for email in emails:
+            try:
+                connection.send_messages([to_message(email, connection)])
+                sent.append(email)
+            except Exception as e:
+                logger.warning("Failed to send outbox email %s: %s", email.id, e)
+                email.last_error = str(e)
+                failed.append(email)
+    except Exception as e:
+        # Could not even connect: every email in the batch counts as failed.
+        logger.warning("Outbox delivery connection failed: %s", e)
+        for email in emails:
+            if email not in sent and email not in failed:
+                email.last_error = str(e)
+                failed.append(email)
+    finally:
+        connection.close()
+
+    OutgoingEmail.objects.filter(id__in=[email.id for email in sent]).update(
+        status=OutgoingEmail.SENT, sent_at=timezone.now()
+    )
+
+    retried = dead = 0
+    for email in failed:
+        email.attempts += 1
+        if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            email.status = OutgoingEmail.DEAD
+            dead += 1
+        else:
+            email.next_attempt_at = now + retry_delay(email.attempts)
+            retried += 1
+    OutgoingEmail.objects.bulk_update(
+        failed, ["attempts", "status", "next_attempt_at", "last_error"]
+    )
+
+    return len(sent), retried, dead
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.mail import deliver_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver emails from the outbox, either once or as a long-running worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain everything that is due and exit.",
+        )
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait when the outbox is empty.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                sent, retried, dead = deliver_batch(options["batch_size"])
+                if sent or retried or dead:
+                    self.stdout.write(f"Sent {sent}, retrying {retried}, dead-lettered {dead}.")
+                if sent + retried + dead < options["batch_size"]:
+                    if options["once"]:
+                        return
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping mail worker.")
@@ -1,3 +1,40 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class OutgoingEmail(models.Model):
+    """An email waiting in the outbox for the send_queued_mail worker."""
+
+    PENDING = "pending"
+    SENT = "sent"
+    DEAD = "dead"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (DEAD, "Dead letter"),
+    ]
+
+    subject = models.TextField()
+    body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    reply_to = models.JSONField(default=list, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+    alternatives = models.JSONField(default=list, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} to {", ".join(self.to)} ({self.status})'
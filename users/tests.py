@@ -1,3 +1,177 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail import send_mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from movies.history import PAST, booking_history
+from movies.models import Booking, Movie, Seat, Theater
+
+from .mail import deliver_batch
+from .models import OutgoingEmail
+
+
+class CountingBackend(LocmemBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP server unavailable")
+
+
+@override_settings(
+    EMAIL_BACKEND="users.mail.OutboxBackend",
+    OUTBOX_DELIVERY_BACKEND="users.tests.CountingBackend",
+    OUTBOX_MAX_ATTEMPTS=3,
+    OUTBOX_RETRY_BACKOFF=60,
+)
+class OutboxTests(TestCase):
+    def enqueue(self, count=1):
+        for i in range(count):
+            send_mail(f"Subject {i}", "Body", None, [f"user{i}@example.com"])
+
+    def test_send_mail_only_enqueues(self):
+        self.enqueue()
+
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.to, ["user0@example.com"])
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+
+    def test_batch_is_sent_over_one_connection(self):
+        self.enqueue(count=5)
+        CountingBackend.opened = 0
+
+        self.assertEqual(deliver_batch(batch_size=10), (5, 0, 0))
+
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(OutgoingEmail.objects.filter(status=OutgoingEmail.SENT).count(), 5)
+
+    @override_settings(OUTBOX_DELIVERY_BACKEND="users.tests.FailingBackend")
+    def test_failures_back_off_then_dead_letter(self):
+        self.enqueue()
+        now = timezone.now()
+
+        self.assertEqual(deliver_batch(now=now), (0, 1, 0))
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.next_attempt_at, now + timedelta(seconds=60))
+        self.assertIn("unavailable", email.last_error)
+
+        # Not due yet.
+        self.assertEqual(deliver_batch(now=now + timedelta(seconds=30)), (0, 0, 0))
+
+        self.assertEqual(deliver_batch(now=now + timedelta(seconds=60)), (0, 1, 0))
+        self.assertEqual(OutgoingEmail.objects.get().next_attempt_at, now + timedelta(seconds=180))
+        self.assertEqual(deliver_batch(now=now + timedelta(seconds=180)), (0, 0, 1))
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.DEAD)
+
+    def test_command_drains_the_outbox(self):
+        self.enqueue(count=3)
+
+        call_command("send_queued_mail", "--once", "--batch-size", "2", stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutgoingEmail.objects.filter(status=OutgoingEmail.PENDING).exists())
+
+    def test_password_reset_is_enqueued(self):
+        User.objects.create_user("alice", email="alice@example.com", password="pass")
+
+        response = self.client.post("/password-reset/", {"email": "alice@example.com"})
+
+        self.assertRedirects(response, "/password-reset/done/", fetch_redirect_response=False)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingEmail.objects.get().to, ["alice@example.com"])
+
+
+class BookingHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="asha", password="pw")
+        self.movie = Movie.objects.create(
+            name="Inception", image="movies/inception.jpg", rating="8.8",
+            cast="Leonardo DiCaprio", genre="Thriller", language="English",
+        )
+
+    def book_shows(self, count, seats_per_show=2, days=1):
+        now = timezone.now()
+        theaters = Theater.objects.bulk_create(
+            Theater(name=f"PVR {i}", movie=self.movie, time=now + timedelta(days=days, hours=i))
+            for i in range(count)
+        )
+        seats = Seat.objects.bulk_create(
+            Seat(theater=theater, seat_number=f"A{n}", is_booked=True)
+            for theater in theaters for n in range(1, seats_per_show + 1)
+        )
+        Booking.objects.bulk_create(
+            Booking(user=self.user, seat=seat, movie=self.movie, theater=seat.theater)
+            for seat in seats
+        )
+        return theaters
+
+    def test_bookings_are_grouped_by_show(self):
+        theater, = self.book_shows(1, seats_per_show=3)
+
+        shows, next_after = booking_history(self.user)
+
+        self.assertEqual(len(shows), 1)
+        self.assertEqual(shows[0].theater, theater)
+        self.assertEqual(shows[0].seats, ["A1", "A2", "A3"])
+        self.assertIsNone(next_after)
+
+    def test_upcoming_and_past_are_separate(self):
+        upcoming = self.book_shows(2)
+        past = self.book_shows(2, days=-3)
+
+        shows, _ = booking_history(self.user)
+        self.assertEqual([s.theater for s in shows], upcoming)
+
+        shows, _ = booking_history(self.user, PAST)
+        self.assertEqual([s.theater for s in shows], past[::-1])
+
+    def test_keyset_pages_cover_every_show_once(self):
+        theaters = self.book_shows(7)
+        # Two shows at the same time: the id breaks the tie.
+        Theater.objects.filter(id=theaters[4].id).update(time=theaters[3].time)
+
+        seen, after = [], None
+        while True:
+            shows, after = booking_history(self.user, after=after, page_size=3)
+            seen += [show.theater.id for show in shows]
+            if after is None:
+                break
+
+        self.assertEqual(seen, [theater.id for theater in theaters])
+
+    def test_other_users_bookings_are_hidden(self):
+        self.book_shows(1)
+        other = User.objects.create_user(username="ravi", password="pw")
+
+        self.assertEqual(booking_history(other), ([], None))
+
+    def test_profile_query_count_is_flat(self):
+        self.client.force_login(self.user)
+        self.book_shows(1, seats_per_show=1)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get("/profile/")
+
+        self.book_shows(40, seats_per_show=10)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get("/profile/")
+
+        self.assertEqual(len(few), len(many))
+        self.assertContains(response, "A1, A2, A3")
+        self.assertContains(response, "Show more")
@@ -3,11 +3,15 @@ from .forms import UserRegisterForm, UserUpdateForm
 from django.shortcuts import render,redirect
 from django.contrib.auth import login,authenticate
 from django.contrib.auth.decorators import login_required
-from movies.models import Movie , Booking
+from movies.catalog import home_movies, parse_cursor
+from movies.history import booking_history, parse_when
+from movies.pagecache import HOME_TAG, cache_anonymous_page, page_version
 
+# Not @replica_reads: see movie_detail.
+@cache_anonymous_page("home", lambda: [HOME_TAG])
 def home(request):
-    movies= Movie.objects.all()
-    return render(request,'home.html',{'movies':movies})
+    movies= home_movies()
+    return render(request,'home.html',{'movies':movies,'cache_version':page_version([HOME_TAG])})
 def register(request):
     if request.method == 'POST':
         form=UserRegisterForm(request.POST)
@@ -35,7 +39,8 @@ def login_view(request):
 
 @login_required
 def profile(request):
-    bookings= Booking.objects.filter(user=request.user)
+    when=parse_when(request.GET.get('when'))
+    shows,next_after=booking_history(request.user,when,parse_cursor(request.GET.get('after')))
     if request.method == 'POST':
         u_form = UserUpdateForm(request.POST, instance=request.user)
         if u_form.is_valid():
@@ -44,7 +49,12 @@ def profile(request):
     else:
         u_form = UserUpdateForm(instance=request.user)
 
-    return render(request, 'users/profile.html', {'u_form': u_form,'bookings':bookings})
+    return render(request, 'users/profile.html', {
+        'u_form': u_form,
+        'shows': shows,
+        'when': when,
+        'next_after': next_after,
+    })
 
 @login_required
 def reset_password(request):